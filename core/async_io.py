@@ -0,0 +1,136 @@
+"""
+    This module contains a background writer thread that takes care of our
+    disk I/O so the bot never has to wait on the filesystem.
+
+    Writes are queued up as jobs and run in order by a single writer thread
+    that's shared by every bot in the process. The queue is bounded: if the
+    disk can't keep up, whoever's submitting a job blocks until there's room
+    again (backpressure) instead of piling up frames in memory. Everything
+    still in the queue is flushed when the process exits, and the writer
+    keeps track of its write throughput and how long submitters were held up.
+"""
+import time
+import queue
+import atexit
+import logging
+import threading
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+
+class AsyncWriter():
+    """
+    Runs I/O jobs in order on a background thread with a bounded queue
+    """
+    def __init__(self, max_queue_size=64):
+        """Sets up the job queue and starts the writer thread
+
+        Argument Keywords:
+            max_queue_size  {int}   --  max no. of jobs waiting to be run
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_jobs        {int}   --  no. of jobs that have been run
+            num_errors      {int}   --  no. of jobs that raised an exception
+            bytes_written   {int}   --  bytes written by those jobs
+            busy_sec        {float} --  time spent running jobs
+            blocked_sec     {float} --  time submitters spent waiting for
+                                        room in the queue
+
+        Attributes Referenced:
+            N/A
+        """
+        self.logger = logging.getLogger('async_io')
+        self.num_jobs = 0
+        self.num_errors = 0
+        self.bytes_written = 0
+        self.busy_sec = 0.0
+        self.blocked_sec = 0.0
+        self._jobs = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name='AsyncWriter', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, nbytes=0):
+        """Queue up a job, blocking if the queue's full
+
+        Argument Keywords:
+            fn      {callable}  --  job to run on the writer thread
+            args    {tuple}     --  arguments to call it with
+            nbytes  {int}       --  no. of bytes it writes (for stats)
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            blocked_sec {float}
+
+        Attributes Referenced:
+            N/A
+        """
+        try:
+            self._jobs.put_nowait((fn, args, nbytes))
+        except queue.Full:
+            start = time.perf_counter()
+            self._jobs.put((fn, args, nbytes))
+            self.blocked_sec += time.perf_counter() - start
+
+    def flush(self):
+        """Wait until every queued job has been run"""
+        self._jobs.join()
+
+    def shutdown(self):
+        """Run every queued job, then stop the writer thread"""
+        if not self._thread.is_alive():
+            return
+        self._jobs.put(None)
+        self._thread.join()
+
+    def get_stats(self):
+        """Get the writer's throughput and how much it has held up submitters"""
+        return {
+            "num_jobs": self.num_jobs,
+            "num_errors": self.num_errors,
+            "mb_written": self.bytes_written/1e6,
+            "mb_per_sec": self.bytes_written/1e6/max(self.busy_sec, 1e-9),
+            "blocked_sec": self.blocked_sec,
+            "queued": self._jobs.qsize()
+        }
+
+    def _run(self):
+        """Writer thread's loop: run jobs in the order they came in"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                return
+            fn, args, nbytes = job
+            start = time.perf_counter()
+            try:
+                fn(*args)
+                self.bytes_written += nbytes
+            except Exception: # keep going, one bad write shouldn't stop the rest
+                self.num_errors += 1
+                self.logger.exception('I/O job %s failed', getattr(fn, '__name__', fn))
+            self.busy_sec += time.perf_counter() - start
+            self.num_jobs += 1
+            self._jobs.task_done()
+
+
+def get_writer():
+    """Get the process' writer, starting it the first time it's needed. It's
+    flushed and stopped when the process exits"""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = AsyncWriter()
+            atexit.register(_WRITER.shutdown)
+        return _WRITER
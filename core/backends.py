@@ -0,0 +1,263 @@
+"""
+    This module contains the inference backends our bot can run its DNN model
+    with.
+
+    tf.keras.Model.predict() builds a data adapter and runs a whole predict
+    loop every time it's called, which is a lot of overhead for a batch of one
+    intel frame. Every backend in here loads the Keras model saved at
+    model_location and exposes the same predict(batch) call:
+    - KERAS: plain tf.keras.Model.predict(), kept as a reference
+    - TF_FUNCTION: the model traced once into a tf.function with a fixed
+      (1, 176, 200, 3) input signature
+    - TFLITE: the model converted to TensorFlow Lite and run with its
+      interpreter
+    - TFLITE_INT8: same as TFLITE, but int8-quantized for CPUs
+
+    main.py runs every trial in the same process, so get_backend() keeps the
+    backends it has loaded around (keyed by the model's path and when it was
+    last modified) and warms each one up with a dummy intel frame. New bots
+    then get a model that's ready to go instead of reloading and retracing it
+    every game.
+
+    Running this module compares every backend's per-decision latency and its
+    agreement with the Keras model on a held-out set of intel frames:
+        python -m core.backends -m <model_location> -d <training_data_dir>
+"""
+import os
+import time
+import argparse
+import numpy as np
+import tensorflow as tf # get keras like so: tf.keras
+import utils # from main project
+from .training_data import is_game_data, load_game_data
+
+#------------------------------------------------------------------------------
+# (model path, backend) -> (model mtime, loaded backend), shared by every bot
+# in this process
+#------------------------------------------------------------------------------
+_BACKEND_CACHE = {}
+
+
+class KerasBackend():
+    """
+    Runs the model with tf.keras.Model.predict()
+    """
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch):
+        """Get the model's prediction for a batch of intel frames"""
+        return self.model.predict(batch)
+
+
+class TFFunctionBackend():
+    """
+    Runs the model as a traced tf.function with a fixed input signature so
+    it's only traced once
+    """
+    def __init__(self, model, input_shape=(176, 200, 3)):
+        self.model = model
+        self.input_shape = tuple(input_shape)
+        self._fn = tf.function(
+            lambda x: self.model(tf.cast(x, tf.float32), training=False),
+            input_signature=[tf.TensorSpec((1,) + self.input_shape, tf.uint8)])
+        self._fn.get_concrete_function() # trace it now rather than on the first decision
+
+    def predict(self, batch):
+        """Get the model's prediction for a batch of intel frames"""
+        batch = np.asarray(batch, dtype=np.uint8).reshape((-1,) + self.input_shape)
+        return np.concatenate([self._fn(frame[None]).numpy() for frame in batch])
+
+
+class TFLiteBackend():
+    """
+    Runs the model converted to TensorFlow Lite, optionally int8-quantized
+    """
+    def __init__(self, model, int8=False, representative_frames=None):
+        """Converts a Keras model to TensorFlow Lite and sets up its interpreter
+
+        Argument Keywords:
+            model                   {tf.keras.Model}    --  model to convert
+            int8                    {bool}  --  quantize the model to int8
+            representative_frames   {numpy.ndarray} --  intel frames used to
+                                        calibrate the activations' ranges.
+                                        Without them, only the weights are
+                                        quantized
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            interpreter {tf.lite.Interpreter}
+
+        Attributes Referenced:
+            N/A
+        """
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        if int8:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            if representative_frames is not None:
+                converter.representative_dataset = lambda: (
+                    [frame[None].astype(np.float32)] for frame in representative_frames)
+        self.interpreter = tf.lite.Interpreter(model_content=converter.convert())
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+
+    def predict(self, batch):
+        """Get the model's prediction for a batch of intel frames"""
+        batch = np.asarray(batch, dtype=self._input['dtype']).reshape(
+                                                    (-1,) + tuple(self._input['shape'][1:]))
+        predictions = []
+        for frame in batch:
+            self.interpreter.set_tensor(self._input['index'], frame[None])
+            self.interpreter.invoke()
+            predictions.append(self.interpreter.get_tensor(self._output['index'])[0])
+        return np.array(predictions)
+
+
+def load_backend(path, backend=utils.INFERENCE_BACKEND.KERAS, representative_frames=None):
+    """Loads the Keras model saved at a path and wraps it in an inference
+    backend
+
+    Argument Keywords:
+        path                    {string}    --  model_location
+        backend                 {utils.INFERENCE_BACKEND}
+        representative_frames   {numpy.ndarray} --  only used by TFLITE_INT8
+
+    Raises:
+        ValueError  --  if the backend isn't handled
+
+    Returns:
+        {object} -- backend with a predict(batch) method
+    """
+    model = tf.keras.models.load_model(path)
+    if backend == utils.INFERENCE_BACKEND.KERAS:
+        return KerasBackend(model)
+    if backend == utils.INFERENCE_BACKEND.TF_FUNCTION:
+        return TFFunctionBackend(model)
+    if backend == utils.INFERENCE_BACKEND.TFLITE:
+        return TFLiteBackend(model)
+    if backend == utils.INFERENCE_BACKEND.TFLITE_INT8:
+        return TFLiteBackend(model, True, representative_frames)
+    raise ValueError('Unhandled inference backend: {}'.format(backend))
+
+
+def get_mtime(path):
+    """Get the last time a saved model was modified. SavedModels are
+    directories, so the newest file in there is used"""
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    return max([os.path.getmtime(os.path.join(root, name)) \
+                for root, _, names in os.walk(path) for name in names] + [os.path.getmtime(path)])
+
+
+def get_backend(path, backend=utils.INFERENCE_BACKEND.KERAS, input_shape=(176, 200, 3)):
+    """Gets a loaded and warmed-up backend for the model saved at a path.
+    It's only loaded once per process, unless the model has been modified
+    since then
+
+    Argument Keywords:
+        path        {string}    --  model_location
+        backend     {utils.INFERENCE_BACKEND}
+        input_shape {tuple}     --  shape of a single intel frame
+
+    Raises:
+        ValueError  --  if the backend isn't handled
+
+    Returns:
+        {object}    -- backend with a predict(batch) method
+        {bool}      -- True if it was already loaded
+    """
+    key = (os.path.abspath(path), backend)
+    mtime = get_mtime(path)
+    cached = _BACKEND_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1], True
+
+    _BACKEND_CACHE.pop(key, None) # let go of the outdated one before loading the new one
+    runner = load_backend(path, backend)
+    # the first call traces/allocates everything, get it out of the way now
+    runner.predict(np.zeros((1,) + tuple(input_shape), dtype=np.uint8))
+    _BACKEND_CACHE[key] = (mtime, runner)
+    return runner, False
+
+
+def load_frames(data_dir, max_frames):
+    """Loads up to max_frames intel frames from the training data files in a
+    directory"""
+    frames = []
+    for file in sorted(os.listdir(data_dir)):
+        if not is_game_data(os.path.join(data_dir, file)):
+            continue
+        frames.extend(d[1] for d in load_game_data(os.path.join(data_dir, file)))
+        if len(frames) >= max_frames:
+            break
+    return np.array(frames[:max_frames], dtype=np.uint8)
+
+
+def benchmark(path, frames, backends, num_calibration=100):
+    """Times every backend on one frame at a time (like the bot does) and
+    checks how often its decision agrees with the Keras model's
+
+    Argument Keywords:
+        path            {string}        --  model_location
+        frames          {numpy.ndarray} --  held-out intel frames
+        backends        {list}          --  utils.INFERENCE_BACKEND values
+        num_calibration {int}           --  no. of frames used to calibrate
+                                            int8 quantization (these are left
+                                            out of the comparison)
+
+    Raises:
+        N/A
+
+    Returns:
+        {dict} -- backend name -> {"median_ms", "p95_ms", "agreement"}
+    """
+    calibration, frames = frames[:num_calibration], frames[num_calibration:]
+    reference = None
+    results = {}
+    for backend in [utils.INFERENCE_BACKEND.KERAS] + \
+                        [b for b in backends if b != utils.INFERENCE_BACKEND.KERAS]:
+        runner = load_backend(path, backend, calibration)
+        runner.predict(frames[:1]) # warm-up
+        latencies = []
+        decisions = []
+        for frame in frames:
+            start = time.perf_counter()
+            prediction = runner.predict(frame[None])
+            latencies.append((time.perf_counter() - start)*1000)
+            decisions.append(np.argmax(prediction[0]))
+        decisions = np.array(decisions)
+        if reference is None:
+            reference = decisions
+        results[backend.name] = {
+            "median_ms": float(np.median(latencies)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "agreement": float(np.mean(decisions == reference))
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m', dest='model_location', type=str, required=True, \
+                        help='path to the saved Keras model')
+    parser.add_argument('-d', dest='data_dir', type=str, required=True, \
+                        help='directory of held-out training data files')
+    parser.add_argument('-n', dest='num_frames', type=int, default=600, \
+                        help='max no. of intel frames to use')
+    parser.add_argument('-b', dest='backends', type=str, nargs='+', \
+                        default=list(utils.INFERENCE_BACKEND.__members__), \
+                        help='backends to compare against KERAS')
+    args = parser.parse_args()
+
+    results = benchmark(args.model_location, load_frames(args.data_dir, args.num_frames), \
+                        [utils.INFERENCE_BACKEND[b.upper()] for b in args.backends])
+    print('{:<12} {:>10} {:>10} {:>10}'.format('backend', 'median ms', 'p95 ms', 'agreement'))
+    for name, res in results.items():
+        print('{:<12} {:>10.2f} {:>10.2f} {:>9.1f}%'.format(\
+                name, res['median_ms'], res['p95_ms'], res['agreement']*100))
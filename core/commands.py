@@ -0,0 +1,125 @@
+"""
+    This module contains a command layer that sits between the bot and
+    python-sc2 and drops orders that wouldn't change what a unit is doing.
+
+    We remember the last order we've issued to each unit. If a new order is
+    the same as the last one and the unit is still carrying it out (or has
+    already reached its target position), then it's suppressed. Orders that
+    do get through are still combined by python-sc2 into one raw action per
+    ability and target before they're sent to the game.
+"""
+import sc2
+from sc2.position import Point2
+
+
+class CommandLayer():
+    """
+    Keeps track of the orders issued to each unit and suppresses duplicates
+    """
+    def __init__(self, tolerance=1.0):
+        """Sets up an empty order history
+
+        Argument Keywords:
+            tolerance   {float} --  two target positions closer than this are
+                                    considered to be the same
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            last_issued     {dict}  --  unit tag -> (ability, target)
+            tolerance       {float}
+            num_sent        {int}   --  no. of orders sent to python-sc2
+            num_suppressed  {int}   --  no. of orders dropped as duplicates
+
+        Attributes Referenced:
+            N/A
+        """
+        self.last_issued = {}
+        self.tolerance = tolerance
+        self.num_sent = 0
+        self.num_suppressed = 0
+
+    def is_same_target(self, target_a, target_b):
+        """Check if two order targets (a Unit, a unit tag, a position or None)
+        point to the same thing"""
+        if isinstance(target_a, sc2.unit.Unit):
+            target_a = target_a.tag
+        if isinstance(target_b, sc2.unit.Unit):
+            target_b = target_b.tag
+        if isinstance(target_a, int) or isinstance(target_b, int) \
+                                                or target_a is None or target_b is None:
+            return target_a == target_b
+        return Point2(target_a).distance_to_point2(Point2(target_b)) < self.tolerance
+
+    def is_redundant(self, unit, ability, target):
+        """Check if an order would just repeat what the unit's already doing
+
+        Argument Keywords:
+            unit    {sc2.unit.Unit}     --  unit we want to command
+            ability {sc2.AbilityId}     --  ability we want it to use
+            target  {sc2.unit.Unit, sc2.position.Point2, None}
+
+        Raises:
+            N/A
+
+        Returns:
+            {bool} -- True if the order can be dropped
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            last_issued {dict}
+        """
+        last = self.last_issued.get(unit.tag)
+        if last is None or last[0] != ability or not self.is_same_target(last[1], target):
+            return False
+
+        if not unit.orders:
+            # it's done with the order, which is only fine if it went somewhere
+            return not isinstance(target, (sc2.unit.Unit, int)) and target is not None \
+                    and unit.distance_to(target) < self.tolerance*2
+        order = unit.orders[0]
+        return order.ability.id == ability and self.is_same_target(order.target, target)
+
+    def issue(self, unit, ability, target=None, queue=False):
+        """Give an order to a unit, unless it'd be a duplicate
+
+        Argument Keywords:
+            unit    {sc2.unit.Unit}     --  unit we want to command
+            ability {sc2.AbilityId}     --  ability we want it to use
+            target  {sc2.unit.Unit, sc2.position.Point2, None}
+            queue   {bool}              --  queue the order instead of
+                                            replacing the current one
+
+        Raises:
+            N/A
+
+        Returns:
+            {bool} -- True if the order was sent
+
+        Attributes Affected:
+            last_issued     {dict}
+            num_sent        {int}
+            num_suppressed  {int}
+
+        Attributes Referenced:
+            last_issued     {dict}
+        """
+        if not queue and self.is_redundant(unit, ability, target):
+            self.num_suppressed += 1
+            return False
+
+        unit(ability, target=target, queue=queue)
+        self.last_issued[unit.tag] = (ability, target.tag if isinstance(target, sc2.unit.Unit) \
+                                                else target)
+        self.num_sent += 1
+        return True
+
+    def forget(self, tag):
+        """Drop the order history of a unit that's been destroyed"""
+        self.last_issued.pop(tag, None)
@@ -0,0 +1,195 @@
+"""
+    This module contains an income forecaster.
+
+    Instead of polling can_afford() at every step and only acting once the
+    money is already banked, the bot can ask the forecaster how long it'll
+    take to afford something. That lets us skip re-evaluating actions we
+    can't afford yet and send workers to a build site ahead of time.
+"""
+import collections
+import math
+
+
+#------------------------------------------------------------------------------
+# approximate harvesting rates (resource per game loop) for a single worker.
+# These are the commonly quoted ~57 minerals/min and ~61 vespene/min at
+# "faster" game speed (22.4 game loops per second)
+#------------------------------------------------------------------------------
+MINERALS_PER_WORKER_LOOP = 57/60/22.4
+VESPENE_PER_WORKER_LOOP = 61/60/22.4
+# a 3rd worker on a mineral patch only adds about half of a worker's income
+OVERSATURATED_MINERAL_SCALE = 0.5
+
+
+class IncomeForecaster():
+    """
+    Estimates our mineral and vespene income and uses it to predict when
+    builds can start
+    """
+    def __init__(self, history_sec=30, history_weight=0.5, max_defer_sec=5):
+        """Sets up the forecaster's history of collected resources
+
+        Argument Keywords:
+            history_sec     {float} --  how far back (in game seconds) we look
+                                        to measure our actual income
+            history_weight  {float} --  how much the measured income counts
+                                        vs. the income estimated from worker
+                                        saturation [0,1]
+            max_defer_sec   {float} --  we'll never wait more than this long
+                                        before re-evaluating an action
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            history         {deque} --  (game loop, collected minerals,
+                                        collected vespene)
+            history_loops   {int}
+            history_weight  {float}
+            max_defer_loops {int}
+            rate            {dict}  --  "minerals" & "vespene" per game loop
+            next_check_loop {dict}  --  key -> game loop at which an action
+                                        should be re-evaluated
+
+        Attributes Referenced:
+            N/A
+        """
+        self.history = collections.deque()
+        self.history_loops = int(history_sec*22.4)
+        self.history_weight = history_weight
+        self.max_defer_loops = int(max_defer_sec*22.4)
+        self.rate = {'minerals': 0.0, 'vespene': 0.0}
+        self.next_check_loop = {}
+
+    def update(self, bot):
+        """Refresh our income estimate. Should be called once per step.
+
+        Argument Keywords:
+            bot {sc2.BotAI} -- bot whose income we're estimating
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            history {deque}
+            rate    {dict}
+
+        Attributes Referenced:
+            history         {deque}
+            history_loops   {int}
+            history_weight  {float}
+        """
+        game_loop = bot.state.game_loop
+        score = bot.state.score
+        self.history.append((game_loop, score.collected_minerals, score.collected_vespene))
+        while self.history[0][0] < game_loop - self.history_loops:
+            self.history.popleft()
+
+        #----------------------------------------------------------------------
+        # estimate income from how many workers are assigned to each base and
+        # each vespene geyser building
+        #----------------------------------------------------------------------
+        mineral_rate = 0.0
+        for townhall in bot.townhalls.ready:
+            assigned = townhall.assigned_harvesters
+            ideal = townhall.ideal_harvesters
+            mineral_rate += min(assigned, ideal)*MINERALS_PER_WORKER_LOOP
+            extra = min(max(assigned - ideal, 0), ideal//2)
+            mineral_rate += extra*MINERALS_PER_WORKER_LOOP*OVERSATURATED_MINERAL_SCALE
+        vespene_rate = 0.0
+        for vgs_bldg in bot.gas_buildings.ready:
+            vespene_rate += \
+                min(vgs_bldg.assigned_harvesters, vgs_bldg.ideal_harvesters)*VESPENE_PER_WORKER_LOOP
+
+        #----------------------------------------------------------------------
+        # blend it with the income we've actually seen lately (as long as we
+        # have enough history for it to mean anything)
+        #----------------------------------------------------------------------
+        first, last = self.history[0], self.history[-1]
+        span = last[0] - first[0]
+        if span >= self.history_loops/2:
+            w = self.history_weight
+            mineral_rate = (1 - w)*mineral_rate + w*(last[1] - first[1])/span
+            vespene_rate = (1 - w)*vespene_rate + w*(last[2] - first[2])/span
+
+        self.rate['minerals'] = mineral_rate
+        self.rate['vespene'] = vespene_rate
+
+    def get_eta(self, cost, minerals, vespene):
+        """Get the number of game loops until we can afford something
+
+        Argument Keywords:
+            cost        {sc2.game_data.Cost}    --  what it costs
+            minerals    {float}                 --  minerals we have now
+            vespene     {float}                 --  vespene we have now
+
+        Raises:
+            N/A
+
+        Returns:
+            {float} -- game loops until it's affordable. 0 if it already is,
+                       math.inf if we don't have the income for it
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            rate    {dict}
+        """
+        eta = 0.0
+        for need, have, rate in [(cost.minerals, minerals, self.rate['minerals']),
+                                 (cost.vespene, vespene, self.rate['vespene'])]:
+            if need > have:
+                eta = max(eta, (need - have)/rate if rate > 0 else math.inf)
+        return eta
+
+    def get_schedule(self, queue, minerals, vespene, game_loop):
+        """Predicts when each build in a queue can start, assuming they're
+        paid for in order and our income stays the same
+
+        Argument Keywords:
+            queue       {list}  --  list of (key, sc2.game_data.Cost), in the
+                                    order we want to build them
+            minerals    {float} --  minerals we have now
+            vespene     {float} --  vespene we have now
+            game_loop   {int}   --  current game loop
+
+        Raises:
+            N/A
+
+        Returns:
+            {list} -- list of (key, predicted start game loop). The start can
+                      be math.inf if we don't have the income for it
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            rate    {dict}
+        """
+        schedule = []
+        start = 0.0
+        for key, cost in queue:
+            # resources we'll have by the time the previous build has started
+            have_minerals = minerals + self.rate['minerals']*start
+            have_vespene = vespene + self.rate['vespene']*start
+            start = start + self.get_eta(cost, have_minerals, have_vespene)
+            schedule.append((key, game_loop + start))
+            minerals = minerals - cost.minerals
+            vespene = vespene - cost.vespene
+        return schedule
+
+    def is_due(self, key, game_loop):
+        """Check if an action that we couldn't afford should be re-evaluated"""
+        return self.next_check_loop.get(key, 0) <= game_loop
+
+    def defer(self, key, cost, minerals, vespene, game_loop):
+        """Skip re-evaluating an action until we're predicted to afford it"""
+        eta = min(self.get_eta(cost, minerals, vespene), self.max_defer_loops)
+        self.next_check_loop[key] = game_loop + int(eta)
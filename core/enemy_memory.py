@@ -0,0 +1,149 @@
+"""
+    This module contains a memory of every enemy unit and structure we've
+    seen, keyed by unit tag.
+
+    python-sc2 only hands us what's visible during the current step, so
+    without this the bot forgets about an enemy base as soon as it loses
+    vision of it. Each entry holds the last-seen type, position and game loop
+    of a unit and it's refreshed from every observation. Units are forgotten
+    once they haven't been seen for a while (they move around), while
+    structures are kept until they're destroyed or we see that they're no
+    longer where we left them.
+"""
+from .unit_classes import UNIT_CLASS, is_class
+
+
+class EnemyMemory():
+    """
+    Last-seen snapshots of the enemy's units and structures
+    """
+    def __init__(self, unit_expiry_sec=20):
+        """Sets up an empty memory
+
+        Argument Keywords:
+            unit_expiry_sec {float} --  forget about a unit if we haven't seen
+                                        it for this many seconds
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            unit_expiry_loops   {int}
+            entries             {dict}  --  tag -> {"type_id", "position",
+                                                    "radius", "is_structure",
+                                                    "last_seen"}
+            structure_tags      {set}   --  tags of remembered structures
+            townhall_tags       {set}   --  tags of remembered townhalls
+            game_loop           {int}   --  game loop of the last update
+
+        Attributes Referenced:
+            N/A
+        """
+        self.unit_expiry_loops = int(unit_expiry_sec*22.4)
+        self.entries = {}
+        self.structure_tags = set()
+        self.townhall_tags = set()
+        self.game_loop = 0
+
+    def remember(self, unit, game_loop):
+        """Add or refresh the snapshot of an enemy unit/structure"""
+        entry = self.entries.get(unit.tag)
+        if entry is None:
+            entry = {"type_id": unit.type_id, "is_structure": unit.is_structure}
+            self.entries[unit.tag] = entry
+            if unit.is_structure:
+                self.structure_tags.add(unit.tag)
+                if is_class(unit.type_id, UNIT_CLASS.TOWNHALL):
+                    self.townhall_tags.add(unit.tag)
+        elif entry["type_id"] != unit.type_id:
+            # it morphed (ex: Hatchery -> Lair)
+            entry["type_id"] = unit.type_id
+        entry["position"] = unit.position
+        # footprint_radius is None for types without a creation ability
+        entry["radius"] = unit.footprint_radius if unit.is_structure and \
+                            unit.footprint_radius is not None else unit.radius
+        entry["last_seen"] = game_loop
+
+    def forget(self, tag):
+        """Drop a unit/structure from memory (ex: because it was destroyed)"""
+        self.entries.pop(tag, None)
+        self.structure_tags.discard(tag)
+        self.townhall_tags.discard(tag)
+
+    def update(self, bot):
+        """Refreshes our memory with everything the enemy has that we can see
+        right now, then forgets about units we haven't seen in a while and
+        structures that are gone from where we saw them
+
+        Argument Keywords:
+            bot {sc2.BotAI} --  bot that's observing the game
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            entries         {dict}
+            structure_tags  {set}
+            townhall_tags   {set}
+            game_loop       {int}
+
+        Attributes Referenced:
+            unit_expiry_loops   {int}
+        """
+        self.game_loop = bot.state.game_loop
+        for unit in bot.enemy_units:
+            self.remember(unit, self.game_loop)
+        for struct in bot.enemy_structures:
+            self.remember(struct, self.game_loop)
+
+        for tag, entry in list(self.entries.items()):
+            if entry["last_seen"] == self.game_loop:
+                continue
+            if entry["is_structure"]:
+                # we can see where it should be, but it isn't there anymore
+                if bot.is_visible(entry["position"]):
+                    self.forget(tag)
+            elif self.game_loop - entry["last_seen"] > self.unit_expiry_loops:
+                self.forget(tag)
+
+    def is_visible(self, tag):
+        """Check if a remembered unit/structure was seen during the last update"""
+        return self.entries[tag]["last_seen"] == self.game_loop
+
+    def get_structures(self, townhalls_only=False):
+        """Get the snapshots of every structure we remember
+
+        Argument Keywords:
+            townhalls_only  {bool}  --  only return townhalls
+
+        Raises:
+            N/A
+
+        Returns:
+            {list} -- (tag, entry) of every remembered structure
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            entries         {dict}
+            structure_tags  {set}
+            townhall_tags   {set}
+        """
+        tags = self.townhall_tags if townhalls_only else self.structure_tags
+        return [(tag, self.entries[tag]) for tag in tags]
+
+    def get_closest_structure(self, pos, townhalls_only=False):
+        """Get the last-seen position of the remembered structure that's
+        closest to a position, or None if we don't remember any"""
+        structures = self.get_structures(townhalls_only)
+        if not structures:
+            return None
+        return min((entry["position"] for _, entry in structures), \
+                    key=lambda p: p.distance_to_point2(pos))
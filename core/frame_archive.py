@@ -0,0 +1,287 @@
+"""
+    This module contains a compressed archive format for a game's intel
+    frames, and the reader that decodes them.
+
+    Consecutive intel frames of a game only differ in a few pixels, so frames
+    are stored in groups: the first frame of a group is a keyframe, and every
+    other frame is stored as the XOR of it and the frame before it, which is
+    almost all zeros. Each group (its one-hot choices and its frames) is then
+    compressed on its own with zlib. The archive's index holds the byte
+    offset/length and first sample of every group, so any sample can be
+    decoded by decompressing just its group, and a batch of samples only
+    decompresses each group it touches once.
+
+    An archived game looks like this:
+        <training_data_dir>/<name>/
+            meta.json   --  no. of samples, shapes, keyframe interval
+            frames.bin  --  compressed groups, back to back
+            index.npy   --  (G, 4) int64 offset, length, first sample and no.
+                            of samples of each group
+
+    To compare an archive's size and decode throughput to the .npy files:
+        python -m core.frame_archive <saved game> [<saved game> ...]
+"""
+import os
+import json
+import time
+import zlib
+import argparse
+import tempfile
+import numpy as np
+
+INDEX_OFFSET = 0
+INDEX_LENGTH = 1
+INDEX_START = 2
+INDEX_COUNT = 3
+
+
+def encode_group(frames, labels, level=1):
+    """Compress a group of consecutive frames (and their choices) into one
+    blob, the first frame as is and the rest as XOR deltas
+
+    Argument Keywords:
+        frames  {numpy.ndarray} --  (N, height, width, 3) uint8 intel frames
+        labels  {numpy.ndarray} --  (N, num_choices) uint8 one-hot choices
+        level   {int}           --  zlib compression level (1 is fastest)
+
+    Raises:
+        N/A
+
+    Returns:
+        {bytes} -- compressed group
+    """
+    deltas = np.empty_like(frames)
+    deltas[0] = frames[0]
+    np.bitwise_xor(frames[1:], frames[:-1], out=deltas[1:])
+    return zlib.compress(np.ascontiguousarray(labels, dtype=np.uint8).tobytes() + \
+                            deltas.tobytes(), level)
+
+
+def decode_group(blob, num_samples, frame_shape, num_choices, num_frames=None):
+    """Decompress a group back into its frames and choices
+
+    Argument Keywords:
+        blob        {bytes}     --  group compressed by encode_group()
+        num_samples {int}       --  no. of frames in the group
+        frame_shape {tuple}     --  (height, width, 3)
+        num_choices {int}       --  no. of choices in a label
+        num_frames  {int}       --  only decode the group's first few frames
+                                    (None for all of them)
+
+    Raises:
+        N/A
+
+    Returns:
+        {tuple} -- (num_frames, height, width, 3) frames, (N, num_choices)
+                   labels
+    """
+    if num_frames is None:
+        num_frames = num_samples
+    num_label_bytes = num_samples*num_choices
+    # the stream's only decompressed as far as the last frame we need
+    raw = zlib.decompressobj().decompress(blob, num_label_bytes + \
+                                            num_frames*int(np.prod(frame_shape)))
+    labels = np.frombuffer(raw, dtype=np.uint8, count=num_label_bytes)
+    frames = np.frombuffer(raw, dtype=np.uint8, offset=num_label_bytes)
+    frames = frames.reshape((num_frames,) + tuple(frame_shape)).copy()
+    # undo the deltas one whole frame at a time (much faster than accumulate() along axis 0)
+    for i in range(1, num_frames):
+        np.bitwise_xor(frames[i], frames[i - 1], out=frames[i])
+    return frames, labels.reshape(num_samples, num_choices)
+
+
+def is_archive(path):
+    """Check if a saved game's directory is a frame archive"""
+    return os.path.isfile(os.path.join(path, 'frames.bin'))
+
+
+class FrameArchive():
+    """
+    Random access reader of an archived game
+    """
+    def __init__(self, path):
+        """Reads the archive's meta.json and index, and memory maps its data
+
+        Argument Keywords:
+            path    {string}    --  archived game's directory
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            meta        {dict}          --  the game's meta.json
+            index       {numpy.ndarray} --  (G, 4) group offsets/lengths/
+                                            first sample/no. of samples
+            frame_shape {tuple}
+            num_choices {int}
+
+        Attributes Referenced:
+            N/A
+        """
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            self.meta = json.load(meta_file)
+        self.index = np.load(os.path.join(path, self.meta["index"]))
+        self.frame_shape = tuple(self.meta["frame_shape"])
+        self.num_choices = self.meta["num_choices"]
+        data_path = os.path.join(path, self.meta["data"])
+        self._data = np.memmap(data_path, dtype=np.uint8, mode='r') \
+                        if os.path.getsize(data_path) else np.zeros(0, np.uint8)
+        self._last = (None, None) # last decoded group, most reads are sequential
+
+    def __len__(self):
+        return int(self.index[:, INDEX_COUNT].sum()) if len(self.index) else 0
+
+    def get_group(self, g, num_frames=None):
+        """Decode the g-th group's (frames, labels), or just its first few
+        frames"""
+        offset, length, _, count = self.index[g]
+        num_frames = count if num_frames is None else num_frames
+        if self._last[0] != g or len(self._last[1][0]) < num_frames:
+            self._last = (g, decode_group(self._data[offset:offset + length], count, \
+                                            self.frame_shape, self.num_choices, num_frames))
+        return self._last[1]
+
+    def get(self, i):
+        """Decode the i-th sample's (label, frame)"""
+        g = int(np.searchsorted(self.index[:, INDEX_START], i, side='right')) - 1
+        j = i - self.index[g, INDEX_START]
+        frames, labels = self.get_group(g, j + 1)
+        return labels[j], frames[j]
+
+    def get_batch(self, indices, out=None):
+        """Decode many samples, decompressing each group they're in only once
+
+        Argument Keywords:
+            indices {list}          --  sample indices, in any order
+            out     {numpy.ndarray} --  (len(indices), height, width, 3) uint8
+                                        array to decode into, or None to make
+                                        a new one
+
+        Raises:
+            N/A
+
+        Returns:
+            {tuple} -- frames and labels of those samples, in that order
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if out is None:
+            out = np.empty((len(indices),) + self.frame_shape, np.uint8)
+        labels = np.empty((len(indices), self.num_choices), np.uint8)
+        groups = np.searchsorted(self.index[:, INDEX_START], indices, side='right') - 1
+        for g in np.unique(groups):
+            rows = np.flatnonzero(groups == g)
+            within = indices[rows] - self.index[g, INDEX_START]
+            frames, group_labels = self.get_group(int(g), int(within.max()) + 1)
+            out[rows] = frames[within]
+            labels[rows] = group_labels[within]
+        return out, labels
+
+    def get_labels(self):
+        """Get every sample's label, only decompressing the start of each
+        group (where its labels are)"""
+        labels = [np.frombuffer(zlib.decompressobj().decompress(\
+                    self._data[offset:offset + length], count*self.num_choices), dtype=np.uint8) \
+                    for offset, length, _, count in self.index]
+        return np.concatenate(labels).reshape(-1, self.num_choices) if labels else \
+                np.zeros((0, self.num_choices), np.uint8)
+
+    def iter_groups(self):
+        """Decode the whole archive, one group's (frames, labels) at a time"""
+        for g in range(len(self.index)):
+            yield self.get_group(g)
+
+
+def compare(paths, batch_size=32, num_batches=50, keyframe_interval=16, level=1):
+    """Archives saved games in a temporary directory and compares their size
+    and decode throughput to the .npy files the bot saves
+
+    Argument Keywords:
+        paths               {list}  --  saved games (directories or .npy)
+        batch_size          {int}   --  no. of random samples per batch
+        num_batches         {int}   --  no. of random batches to time
+        keyframe_interval   {int}   --  no. of frames per group
+        level               {int}   --  zlib compression level
+
+    Raises:
+        N/A
+
+    Returns:
+        {dict} -- "npy" and "archive" -> {"mb", "seq_fps", "batch_fps"}
+    """
+    from .training_data import ArchiveDataWriter, load_game_data
+
+    results = {"npy": {"mb": 0.0, "sec": 0.0, "batch_sec": 0.0},
+               "archive": {"mb": 0.0, "sec": 0.0, "batch_sec": 0.0}}
+    num_samples = 0
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n, path in enumerate(paths):
+            data = load_game_data(path)
+            if not data:
+                continue
+            frames = np.stack([frame for _, frame in data])
+            labels = np.stack([label for label, _ in data]).astype(np.uint8)
+            num_samples += len(frames)
+
+            # what the bot saves: uncompressed .npy frames and labels
+            npy_path = os.path.join(tmp_dir, 'frames_%d.npy' % n)
+            np.save(npy_path, frames)
+            np.save(os.path.join(tmp_dir, 'labels_%d.npy' % n), labels)
+            results["npy"]["mb"] += (os.path.getsize(npy_path) + labels.nbytes)/1e6
+            start = time.perf_counter()
+            np.load(npy_path)
+            results["npy"]["sec"] += time.perf_counter() - start
+
+            writer = ArchiveDataWriter(tmp_dir, keyframe_interval, frames.shape[1:], \
+                                        labels.shape[1], level=level)
+            for label, frame in zip(labels, frames):
+                writer.append(label, frame)
+            archive_path = writer.finalize('archive_%d' % n)
+            results["archive"]["mb"] += sum(os.path.getsize(os.path.join(archive_path, f)) \
+                                            for f in os.listdir(archive_path))/1e6
+            start = time.perf_counter()
+            decoded = np.concatenate([f for f, _ in FrameArchive(archive_path).iter_groups()])
+            results["archive"]["sec"] += time.perf_counter() - start
+            assert np.array_equal(decoded, frames), 'archive of %s is not lossless' % path
+
+            # random batches, like a training input pipeline would read them
+            frames_mmap = np.load(npy_path, mmap_mode='r')
+            archive = FrameArchive(archive_path)
+            batches = [rng.integers(0, len(frames), batch_size) for _ in range(num_batches)]
+            start = time.perf_counter()
+            for batch in batches:
+                np.array(frames_mmap[np.sort(batch)])
+            results["npy"]["batch_sec"] += time.perf_counter() - start
+            start = time.perf_counter()
+            for batch in batches:
+                archive.get_batch(batch)
+            results["archive"]["batch_sec"] += time.perf_counter() - start
+
+    num_batched = len(paths)*batch_size*num_batches
+    return {name: {"mb": res["mb"],
+                   "seq_fps": num_samples/max(res["sec"], 1e-9),
+                   "batch_fps": num_batched/max(res["batch_sec"], 1e-9)} \
+            for name, res in results.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', type=str, nargs='+', \
+                        help='saved games (directories or .npy files) to compare with')
+    parser.add_argument('-k', dest='keyframe_interval', type=int, default=16, \
+                        help='no. of frames per compressed group')
+    parser.add_argument('-l', dest='level', type=int, default=1, \
+                        help='zlib compression level')
+    args = parser.parse_args()
+
+    results = compare(args.paths, keyframe_interval=args.keyframe_interval, level=args.level)
+    print('{:<8} {:>10} {:>16} {:>18}'.format('format', 'size MB', 'full decode fps', \
+                                                'random batch fps'))
+    for name, res in results.items():
+        print('{:<8} {:>10.2f} {:>16.0f} {:>18.0f}'.format(\
+                name, res['mb'], res['seq_fps'], res['batch_fps']))
+    print('archive is {:.1f}x smaller'.format(results['npy']['mb']/max(results['archive']['mb'], \
+                                                                        1e-9)))
@@ -0,0 +1,265 @@
+"""
+    This module contains a worker thread that runs our DNN model off of the
+    bot's event loop.
+
+    Running a prediction blocks for tens of milliseconds, which is a long time
+    to hold up on_step(). Instead, the bot drops its newest intel frame into
+    a single slot and the worker thread always runs the model on whatever's in
+    that slot (older frames that were never picked up are simply replaced).
+    The latest prediction is published along with the game loop of the frame
+    it was made from, so the bot can read it without waiting and we can keep
+    track of how stale its decisions are. If the model fails on a frame (ex:
+    the inference server timed out), the error's logged and the bot keeps
+    the last good prediction until the model works again.
+
+    Consecutive intel frames barely change, so a decision cache also keeps
+    the model from being run on frames that look the same as the last one
+    and can limit how many decisions we make per game second (no limit by
+    default).
+"""
+import math
+import logging
+import threading
+import cv2 # pip install opencv-python
+import numpy as np
+
+
+class InferenceWorker():
+    """
+    Runs a model on the newest intel frame in a background thread
+    """
+    def __init__(self, predict_fn, input_shape=(176, 200, 3)):
+        """Sets up an empty frame slot and prediction
+
+        Argument Keywords:
+            predict_fn  {callable}  --  takes a batch of intel frames and
+                                        returns a batch of predictions
+            input_shape {tuple}     --  shape of a single intel frame
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            predict_fn      {callable}
+            input_shape     {tuple}
+            num_submitted   {int}   --  no. of frames handed to the worker
+            num_inferred    {int}   --  no. of frames the model was run on
+            num_errors      {int}   --  no. of frames the model failed on
+            num_reads       {int}   --  no. of times a prediction was read
+            staleness_sum   {int}   --  sum of the age (in game loops) of
+                                        every prediction that was read
+            staleness_max   {int}   --  oldest prediction that was read
+
+        Attributes Referenced:
+            N/A
+        """
+        self.logger = logging.getLogger('inference')
+        self.predict_fn = predict_fn
+        self.input_shape = tuple(input_shape)
+        self.num_submitted = 0
+        self.num_inferred = 0
+        self.num_errors = 0
+        self.num_reads = 0
+        self.staleness_sum = 0
+        self.staleness_max = 0
+        self._cond = threading.Condition()
+        self._frame = None # (frame, game_loop) waiting to be picked up
+        self._latest = (None, None) # (prediction, game_loop of its frame)
+        self._healthy = True # whether the model worked on the last frame
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread"""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='InferenceWorker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker thread once it's done with its current frame"""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, frame, game_loop):
+        """Hand the newest intel frame over to the worker, replacing any frame
+        that it hasn't gotten to yet"""
+        with self._cond:
+            self._frame = (frame, game_loop)
+            self.num_submitted += 1
+            self._cond.notify()
+
+    def get_latest(self, game_loop):
+        """Get the newest prediction without waiting for the worker
+
+        Argument Keywords:
+            game_loop   {int}   --  current game loop, used to work out how
+                                    stale the prediction is
+
+        Raises:
+            N/A
+
+        Returns:
+            {numpy.ndarray} -- newest good prediction, or None if the model
+                               hasn't worked on any frame yet
+
+        Attributes Affected:
+            num_reads       {int}
+            staleness_sum   {int}
+            staleness_max   {int}
+
+        Attributes Referenced:
+            N/A
+        """
+        with self._cond:
+            prediction, frame_loop = self._latest
+        if prediction is None:
+            return None
+        staleness = game_loop - frame_loop
+        self.num_reads += 1
+        self.staleness_sum += staleness
+        self.staleness_max = max(self.staleness_max, staleness)
+        return prediction
+
+    def is_healthy(self):
+        """Check if the model worked on the last frame it was run on"""
+        return self._healthy
+
+    def get_mean_staleness(self):
+        """Get the average age (in game loops) of the predictions we've read"""
+        return self.staleness_sum / max(self.num_reads, 1)
+
+    def _run(self):
+        """Worker thread's loop: wait for a frame, run the model on it and
+        publish the result"""
+        while True:
+            with self._cond:
+                while self._running and self._frame is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, frame_loop = self._frame
+                self._frame = None
+
+            try:
+                prediction = self.predict_fn(np.reshape(frame, (-1,) + self.input_shape))
+            except Exception: # keep the last good prediction and wait for the next frame
+                self.logger.exception('Model failed on the frame of game loop %d', frame_loop)
+                with self._cond:
+                    self.num_errors += 1
+                    self._healthy = False
+                continue
+
+            with self._cond:
+                self._latest = (np.asarray(prediction)[0], frame_loop)
+                self.num_inferred += 1
+                self._healthy = True
+
+
+class DecisionCache():
+    """
+    Decides when the model needs to be run again by fingerprinting intel
+    frames and limiting how often we make a new decision
+    """
+    def __init__(self, max_decisions_per_sec=0.0, grid_size=(25, 22), num_levels=8):
+        """Sets up an empty cache
+
+        Argument Keywords:
+            max_decisions_per_sec   {float} --  max no. of times per game
+                                                second we run the model (0 for
+                                                no limit)
+            grid_size               {tuple} --  (width, height) that frames are
+                                                downsampled to before they're
+                                                fingerprinted
+            num_levels              {int}   --  no. of intensity levels each
+                                                downsampled pixel is quantized
+                                                to
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            min_interval_loops  {float} --  min no. of game loops b/w decisions
+            grid_size           {tuple}
+            level_size          {int}
+            fingerprint         {bytes} --  fingerprint of the last frame the
+                                            model was run on
+            decision_loop       {int}   --  game loop of that frame
+            prediction          {numpy.ndarray} --  model's last prediction
+            num_hits            {int}   --  no. of frames that looked the same
+            num_throttled       {int}   --  no. of frames skipped because we
+                                            decided too recently
+            num_misses          {int}   --  no. of frames the model had to
+                                            be run on
+
+        Attributes Referenced:
+            N/A
+        """
+        self.min_interval_loops = 22.4/max_decisions_per_sec if max_decisions_per_sec > 0 else 0
+        self.grid_size = tuple(grid_size)
+        self.level_size = 256 // num_levels
+        self.fingerprint = None
+        self.decision_loop = -math.inf
+        self.prediction = None
+        self.num_hits = 0
+        self.num_throttled = 0
+        self.num_misses = 0
+
+    def get_fingerprint(self, frame):
+        """Downsample and quantize an intel frame into a short fingerprint"""
+        small = cv2.resize(frame, self.grid_size, interpolation=cv2.INTER_AREA)
+        return (small // self.level_size).astype(np.uint8).tobytes()
+
+    def is_hit(self, frame, game_loop):
+        """Check if the last decision can be reused for a frame, either
+        because the frame looks the same as the one it was made from or
+        because we've made a decision too recently. On a miss, the frame
+        becomes the one that the next decision is expected to be made from
+
+        Argument Keywords:
+            frame       {numpy.ndarray} --  current intel frame
+            game_loop   {int}           --  current game loop
+
+        Raises:
+            N/A
+
+        Returns:
+            {bool} -- True if the model doesn't need to be run
+
+        Attributes Affected:
+            fingerprint     {bytes}
+            decision_loop   {int}
+            num_hits        {int}
+            num_throttled   {int}
+            num_misses      {int}
+
+        Attributes Referenced:
+            min_interval_loops  {float}
+        """
+        if game_loop - self.decision_loop < self.min_interval_loops:
+            self.num_throttled += 1
+            return True
+        fingerprint = self.get_fingerprint(frame)
+        if fingerprint == self.fingerprint:
+            self.num_hits += 1
+            return True
+        self.fingerprint = fingerprint
+        self.decision_loop = game_loop
+        self.num_misses += 1
+        return False
+
+    def store(self, prediction):
+        """Remember the model's prediction for the last missed frame"""
+        self.prediction = prediction
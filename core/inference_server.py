@@ -0,0 +1,296 @@
+"""
+    This module contains a local inference server that many bots (ex: games
+    running in parallel) can share.
+
+    The server loads the model at model_location once and listens on a local
+    socket. Every bot that connects to it sends its intel frames over and
+    waits for the model's prediction. Requests that come in within a small
+    window of each other are micro-batched into a single model call, so N
+    games cost one TensorFlow runtime and one batch-of-N call instead of N of
+    each. The server logs its throughput (decisions per second) and the
+    latency of each request.
+
+    Start the server with:
+        python -m core.inference_server -m <model_location> -p 6000
+    and set inference_server = 'localhost:6000' in each bot's config.
+"""
+import time
+import queue
+import argparse
+import threading
+from multiprocessing.connection import Listener, Client
+import numpy as np
+import utils # from main project
+
+DEFAULT_AUTHKEY = b'sc2-inference'
+
+
+def parse_address(address):
+    """Turn a "host:port" string into a (host, port) tuple"""
+    host, port = address.rsplit(':', 1)
+    return (host or 'localhost', int(port))
+
+
+class InferenceError(Exception):
+    """
+    Sent back to a bot in place of a prediction when the model fails on its
+    frame
+    """
+
+
+class InferenceServer():
+    """
+    Serves model predictions to many bots, micro-batching their requests
+    """
+    def __init__(self, backend, address, batch_window_ms=2.0, max_batch_size=32, \
+                    authkey=DEFAULT_AUTHKEY):
+        """Sets up the server (it isn't listening until serve_forever() runs)
+
+        Argument Keywords:
+            backend         {object}    --  inference backend with a
+                                            predict(batch) method
+            address         {tuple}     --  (host, port) to listen on
+            batch_window_ms {float}     --  how long to wait for more requests
+                                            after the first one of a batch
+            max_batch_size  {int}       --  max no. of frames in a batch
+            authkey         {bytes}     --  key clients need to connect
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            backend         {object}
+            address         {tuple}
+            batch_window_sec{float}
+            max_batch_size  {int}
+            authkey         {bytes}
+            num_requests    {int}   --  no. of frames predicted
+            num_batches     {int}   --  no. of model calls
+            num_errors      {int}   --  no. of frames the model failed on
+            latencies_ms    {list}  --  time b/w receiving each request and
+                                        sending its reply
+
+        Attributes Referenced:
+            N/A
+        """
+        self.logger, _ = utils.build_logger('inference_server')
+        self.backend = backend
+        self.address = address
+        self.batch_window_sec = batch_window_ms/1000
+        self.max_batch_size = max_batch_size
+        self.authkey = authkey
+        self.num_requests = 0
+        self.num_batches = 0
+        self.num_errors = 0
+        self.latencies_ms = []
+        self._requests = queue.Queue() # (received time, frame, connection)
+        self._start_time = None
+
+    def handle_client(self, conn):
+        """Client thread: queue up every frame a client sends until it
+        disconnects"""
+        try:
+            while True:
+                frame = conn.recv()
+                self._requests.put((time.perf_counter(), frame, conn))
+        except (EOFError, ConnectionError):
+            conn.close()
+
+    def accept_clients(self, listener):
+        """Listener thread: start a client thread for each bot that connects"""
+        while True:
+            conn = listener.accept()
+            self.logger.info('Bot connected from %s', listener.last_accepted)
+            threading.Thread(target=self.handle_client, args=(conn,), daemon=True).start()
+
+    def next_batch(self):
+        """Wait for a request, then gather up every request that comes in
+        within the batch window (up to max_batch_size)"""
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.batch_window_sec
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def run_batch(self, batch):
+        """Run the model on a batch of requests and reply to each of them. If
+        the batch fails (ex: a bot sent a frame of the wrong shape), its
+        frames are run one at a time so only the bad ones get an error back"""
+        try:
+            replies = list(self.backend.predict(np.stack([frame for _, frame, _ in batch])))
+        except Exception: # keep serving everyone else
+            self.logger.exception('Batch of %d frames failed, running them one at a time', \
+                                    len(batch))
+            replies = [self.predict_one(frame) for _, frame, _ in batch]
+            self.num_errors += sum(isinstance(reply, Exception) for reply in replies)
+        now = time.perf_counter()
+        for (received, _, conn), reply in zip(batch, replies):
+            try:
+                conn.send(reply)
+            except (OSError, ConnectionError):
+                continue # the bot's gone
+            self.latencies_ms.append((now - received)*1000)
+        self.num_requests += len(batch)
+        self.num_batches += 1
+
+    def predict_one(self, frame):
+        """Run the model on a single frame, getting the error back instead if
+        it fails"""
+        try:
+            return self.backend.predict(np.asarray(frame)[None])[0]
+        except Exception as exp:
+            return InferenceError('{}: {}'.format(type(exp).__name__, exp))
+
+    def get_stats(self):
+        """Get the server's throughput and request latency so far"""
+        elapsed = time.perf_counter() - self._start_time if self._start_time else 0
+        latencies = self.latencies_ms if self.latencies_ms else [0]
+        return {
+            "decisions_per_sec": self.num_requests / max(elapsed, 1e-9),
+            "mean_batch_size": self.num_requests / max(self.num_batches, 1),
+            "median_latency_ms": float(np.median(latencies)),
+            "p95_latency_ms": float(np.percentile(latencies, 95))
+        }
+
+    def serve_forever(self, report_every_sec=30):
+        """Listen for bots and serve their requests until interrupted"""
+        listener = Listener(self.address, authkey=self.authkey)
+        self.logger.info('Serving predictions on %s:%d', *self.address)
+        threading.Thread(target=self.accept_clients, args=(listener,), daemon=True).start()
+        self._start_time = time.perf_counter()
+        last_report = self._start_time
+        try:
+            while True:
+                self.run_batch(self.next_batch())
+                if time.perf_counter() - last_report > report_every_sec:
+                    self.log_stats()
+                    self.latencies_ms = self.latencies_ms[-10000:]
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.log_stats()
+            listener.close()
+
+    def log_stats(self):
+        """Log the server's throughput and request latency"""
+        stats = self.get_stats()
+        self.logger.info(('%d decisions in %d batches (avg %.1f per batch, %d failed) | ' + \
+                            '%.1f decisions/sec | latency median %.2f ms, p95 %.2f ms'), \
+                            self.num_requests, self.num_batches, stats['mean_batch_size'], \
+                            self.num_errors, \
+                            stats['decisions_per_sec'], stats['median_latency_ms'], \
+                            stats['p95_latency_ms'])
+
+
+class RemoteBackend():
+    """
+    Inference backend that gets its predictions from an InferenceServer
+    """
+    def __init__(self, address, authkey=DEFAULT_AUTHKEY, timeout_sec=10.0):
+        """Connects to an inference server
+
+        Argument Keywords:
+            address     {string}    --  "host:port" the server listens on
+            authkey     {bytes}     --  key the server expects
+            timeout_sec {float}     --  max time to wait for a reply
+
+        Raises:
+            ConnectionRefusedError  --  if the server isn't running
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_requests    {int}   --  no. of frames sent to the server
+            total_ms        {float} --  total round-trip time of all requests
+            num_pending     {int}   --  no. of replies that timed out and are
+                                        still to come
+
+        Attributes Referenced:
+            N/A
+        """
+        self._conn = Client(parse_address(address), authkey=authkey)
+        self.timeout_sec = timeout_sec
+        self._lock = threading.Lock()
+        self.num_requests = 0
+        self.total_ms = 0.0
+        self.num_pending = 0
+
+    def drain(self):
+        """Throw away the replies to requests that timed out, so the next reply
+        we read is the one to our next request
+
+        Raises:
+            TimeoutError    --  if they still haven't come in
+        """
+        while self.num_pending:
+            if not self._conn.poll(self.timeout_sec):
+                raise TimeoutError('Still waiting on {} replies from the inference server'.format(\
+                                    self.num_pending))
+            self._conn.recv()
+            self.num_pending -= 1
+
+    def predict(self, batch):
+        """Get the model's prediction for a batch of intel frames
+
+        Raises:
+            InferenceError  --  if the model failed on one of the frames
+            TimeoutError    --  if the server doesn't reply in time
+        """
+        predictions = []
+        with self._lock: # replies come back in order, one connection at a time
+            self.drain()
+            for frame in batch:
+                start = time.perf_counter()
+                self._conn.send(np.ascontiguousarray(frame, dtype=np.uint8))
+                self.num_pending += 1
+                if not self._conn.poll(self.timeout_sec):
+                    raise TimeoutError('No reply from the inference server in {} s'.format(\
+                                        self.timeout_sec))
+                reply = self._conn.recv()
+                self.num_pending -= 1
+                if isinstance(reply, Exception):
+                    raise reply
+                predictions.append(reply)
+                self.total_ms += (time.perf_counter() - start)*1000
+                self.num_requests += 1
+        return np.array(predictions)
+
+    def get_mean_latency_ms(self):
+        """Get the average round-trip time of a request"""
+        return self.total_ms / max(self.num_requests, 1)
+
+    def close(self):
+        """Disconnect from the server"""
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    from .backends import get_backend
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m', dest='model_location', type=str, required=True, \
+                        help='path to the saved Keras model')
+    parser.add_argument('-p', dest='port', type=int, default=6000, \
+                        help='port to listen on (localhost only)')
+    parser.add_argument('-b', dest='backend', type=str, default='KERAS', \
+                        help='inference backend to run the model with')
+    parser.add_argument('-w', dest='batch_window_ms', type=float, default=2.0, \
+                        help='how long to wait for more requests to batch together')
+    parser.add_argument('-s', dest='max_batch_size', type=int, default=32, \
+                        help='max no. of frames in a batch')
+    args = parser.parse_args()
+
+    runner, _ = get_backend(args.model_location, utils.INFERENCE_BACKEND[args.backend.upper()])
+    InferenceServer(runner, ('localhost', args.port), args.batch_window_ms, \
+                    args.max_batch_size).serve_forever()
@@ -0,0 +1,216 @@
+"""
+    This module contains the tf.data input pipeline that feeds training, and
+    a callback that tells whether training is waiting on it.
+
+    Training used to load a chunk of games serially, build Python lists out
+    of them and only then call model.fit(), so the CPU sat idle while games
+    were read and the disk sat idle while the model trained. Instead, the
+    pipeline streams the samples we've picked out of every game:
+        - only the samples we use are read out of each game (and decoded,
+          ex: decompressed or rasterized), by several parallel readers whose
+          samples are interleaved together
+        - samples go through a shuffle buffer, so batches mix many games
+        - batches are cast to float in parallel and prefetched, so the next
+          ones are ready while the model trains on the current one
+    Compacted datasets (see shards.py) are shuffled as sample indices
+    instead, and each batch is gathered straight out of the memory-mapped
+    shards.
+
+    PipelineTimer times the pipeline on its own (once, the first time
+    training begins) and every training step, and reports at the end of each
+    epoch if training's input-bound (waiting on the pipeline) or
+    compute-bound (waiting on the model).
+"""
+import os
+import time
+import numpy as np
+import tensorflow as tf # get keras like so: tf.keras
+from .training_data import load_game_samples
+
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+FRAME_SHAPE = (176, 200, 3)
+NUM_CHOICES = 4
+
+
+def make_dataset(read_game, num_games, batch_size=50, training=True, shuffle_buffer=1024, \
+                    cycle_length=4):
+    """Builds the input pipeline over a set of games
+
+    Argument Keywords:
+        read_game       {callable}  --  takes a game's no. and yields the
+                                        (frames, labels) arrays to use from
+                                        it, a chunk at a time
+        num_games       {int}       --  no. of games
+        batch_size      {int}       --  no. of samples per batch
+        training        {bool}      --  shuffle the games and samples (not
+                                        needed for validation)
+        shuffle_buffer  {int}       --  no. of samples shuffled together
+                                        (each one's ~105 KB)
+        cycle_length    {int}       --  no. of games read in parallel
+
+    Raises:
+        N/A
+
+    Returns:
+        {tf.data.Dataset} -- batches of (float32 frames, float32 labels)
+    """
+    def read(k):
+        return tf.data.Dataset.from_generator(read_game, (tf.uint8, tf.uint8), \
+                ((None,) + FRAME_SHAPE, (None, NUM_CHOICES)), args=(k,))
+
+    dataset = tf.data.Dataset.range(num_games)
+    if training:
+        dataset = dataset.shuffle(num_games, reshuffle_each_iteration=True)
+    dataset = dataset.interleave(read, cycle_length=cycle_length, num_parallel_calls=AUTOTUNE)
+    dataset = dataset.unbatch()
+    if training:
+        dataset = dataset.shuffle(shuffle_buffer)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(lambda frames, labels: (tf.cast(frames, tf.float32), \
+                            tf.cast(labels, tf.float32)), num_parallel_calls=AUTOTUNE)
+    options = tf.data.Options()
+    options.deterministic = False # take whichever game's ready first
+    return dataset.with_options(options).prefetch(AUTOTUNE)
+
+
+def make_game_reader(data_dir, names, indices):
+    """Makes a read_game() for make_dataset() that only loads the samples
+    picked out of each game
+
+    Argument Keywords:
+        data_dir    {string}    --  directory of saved games
+        names       {list}      --  game names
+        indices     {list}      --  for every game, the sorted indices of
+                                    its samples to use
+
+    Raises:
+        N/A
+
+    Returns:
+        {callable} -- read_game(k)
+    """
+    def read_game(k):
+        k = int(k)
+        if len(indices[k]):
+            yield load_game_samples(os.path.join(data_dir, names[k]), indices[k])
+    return read_game
+
+
+def make_shard_dataset(dataset, indices, batch_size=50, training=True):
+    """Builds the input pipeline over samples of a compacted dataset. Every
+    sample can be read on its own, so the whole dataset's shuffled as
+    indices and each batch is gathered straight from the shards
+
+    Argument Keywords:
+        dataset     {ShardDataset}  --  memory-mapped shards
+        indices     {numpy.ndarray} --  the samples to use
+        batch_size  {int}           --  no. of samples per batch
+        training    {bool}          --  shuffle the samples (not needed for
+                                        validation)
+
+    Raises:
+        N/A
+
+    Returns:
+        {tf.data.Dataset} -- batches of (float32 frames, float32 labels)
+    """
+    def gather(batch):
+        # sorted, a batch's frames are read in order and copied only once
+        return dataset.get_batch(np.sort(batch))
+
+    def to_batch(batch):
+        frames, labels = tf.numpy_function(gather, [batch], (tf.uint8, tf.uint8))
+        frames.set_shape((None,) + FRAME_SHAPE)
+        labels.set_shape((None, NUM_CHOICES))
+        return tf.cast(frames, tf.float32), tf.cast(labels, tf.float32)
+
+    samples = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if training:
+        samples = samples.shuffle(len(indices), reshuffle_each_iteration=True)
+    batches = samples.batch(batch_size).map(to_batch, num_parallel_calls=AUTOTUNE)
+    return batches.prefetch(AUTOTUNE)
+
+
+def time_pipeline(dataset, num_batches=20, num_warmup=5):
+    """Get how long the pipeline takes to make a batch on its own (after
+    filling its shuffle buffer), in ms"""
+    iterator = iter(dataset)
+    start = None
+    num_timed = 0
+    for i in range(num_warmup + num_batches):
+        if i == num_warmup:
+            start = time.perf_counter()
+        try:
+            next(iterator)
+        except StopIteration:
+            break
+        num_timed += i >= num_warmup
+    if not num_timed:
+        return 0.0
+    return (time.perf_counter() - start)*1000/num_timed
+
+
+class PipelineTimer(tf.keras.callbacks.Callback):
+    """
+    Reports whether training's bound by its input pipeline or by the model
+    """
+    def __init__(self, dataset, num_batches=20):
+        """Keeps the pipeline around so it can be timed on its own. It's only
+        timed once, so the same timer can be used across many fit() calls
+        (ex: one per epoch) without pulling extra batches out of each one
+
+        Argument Keywords:
+            dataset     {tf.data.Dataset}   --  training input pipeline
+            num_batches {int}               --  no. of batches to time it on
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            input_ms    {float} --  ms the pipeline takes to make a batch on
+                                    its own (None until it's been timed)
+            step_ms     {list}  --  ms each training step took (which
+                                    includes waiting for its batch)
+
+        Attributes Referenced:
+            N/A
+        """
+        tf.keras.callbacks.Callback.__init__(self)
+        self.dataset = dataset
+        self.num_batches = num_batches
+        self.input_ms = None
+        self.step_ms = []
+        self._start = None
+
+    def on_train_begin(self, logs=None):
+        if self.input_ms is None:
+            self.input_ms = time_pipeline(self.dataset, self.num_batches)
+            self.dataset = None # not needed anymore
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.step_ms = []
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step_ms.append((time.perf_counter() - self._start)*1000)
+
+    def on_epoch_end(self, epoch, logs=None):
+        if not self.step_ms:
+            return
+        # the first steps include tracing the model and filling the shuffle buffer
+        step_ms = float(np.median(self.step_ms))
+        # the model can't train faster than the pipeline makes batches, so if a step takes about as
+        # long as the pipeline does on its own, the model's waiting on it
+        input_share = min(self.input_ms/max(step_ms, 1e-9), 1.0)
+        bound = 'input-bound' if input_share > 0.8 else 'compute-bound'
+        print(('Input pipeline: {:.1f} ms/batch on its own, training step {:.1f} ms/batch ' +
+                '(median of {}) -> {} (pipeline ~{:.0f}% of a step)').format(\
+                self.input_ms, step_ms, len(self.step_ms), bound, input_share*100))
+        if logs is not None:
+            logs['input_ms_per_batch'] = self.input_ms
+            logs['step_ms_per_batch'] = step_ms
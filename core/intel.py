@@ -0,0 +1,100 @@
+"""
+    This module contains the compact, entity-level form of our intel map and
+    the rasterizer that turns it into the image our DNN sees.
+
+    Every step, gather_intelligence() records one row per unit/structure it
+    plots (type id, owner, position, radius and its role, which picks its
+    color from a palette) plus the five HUD scalars drawn in the top-left
+    corner. The intel image is then rasterized from that table, so saving the
+    table instead of the image (a few hundred bytes instead of ~105 KB) and
+    rasterizing it again at training time gives back the exact same image.
+    Other input encodings can also be built from the same tables.
+"""
+import cv2 # pip install opencv-python
+import numpy as np
+
+#------------------------------------------------------------------------------
+# one row per plotted unit/structure, in the order they're plotted. Positions
+# and radii are stored as the integer pixels they're drawn at
+#------------------------------------------------------------------------------
+ENTITY_DTYPE = np.dtype([
+    ('type_id', np.uint16),
+    ('owner', np.uint8),
+    ('x', np.int16),
+    ('y', np.int16),
+    ('radius', np.int16),
+    ('role', np.uint8)])
+
+OWNER_SELF = 1
+OWNER_ENEMY = 2
+
+#------------------------------------------------------------------------------
+# HUD scalars, in the order they're stored, along with the row (y) and color
+# (BGR) of the line each one is drawn as
+#------------------------------------------------------------------------------
+HUD_FIELDS = ['military_weight', 'plausible_supply', 'population_ratio', 'vespene_ratio', \
+                'mineral_ratio']
+HUD_LINES = [(22, (250, 250, 200)), (17, (220, 200, 200)), (12, (150, 150, 150)), \
+                (7, (210, 200, 0)), (2, (0, 255, 25))]
+HUD_LINE_MAX = 50
+
+
+def make_entities(rows):
+    """Turn a list of (type_id, owner, x, y, radius, role) tuples into an
+    entity table"""
+    return np.array(rows, dtype=ENTITY_DTYPE)
+
+
+def rasterize(entities, hud, map_size, palette, out=None):
+    """Draws the intel image of one step
+
+    Argument Keywords:
+        entities    {numpy.ndarray} --  entity table (ENTITY_DTYPE)
+        hud         {numpy.ndarray} --  HUD scalars, in HUD_FIELDS order
+        map_size    {tuple}         --  map's (width, height)
+        palette     {list}          --  role -> BGR color
+        out         {numpy.ndarray} --  (height, width, 3) uint8 array to draw
+                                        into, or None to make a new one
+
+    Raises:
+        N/A
+
+    Returns:
+        {numpy.ndarray} -- (height, width, 3) uint8 intel image, flipped so
+                           that north is up
+    """
+    game_data = np.zeros((map_size[1], map_size[0], 3), np.uint8)
+    colors = [tuple(int(c) for c in color) for color in palette]
+    # one cv2.circle() per entity (~1 us each) beats stamping precomputed discs with numpy, whose
+    # scatter + palette lookup over the whole frame is 2-5x slower at 50-600 entities, even batched
+    for x, y, radius, role in zip(entities['x'].tolist(), entities['y'].tolist(), \
+                                    entities['radius'].tolist(), entities['role'].tolist()):
+        cv2.circle(game_data, (x, y), radius, colors[role], -1)
+    for ratio, (row, color) in zip(hud, HUD_LINES):
+        cv2.line(game_data, (0, row), (int(HUD_LINE_MAX*ratio), row), color, 3)
+    if out is None:
+        return cv2.flip(game_data, 0)
+    return cv2.flip(game_data, 0, dst=out)
+
+
+def rasterize_batch(entities, offsets, huds, map_size, palette):
+    """Draws the intel images of many steps into one preallocated array
+
+    Argument Keywords:
+        entities    {numpy.ndarray} --  every step's entity tables, back to back
+        offsets     {numpy.ndarray} --  (N+1) start of each step's rows in
+                                        entities (the last one is the end)
+        huds        {numpy.ndarray} --  (N, 5) HUD scalars
+        map_size    {tuple}         --  map's (width, height)
+        palette     {list}          --  role -> BGR color
+
+    Raises:
+        N/A
+
+    Returns:
+        {numpy.ndarray} -- (N, height, width, 3) uint8 intel images
+    """
+    frames = np.empty((len(huds), map_size[1], map_size[0], 3), np.uint8)
+    for i in range(len(huds)):
+        rasterize(entities[offsets[i]:offsets[i+1]], huds[i], map_size, palette, frames[i])
+    return frames
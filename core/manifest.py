@@ -0,0 +1,157 @@
+"""
+    This module contains a manifest of a training data directory: for every
+    saved game, its no. of samples of each choice (and the choice of every
+    sample), its size on disk and a checksum.
+
+    Training used to load every game just to count how many samples of each
+    choice it holds, and re-list the directory every epoch. The manifest is
+    built once and saved as manifest.json in the training data directory.
+    Updating it only reads the games that are new or have changed since (by
+    size and modification time), and only their labels, so balancing,
+    splitting and planning which games to load can all be done from the
+    manifest alone.
+
+    To update (and optionally verify) a directory's manifest:
+        python -m core.manifest <training_data_dir> [--verify]
+"""
+import os
+import json
+import base64
+import hashlib
+import argparse
+import numpy as np
+from .training_data import FORMAT_VERSION, is_game_data, load_game_labels
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def get_files(path):
+    """Get the (name relative to the game, full path) of every file that makes
+    up a saved game, sorted. A .npy game is just the file itself, with an
+    empty name"""
+    if not os.path.isdir(path):
+        return [('', path)]
+    return sorted((os.path.relpath(os.path.join(root, name), path), os.path.join(root, name)) \
+                    for root, _, names in os.walk(path) for name in names)
+
+
+def get_stat(path):
+    """Get a saved game's total size in bytes and latest modification time"""
+    stats = [os.stat(full_path) for _, full_path in get_files(path)]
+    return sum(stat.st_size for stat in stats), max((stat.st_mtime for stat in stats), default=0)
+
+
+def get_checksum(path, block_size=1 << 20):
+    """Get the SHA-1 of a saved game's files (names and contents)"""
+    digest = hashlib.sha1()
+    for name, full_path in get_files(path):
+        digest.update(name.encode())
+        with open(full_path, 'rb') as game_file:
+            for block in iter(lambda: game_file.read(block_size), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(data_dir):
+    """Loads a training data directory's manifest (an empty one if it doesn't
+    have one yet)"""
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return {"version": FORMAT_VERSION, "files": {}}
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(data_dir, manifest):
+    """Saves a manifest, replacing the old one in one step"""
+    tmp_path = os.path.join(data_dir, MANIFEST_FILE + '.tmp')
+    with open(tmp_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(data_dir, MANIFEST_FILE))
+
+
+def update_manifest(data_dir):
+    """Brings a training data directory's manifest up to date: new and
+    changed games are added, and games that are gone are removed
+
+    Argument Keywords:
+        data_dir    {string}    --  directory of saved games
+
+    Raises:
+        N/A
+
+    Returns:
+        {dict} -- the manifest. Its "files" map each game's name to its
+                  "num_samples", "class_counts", "choices" (see
+                  get_choices()), "bytes", "mtime" and "checksum"
+    """
+    manifest = load_manifest(data_dir)
+    files = manifest["files"]
+    names = [name for name in os.listdir(data_dir) if not name.startswith('.') and \
+                name != MANIFEST_FILE and is_game_data(os.path.join(data_dir, name))]
+    changed = False
+    for name in set(files) - set(names):
+        del files[name]
+        changed = True
+    for name in names:
+        path = os.path.join(data_dir, name)
+        num_bytes, mtime = get_stat(path)
+        entry = files.get(name)
+        if entry is not None and entry["bytes"] == num_bytes and entry["mtime"] == mtime and \
+                "choices" in entry:
+            continue
+        choices = np.argmax(load_game_labels(path), axis=1).astype(np.uint8)
+        files[name] = {
+            "num_samples": len(choices),
+            "class_counts": np.bincount(choices, minlength=4).tolist(),
+            "choices": base64.b64encode(choices.tobytes()).decode('ascii'),
+            "bytes": num_bytes,
+            "mtime": mtime,
+            "checksum": get_checksum(path)
+        }
+        changed = True
+    if changed:
+        save_manifest(data_dir, manifest)
+    return manifest
+
+
+def verify_manifest(data_dir, manifest):
+    """Get the names of the games that are missing or whose checksum doesn't
+    match the manifest's"""
+    return [name for name, entry in sorted(manifest["files"].items()) \
+            if not os.path.exists(os.path.join(data_dir, name)) or \
+                get_checksum(os.path.join(data_dir, name)) != entry["checksum"]]
+
+
+def get_choices(manifest, name):
+    """Get the choice of every sample in a game (stored base64-encoded, one
+    byte per sample)"""
+    return np.frombuffer(base64.b64decode(manifest["files"][name]["choices"]), dtype=np.uint8)
+
+
+def get_class_counts(manifest, names=None):
+    """Get the total no. of samples of each choice in some games (all of them
+    if names is None)"""
+    files = manifest["files"]
+    names = files if names is None else names
+    return np.sum([files[name]["class_counts"] for name in names], axis=0, dtype=np.int64) \
+            if len(names) else np.zeros(4, np.int64)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('data_dir', type=str, help='directory of saved games')
+    parser.add_argument('--verify', action='store_true', \
+                        help='check every game against its checksum')
+    args = parser.parse_args()
+
+    manifest = update_manifest(args.data_dir)
+    files = manifest["files"]
+    print('{} games, {} samples, {:.1f} MB'.format(len(files), \
+            sum(entry["num_samples"] for entry in files.values()), \
+            sum(entry["bytes"] for entry in files.values())/1e6))
+    print('Samples per choice: {}'.format(get_class_counts(manifest).tolist()))
+    if args.verify:
+        bad = verify_manifest(args.data_dir, manifest)
+        print('{} games failed their checksum{}'.format(len(bad), \
+                ': ' + ', '.join(bad) if bad else ''))
@@ -0,0 +1,123 @@
+"""
+    This module contains a focus-fire micro engine for our combat units.
+
+    At every step, we build distance and range matrices between our combat
+    units and the visible enemies with NumPy and assign every one of our units
+    a target in a single vectorized pass. Each unit goes for the enemy with
+    the lowest effective HP (health + shields) that's within its range, and
+    no more units are put on an enemy than it takes to kill it quickly, so
+    the rest spill over onto the next weakest enemy.
+"""
+import numpy as np
+
+
+class FocusFireMicro():
+    """
+    Assigns focus-fire targets to a group of combat units
+    """
+    def __init__(self, engage_margin=1.0, focus_window_sec=2.0):
+        """Sets up the micro engine's settings
+
+        Argument Keywords:
+            engage_margin       {float} --  extra distance past a unit's range
+                                            at which an enemy is still
+                                            considered to be in range
+            focus_window_sec    {float} --  we put enough units on an enemy to
+                                            kill it within this many seconds
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            engage_margin       {float}
+            focus_window_sec    {float}
+
+        Attributes Referenced:
+            N/A
+        """
+        self.engage_margin = engage_margin
+        self.focus_window_sec = focus_window_sec
+
+    def assign_targets(self, allies, enemies):
+        """Assign every ally a target within its range
+
+        Argument Keywords:
+            allies  {sc2.units.Units}   --  our combat units
+            enemies {sc2.units.Units}   --  visible enemy units/structures
+
+        Raises:
+            N/A
+
+        Returns:
+            {dict} -- ally tag -> enemy sc2.unit.Unit. Allies without any
+                      enemies in range are left out
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            engage_margin       {float}
+            focus_window_sec    {float}
+        """
+        if not allies or not enemies:
+            return {}
+        allies = list(allies)
+        enemies = list(enemies)
+
+        #----------------------------------------------------------------------
+        # gather everything we need about both sides into arrays
+        #----------------------------------------------------------------------
+        ally_pos = np.array([u.position for u in allies], dtype=np.float32)
+        ally_radius = np.array([u.radius for u in allies], dtype=np.float32)
+        ally_ground = np.array([u.ground_range for u in allies], dtype=np.float32)
+        ally_air = np.array([u.air_range for u in allies], dtype=np.float32)
+        ally_ground_dps = np.array([u.ground_dps for u in allies], dtype=np.float32)
+        ally_air_dps = np.array([u.air_dps for u in allies], dtype=np.float32)
+
+        enemy_pos = np.array([u.position for u in enemies], dtype=np.float32)
+        enemy_radius = np.array([u.radius for u in enemies], dtype=np.float32)
+        enemy_hp = np.array([u.health + u.shield for u in enemies], dtype=np.float32)
+        enemy_flying = np.array([u.is_flying for u in enemies], dtype=bool)
+
+        #----------------------------------------------------------------------
+        # (allies x enemies) distance, range and dps matrices
+        #----------------------------------------------------------------------
+        dist = np.sqrt(((ally_pos[:, None, :] - enemy_pos[None, :, :])**2).sum(axis=2)) \
+                - ally_radius[:, None] - enemy_radius[None, :]
+        reach = np.where(enemy_flying[None, :], ally_air[:, None], ally_ground[:, None])
+        dps = np.where(enemy_flying[None, :], ally_air_dps[:, None], ally_ground_dps[:, None])
+        in_range = (dps > 0) & (dist <= reach + self.engage_margin)
+
+        # lowest effective HP first, closest enemy breaks ties
+        score = np.where(in_range, enemy_hp[None, :] + dist*1e-3, np.inf)
+        target = np.argmin(score, axis=1)
+        has_target = np.isfinite(score[np.arange(len(allies)), target])
+
+        #----------------------------------------------------------------------
+        # don't overkill: only keep as many allies on a target as it takes to
+        # kill it within the focus window, the closest ones get to stay
+        #----------------------------------------------------------------------
+        ally_dmg = dps[np.arange(len(allies)), target]*self.focus_window_sec
+        order = np.lexsort((dist[np.arange(len(allies)), target], target))
+        order = order[has_target[order]]
+        if order.size:
+            sorted_targets = target[order]
+            dmg_so_far = np.cumsum(ally_dmg[order])
+            group_start = np.r_[0, np.flatnonzero(np.diff(sorted_targets)) + 1]
+            group_offset = np.repeat(
+                np.r_[0, dmg_so_far[group_start[1:] - 1]], np.diff(np.r_[group_start, order.size]))
+            dmg_before = dmg_so_far - ally_dmg[order] - group_offset
+            overkill = order[dmg_before >= enemy_hp[sorted_targets]]
+            if overkill.size:
+                # send the extra allies to their next best target
+                score[overkill, target[overkill]] = np.inf
+                target[overkill] = np.argmin(score[overkill], axis=1)
+                fallback = ~np.isfinite(score[overkill, target[overkill]])
+                # if there's nothing else in range, then keep hitting the same target
+                target[overkill[fallback]] = np.argmin(
+                    np.where(in_range[overkill[fallback]], enemy_hp[None, :], np.inf), axis=1)
+
+        return {allies[i].tag: enemies[target[i]] for i in np.flatnonzero(has_target)}
@@ -1,11 +1,15 @@
 """
     In this module, we'll create a CNN with Tensorflow using keras
+
+    It's part of the core package (it shares the training data readers with
+    the bots), so train from the project's root directory with:
+        python -m core.model
 """
 import tensorflow as tf
-import random
-import os
 import numpy as np
-from sklearn.model_selection import train_test_split
+from .manifest import update_manifest, get_choices
+from .shards import is_shard_dataset, ShardDataset
+from .input_pipeline import make_dataset, make_game_reader, make_shard_dataset, PipelineTimer
 
 def setup_model(learning_rate):
     model = tf.keras.Sequential()
@@ -49,93 +53,91 @@ def run_model(model,learning_rate):
 
     train_data_dir = "train_data" # TODO: Fix this to be better
 
-    # want to load in a few games at a time
+    # every sample's choice, so balancing and splitting is done on sample indices before any frames
+    # are loaded
+    dataset = None
+    if is_shard_dataset(train_data_dir):
+        # compacted with core/shards.py, its labels are already in memory
+        dataset = ShardDataset(train_data_dir)
+        choices = np.argmax(dataset.labels, axis=1)
+    else:
+        # only new or changed games are read to update the manifest
+        manifest = update_manifest(train_data_dir)
+        all_files = sorted(f for f, entry in manifest["files"].items() if entry["num_samples"])
+        game_choices = [get_choices(manifest, f) for f in all_files]
+        offsets = np.cumsum([0] + [len(c) for c in game_choices])
+        choices = np.concatenate(game_choices) if game_choices else np.zeros(0, np.uint8)
+
+    test_size = 0.3 # was 100
+    batch_size = 50 # was 128
     hm_epochs = 10
+    timer = None
     for i in range(hm_epochs):
-        current = 0
-        increment = 20 # was 200
-        not_maximum = True
-        all_files = os.listdir(train_data_dir)
-        maximum = len(all_files)
-        random.shuffle(all_files)
-        while not_maximum:
-            print("Currently doing {}:{}".format(current,current+increment))
-            no_attacks = []
-            attack_closest_to_nexus = []
-            attack_enemy_structures = []
-            attack_enemy_start = []
-            for file in all_files[current:current+increment]:
-                full_path = os.path.join(train_data_dir, file)
-                data = list(np.load(full_path, allow_pickle=True))
-                for d in data:
-                    choice = np.argmax(d[0])
-                    if choice == 0:
-                        no_attacks.append(d)
-                    if choice == 1:
-                        attack_closest_to_nexus.append(d)
-                    if choice == 2:
-                        attack_enemy_structures.append(d)
-                    if choice == 3:
-                        attack_enemy_start.append(d)
-                lengths = check_data(no_attacks, attack_closest_to_nexus, attack_enemy_structures, attack_enemy_start)
-                lowest_data = min(lengths)
-
-                random.shuffle(no_attacks)
-                random.shuffle(attack_closest_to_nexus)
-                random.shuffle(attack_enemy_structures)
-                random.shuffle(attack_enemy_start)
-
-                # if most of your data is leaning on one element, the nn could learn only that action. So, it's good to balance the input before feeding it in
-                no_attacks = no_attacks[:lowest_data]
-                attack_closest_to_nexus = attack_closest_to_nexus[:lowest_data]
-                attack_enemy_structures = attack_enemy_structures[:lowest_data]
-                attack_enemy_start = attack_enemy_start[:lowest_data]
-
-                train_data = no_attacks + attack_closest_to_nexus + attack_enemy_structures + attack_enemy_start
-                random.shuffle(train_data)
-                test_size = 0.3 # was 100
-                batch_size = 50 # was 128
-
-                # TODO: Use tensorflow routines to do train/test split and fit model
-                if False:
-                    x_train = np.array([i[1] for i in train_data[:-test_size]]).reshape(-1,176, 200, 3) # this is the image/map we make with opencv that has our units and enemy units
-                    y_train = np.array([i[0] for i in train_data[:-test_size]])
-
-                    x_test = np.array([i[1] for i in train_data[-test_size:]]).reshape(-1,176, 200, 3)
-                    y_test = np.array([i[0] for i in train_data[-test_size:]])
-                else:
-                    train_data = np.array(train_data)
-                    x_train, x_test, y_train, y_test = train_test_split(train_data[:,1], train_data[:,0], test_size=test_size)
-                    x_train = np.array(list(x_train))
-                    x_test = np.array(list(x_test))
-                    y_train = np.array(list(y_train))
-                    y_test = np.array(list(y_test))
-                    
-                
-                model.fit(x_train,y_train,
-                        batch_size=batch_size,
-                        validation_data=(x_test,y_test),
-                        shuffle=True, verbose=1, callbacks=[tb])
-            
-                model.save("BasicCNN-{}-epochs-{}-LR-STAGE1".format(hm_epochs, learning_rate))
-                current = current + increment
-                if current > maximum:
-                    not_maximum = False
-
-
-def check_data(no_attacks, attack_closest_to_nexus, attack_enemy_structures, attack_enemy_start):
-    choices = { "no_attacks":no_attacks,
-                "attack_closest_to_nexus":attack_closest_to_nexus,
-                "attack_enemy_structures":attack_enemy_structures,
-                "attack_enemy_start":attack_enemy_start,
-            }
+        lengths = check_data(np.bincount(choices, minlength=4))
+
+        # if most of your data is leaning on one element, the nn could learn only that action.
+        # So, it's good to balance the input before feeding it in
+        train_idx, test_idx = balance_and_split(choices, min(lengths), test_size)
+
+        # frames are only ever gathered for the samples that made the cut, while the model trains
+        if dataset is not None:
+            train_ds = make_shard_dataset(dataset, train_idx, batch_size)
+            test_ds = make_shard_dataset(dataset, test_idx, batch_size, training=False)
+        else:
+            train_ds = make_dataset(make_game_reader(train_data_dir, all_files, \
+                            split_by_game(train_idx, offsets)), len(all_files), batch_size)
+            test_ds = make_dataset(make_game_reader(train_data_dir, all_files, \
+                            split_by_game(test_idx, offsets)), len(all_files), batch_size, \
+                            training=False)
+
+        # every epoch's pipeline is built the same way, so it's only timed on the first one
+        if timer is None:
+            timer = PipelineTimer(train_ds)
+
+        # timer goes first, so tb also logs its numbers
+        model.fit(train_ds,
+                validation_data=test_ds,
+                verbose=1, callbacks=[timer, tb])
+
+        model.save("BasicCNN-{}-epochs-{}-LR-STAGE1".format(hm_epochs, learning_rate))
+
+
+def balance_and_split(choices, num_per_choice, test_size):
+    """Picks num_per_choice random samples of every choice and holds out the
+    same share of each for testing. Returns the sorted train and test sample
+    indices"""
+    if num_per_choice < 1:
+        missing = np.flatnonzero(np.bincount(choices, minlength=4) == 0).tolist()
+        raise ValueError('Cannot balance the training data, there are no samples of choices ' + \
+                            '{}'.format(missing))
+    train, test = [], []
+    num_test = int(num_per_choice*test_size)
+    for choice in range(4):
+        picked = np.random.permutation(np.flatnonzero(choices == choice))[:num_per_choice]
+        test.append(picked[:num_test])
+        train.append(picked[num_test:])
+    return np.sort(np.concatenate(train)), np.sort(np.concatenate(test))
+
+
+def split_by_game(indices, offsets):
+    """Turns sorted sample indices into the sorted indices of each game's
+    samples (offsets holds where each game's samples start)"""
+    bounds = np.searchsorted(indices, offsets)
+    return [indices[bounds[k]:bounds[k+1]] - offsets[k] for k in range(len(offsets) - 1)]
+
+
+def check_data(class_counts):
+    choices = ["no_attacks",
+                "attack_closest_to_nexus",
+                "attack_enemy_structures",
+                "attack_enemy_start"]
     total_data = 0
 
     lengths = []
-    for choice in choices:
-        print("Length of {} is: {}".format(choice, len(choices[choice])))
-        total_data = total_data + len(choices[choice])
-        lengths.append(len(choices[choice]))
+    for choice, count in zip(choices, class_counts):
+        print("Length of {} is: {}".format(choice, count))
+        total_data = total_data + int(count)
+        lengths.append(int(count))
     
     print('Total data length now is:', total_data)
     return lengths
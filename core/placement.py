@@ -0,0 +1,284 @@
+"""
+    This module contains a local building-placement engine.
+
+    python-sc2's BotAI.build(..., near=...) spirals outward from a position
+    and asks the game server about every ring of candidates until one of them
+    is accepted. Instead, we keep our own copy of the map's placement grid,
+    stamp our structures and reserved build sites into it, pick candidate
+    positions locally, and validate all of them with a single batched query.
+"""
+import numpy as np
+import sc2
+from sc2.data import ActionResult
+from sc2.position import Point2
+
+
+#------------------------------------------------------------------------------
+# side length (in cells) of the square footprint of every structure we build.
+# Anything that isn't listed here is assumed to be a 3x3 structure
+#------------------------------------------------------------------------------
+FOOTPRINT_SIZE = {
+    sc2.constants.NEXUS: 5,
+    sc2.constants.PYLON: 2,
+    sc2.constants.ASSIMILATOR: 3,
+    sc2.constants.GATEWAY: 3,
+    sc2.constants.CYBERNETICSCORE: 3,
+    sc2.constants.STARGATE: 3,
+    sc2.constants.ROBOTICSFACILITY: 3,
+    sc2.constants.FORGE: 3,
+    sc2.constants.TWILIGHTCOUNCIL: 3,
+    sc2.constants.FLEETBEACON: 3,
+    sc2.constants.ROBOTICSBAY: 3,
+    sc2.constants.PHOTONCANNON: 2,
+    sc2.constants.SHIELDBATTERY: 2
+}
+
+
+class PlacementGrid():
+    """
+    Local copy of the map's placement grid that keeps track of our structure
+    footprints as well as build sites that have been promised to a worker but
+    haven't been started yet
+    """
+    def __init__(self, game_info, resources=(), resource_padding=2, padding=1):
+        """Copies the map's static placement grid and blocks off the areas
+        around resource fields so that we never build in a mineral line
+
+        Argument Keywords:
+            game_info           {sc2.game_info.GameInfo}    --  has the map's
+                                                                placement grid
+            resources           {sc2.units.Units}           --  mineral fields
+                                                                and geysers
+            resource_padding    {int}   --  extra cells to block off around
+                                            every resource
+            padding             {int}   --  free cells to keep around every
+                                            new structure so units can path
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            base        {np.ndarray}    --  static placement grid, [y, x]
+            blocked     {np.ndarray}    --  number of footprints covering each
+                                            cell, [y, x]
+            stamps      {dict}          --  tag -> footprint bounds
+            reserved    {dict}          --  Point2 -> (footprint bounds,
+                                            expiry game loop)
+            padding     {int}
+
+        Attributes Referenced:
+            N/A
+        """
+        self.base = np.array(game_info.placement_grid.data_numpy, dtype=bool)
+        self.blocked = np.zeros(self.base.shape, dtype=np.int16)
+        self.stamps = {}
+        self.reserved = {}
+        self.padding = padding
+
+        # resources have no creation ability, so they have no footprint_radius. Mineral fields
+        # are 2x1 and geysers are 3x3
+        for resource in resources:
+            width, height = (2, 1) if resource.is_mineral_field else (3, 3)
+            bounds = self.get_bounds(resource.position, width + 2*resource_padding, \
+                                        height + 2*resource_padding)
+            self.stamp(bounds)
+
+    def get_bounds(self, pos, size, height=None):
+        """Get the cell bounds of a rectangular (square by default) footprint
+        centered on pos, clipped to the map's boundaries
+
+        Argument Keywords:
+            pos     {sc2.position.Point2}   --  center of the footprint
+            size    {float}                 --  width of the footprint
+            height  {float}                 --  height of the footprint (None
+                                                for a square one)
+
+        Raises:
+            N/A
+
+        Returns:
+            {tuple} -- (y0, y1, x0, x1) slice bounds into the grid
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            base    {np.ndarray}
+        """
+        height = size if height is None else height
+        x0 = max(int(round(pos[0] - size/2)), 0)
+        y0 = max(int(round(pos[1] - height/2)), 0)
+        x1 = min(x0 + int(round(size)), self.base.shape[1])
+        y1 = min(y0 + int(round(height)), self.base.shape[0])
+        return (y0, y1, x0, x1)
+
+    def stamp(self, bounds, amount=1):
+        """Mark (or unmark if amount is negative) a footprint as blocked"""
+        y0, y1, x0, x1 = bounds
+        self.blocked[y0:y1, x0:x1] += amount
+
+    def add_structure(self, struct):
+        """Block off a structure's footprint. Structures that have already
+        been stamped are ignored, and any reservation sitting on the same spot
+        is dropped since the building has now been started.
+
+        Argument Keywords:
+            struct  {sc2.unit.Unit} -- one of our structures
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            stamps      {dict}
+            reserved    {dict}
+
+        Attributes Referenced:
+            stamps      {dict}
+            reserved    {dict}
+        """
+        if struct.tag in self.stamps or struct.is_flying:
+            return
+        # footprint_radius is None for types without a creation ability (ex: rich
+        # assimilators), so fall back on the unit's radius
+        radius = struct.footprint_radius
+        if radius is None:
+            radius = struct.radius
+        bounds = self.get_bounds(struct.position, 2*radius)
+        self.stamps[struct.tag] = bounds
+        self.stamp(bounds)
+        if struct.position in self.reserved:
+            self.stamp(self.reserved.pop(struct.position)[0], -1)
+
+    def remove_structure(self, tag):
+        """Free a structure's footprint once it has been destroyed"""
+        if tag in self.stamps:
+            self.stamp(self.stamps.pop(tag), -1)
+
+    def reserve(self, pos, unit_type, expiry_loop):
+        """Block off a build site that a worker has been sent to so that no
+        other build is placed on top of it before construction starts
+
+        Argument Keywords:
+            pos         {sc2.position.Point2}   --  center of the build site
+            unit_type   {sc2.UnitTypeId}        --  structure to build there
+            expiry_loop {int}   --  game loop after which the reservation is
+                                    dropped if construction hasn't started
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            reserved    {dict}
+
+        Attributes Referenced:
+            N/A
+        """
+        self.release(pos)
+        bounds = self.get_bounds(pos, FOOTPRINT_SIZE.get(unit_type, 3))
+        self.reserved[pos] = (bounds, expiry_loop)
+        self.stamp(bounds)
+
+    def release(self, pos):
+        """Drop a build site reservation, if there is one"""
+        if pos in self.reserved:
+            self.stamp(self.reserved.pop(pos)[0], -1)
+
+    def release_expired(self, game_loop):
+        """Drop every reservation whose build never started in time"""
+        for pos in [p for p, r in self.reserved.items() if r[1] <= game_loop]:
+            self.release(pos)
+
+    def get_candidates(self, near, size, max_distance, max_candidates):
+        """Find the free build sites closest to a position. Free cells are
+        summed with an integral image so every possible site in the search
+        window is checked at once.
+
+        Argument Keywords:
+            near            {sc2.position.Point2}   --  where we want to build
+            size            {int}   --  side length of the footprint
+            max_distance    {float} --  max distance from near to a site
+            max_candidates  {int}   --  max number of sites to return
+
+        Raises:
+            N/A
+
+        Returns:
+            {list} -- list of sc2.position.Point2 sites, closest first. Can be
+                      an empty list if there's no room around near
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            base        {np.ndarray}
+            blocked     {np.ndarray}
+            padding     {int}
+        """
+        box = size + 2*self.padding
+        reach = int(max_distance) + box
+        x_lo = max(int(near[0]) - reach, 0)
+        y_lo = max(int(near[1]) - reach, 0)
+        x_hi = min(int(near[0]) + reach, self.base.shape[1])
+        y_hi = min(int(near[1]) + reach, self.base.shape[0])
+        if x_hi - x_lo < box or y_hi - y_lo < box:
+            return []
+
+        free = self.base[y_lo:y_hi, x_lo:x_hi] & (self.blocked[y_lo:y_hi, x_lo:x_hi] == 0)
+        integral = np.zeros((free.shape[0] + 1, free.shape[1] + 1), dtype=np.int32)
+        integral[1:, 1:] = free.cumsum(0).cumsum(1)
+        num_free = integral[box:, box:] - integral[:-box, box:] \
+                    - integral[box:, :-box] + integral[:-box, :-box]
+
+        ys, xs = np.nonzero(num_free == box*box)
+        center_x = xs + x_lo + self.padding + size/2
+        center_y = ys + y_lo + self.padding + size/2
+        dist = np.hypot(center_x - near[0], center_y - near[1])
+        in_reach = dist <= max_distance
+        order = np.argsort(dist[in_reach], kind='stable')[:max_candidates]
+        return [Point2((float(x), float(y))) for x, y in
+                zip(center_x[in_reach][order], center_y[in_reach][order])]
+
+    async def find_placement(self, bot, unit_type, near, max_distance=15, max_candidates=20):
+        """Picks build sites locally and validates them with the game server
+        in one round-trip
+
+        Argument Keywords:
+            bot             {sc2.BotAI}             --  bot that's building
+            unit_type       {sc2.UnitTypeId}        --  structure to place
+            near            {sc2.position.Point2}   --  where we want to build
+            max_distance    {float} --  max distance from near to a site
+            max_candidates  {int}   --  max number of sites sent to the server
+
+        Raises:
+            N/A
+
+        Returns:
+            {sc2.position.Point2} -- closest accepted site, or None if none of
+                                     the candidates were accepted
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            N/A
+        """
+        candidates = self.get_candidates(
+            near, FOOTPRINT_SIZE.get(unit_type, 3), max_distance, max_candidates)
+        if not candidates:
+            return None
+
+        ability = bot.game_data.units[unit_type.value].creation_ability
+        results = await bot._client.query_building_placement(ability, candidates)
+        for pos, result in zip(candidates, results):
+            if result == ActionResult.Success:
+                return pos
+        return None
@@ -0,0 +1,208 @@
+"""
+    This module contains a production planner that works off of a bot's
+    dependency table (ex: Protoss.dependencies).
+
+    The tech chain is sorted once when the planner is made. After that, each
+    node's state is tracked incrementally from the bot's unit-created and
+    construction events, so figuring out what to build next doesn't require
+    re-checking every structure in the chain at every step.
+"""
+import enum
+
+
+class NODE_STATE(enum.Enum):
+    MISSING = 0 # nothing's been built (or everything's been destroyed)
+    PENDING = 1 # at least one is being built, none are ready
+    READY   = 2 # at least one is ready
+
+
+class ProductionPlanner():
+    """
+    Keeps track of the state of every node in a tech chain and emits the
+    builds whose dependencies are all ready
+    """
+    def __init__(self, dependencies, goals, repeat_goal=None):
+        """Topologically sorts every node that our goals depend on
+
+        Argument Keywords:
+            dependencies    {dict}  --  unitid -> list of unitids (or a single
+                                        unitid) that must be ready before it
+                                        can be made
+            goals           {list}  --  unitids we want to have at least one
+                                        of, in order of priority
+            repeat_goal     {sc2.UnitTypeId}    --  unitid that we'll keep on
+                                                    building once its
+                                                    dependencies are ready
+
+        Raises:
+            ValueError -- if there's a cycle in the dependency table
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            order           {list}  --  topologically sorted list of nodes
+            requires        {dict}  --  node -> list of nodes it depends on
+            num_pending     {dict}  --  node -> no. of them being built
+            num_ready       {dict}  --  node -> no. of them that are ready
+            ordered_until   {dict}  --  node -> game loop until which a build
+                                        order is assumed to be on its way
+            tags            {dict}  --  tag -> (node, is_ready)
+            repeat_goal     {sc2.UnitTypeId}
+
+        Attributes Referenced:
+            N/A
+        """
+        self.requires = {}
+        for key, val in dependencies.items():
+            self.requires[key] = list(val) if isinstance(val, list) else [val]
+
+        self.order = []
+        visiting = set()
+        def visit(node):
+            if node in self.order:
+                return
+            if node in visiting:
+                raise ValueError('Dependency cycle found at {}'.format(node))
+            visiting.add(node)
+            for dep in self.requires.setdefault(node, []):
+                visit(dep)
+            visiting.discard(node)
+            self.order.append(node)
+
+        for goal in list(goals) + ([repeat_goal] if repeat_goal else []):
+            visit(goal)
+
+        self.repeat_goal = repeat_goal
+        self.num_pending = dict.fromkeys(self.order, 0)
+        self.num_ready = dict.fromkeys(self.order, 0)
+        self.ordered_until = {}
+        self.tags = {}
+        self._frontier = []
+        self._dirty = True
+
+    def sync(self, units):
+        """Seed the planner's state from units/structures that already exist
+        (ex: the starting townhall), since no events are fired for them
+
+        Argument Keywords:
+            units   {sc2.units.Units}   --  our units and/or structures
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_pending {dict}
+            num_ready   {dict}
+            tags        {dict}
+
+        Attributes Referenced:
+            N/A
+        """
+        for unit in units:
+            if unit.type_id in self.num_ready and unit.tag not in self.tags:
+                if unit.is_ready:
+                    self.on_construction_complete(unit)
+                else:
+                    self.on_construction_started(unit)
+
+    def get_state(self, node):
+        """Get the state of a node in the tech chain"""
+        if self.num_ready.get(node, 0):
+            return NODE_STATE.READY
+        if self.num_pending.get(node, 0):
+            return NODE_STATE.PENDING
+        return NODE_STATE.MISSING
+
+    def get_amount(self, node):
+        """Get the number of a node that are either ready or being built"""
+        return self.num_ready.get(node, 0) + self.num_pending.get(node, 0)
+
+    def on_construction_started(self, unit):
+        """A structure in the tech chain has started being built"""
+        if unit.type_id not in self.num_pending or unit.tag in self.tags:
+            return
+        self.tags[unit.tag] = (unit.type_id, False)
+        self.num_pending[unit.type_id] += 1
+        self.ordered_until.pop(unit.type_id, None)
+        self._dirty = True
+
+    def on_construction_complete(self, unit):
+        """A structure in the tech chain is ready, or a unit in the tech chain
+        has been created"""
+        if unit.type_id not in self.num_ready:
+            return
+        node, is_ready = self.tags.get(unit.tag, (unit.type_id, False))
+        if is_ready:
+            return
+        if unit.tag in self.tags:
+            self.num_pending[node] -= 1
+        self.tags[unit.tag] = (node, True)
+        self.num_ready[node] += 1
+        self.ordered_until.pop(node, None)
+        self._dirty = True
+
+    def on_destroyed(self, tag):
+        """A unit or structure has been destroyed"""
+        if tag not in self.tags:
+            return
+        node, is_ready = self.tags.pop(tag)
+        if is_ready:
+            self.num_ready[node] -= 1
+        else:
+            self.num_pending[node] -= 1
+        self._dirty = True
+
+    def mark_ordered(self, node, until_loop):
+        """A worker has been told to build this node. Don't emit it again
+        until construction starts or until_loop has passed"""
+        self.ordered_until[node] = until_loop
+        self._dirty = True
+
+    def get_next_builds(self, game_loop, max_repeat=0):
+        """Get the list of nodes that can be built right now, in order of
+        priority. The list is only recomputed when a node changes state or a
+        build order expires.
+
+        Argument Keywords:
+            game_loop   {int}   --  current game loop
+            max_repeat  {int}   --  max number of self.repeat_goal we want to
+                                    have right now
+
+        Raises:
+            N/A
+
+        Returns:
+            {list} -- list of unitids whose dependencies are all ready. Can be
+                      an empty list
+
+        Attributes Affected:
+            ordered_until   {dict}  --  expired build orders are removed
+
+        Attributes Referenced:
+            order           {list}
+            requires        {dict}
+            ordered_until   {dict}
+            repeat_goal     {sc2.UnitTypeId}
+        """
+        expired = [n for n, loop in self.ordered_until.items() if loop <= game_loop]
+        for node in expired:
+            self.ordered_until.pop(node)
+
+        if self._dirty or expired:
+            self._frontier = [
+                node for node in self.order
+                if self.get_state(node) == NODE_STATE.MISSING
+                and node not in self.ordered_until
+                and all(self.get_state(dep) == NODE_STATE.READY for dep in self.requires[node])]
+            self._dirty = False
+
+        next_builds = list(self._frontier)
+        goal = self.repeat_goal
+        if goal and goal not in next_builds and goal not in self.ordered_until \
+                and self.get_state(goal) == NODE_STATE.READY and self.get_amount(goal) < max_repeat:
+            next_builds.append(goal)
+        return next_builds
@@ -0,0 +1,97 @@
+"""
+    This module contains a production dispatcher.
+
+    Each of the bot's actions asks for the units it wants during a step, and
+    the dispatcher queues all of them at once. Our minerals, vespene and
+    supply are budgeted once per step and every idle production building is
+    used, instead of training a single unit from a random (and possibly busy)
+    building.
+"""
+
+
+class ProductionDispatcher():
+    """
+    Collects unit training requests and dispatches them to every idle
+    production building in one batch
+    """
+    def __init__(self, logger=None):
+        """Sets up an empty list of requests
+
+        Argument Keywords:
+            logger  {logging}   --  logs the notes of the requests that got
+                                    units trained (None to not log them)
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            logger      {logging}
+            requests    {list}  --  list of (unitid, building unitid, amount,
+                                    note) in order of priority
+
+        Attributes Referenced:
+            N/A
+        """
+        self.logger = logger
+        self.requests = []
+
+    def request(self, unit_type, bldg_type, amount, note=None):
+        """Ask for up to amount units to be trained at bldg_type buildings.
+        note is a (message, *args) tuple that's logged only if a unit does get
+        trained"""
+        if amount > 0:
+            self.requests.append((unit_type, bldg_type, amount, note))
+
+    def dispatch(self, bot):
+        """Trains every requested unit we have the money, supply and idle
+        buildings for. Requests are served in the order they were made.
+
+        Argument Keywords:
+            bot {sc2.BotAI} -- bot that's training the units
+
+        Raises:
+            N/A
+
+        Returns:
+            {tuple} -- (dict of unitid -> no. of units trained, list of
+                       unitids we couldn't afford)
+
+        Attributes Affected:
+            requests    {list}  --  cleared
+
+        Attributes Referenced:
+            logger      {logging}
+            requests    {list}
+        """
+        minerals, vespene, supply_left = bot.minerals, bot.vespene, bot.supply_left
+        idle_bldgs = {}
+        trained = {}
+        unaffordable = []
+        for unit_type, bldg_type, amount, note in self.requests:
+            if bldg_type not in idle_bldgs:
+                idle_bldgs[bldg_type] = list(bot.structures(bldg_type).ready.idle)
+            cost = bot.calculate_cost(unit_type)
+            supply = bot.calculate_supply_cost(unit_type)
+
+            bldgs = idle_bldgs[bldg_type]
+            requested = amount
+            while amount and bldgs:
+                if cost.minerals > minerals or cost.vespene > vespene:
+                    unaffordable.append(unit_type)
+                    break
+                if supply > supply_left:
+                    break
+                bldgs.pop().train(unit_type)
+                minerals -= cost.minerals
+                vespene -= cost.vespene
+                supply_left -= supply
+                amount -= 1
+                trained[unit_type] = trained.get(unit_type, 0) + 1
+            if note is not None and amount < requested and self.logger is not None:
+                self.logger.debug(*note)
+
+        self.requests.clear()
+        return trained, unaffordable
@@ -6,7 +6,24 @@ import time
 import os
 import math
 import utils # from main project
-import tensorflow as tf # get keras like so: tf.keras
+from sc2.ids.ability_id import AbilityId
+from .placement import PlacementGrid
+from .planner import ProductionPlanner
+from .economy import IncomeForecaster
+from .workers import WorkerManager
+from .production import ProductionDispatcher
+from .commands import CommandLayer
+from .unit_classes import UNIT_CLASS, is_class
+from .intel import make_entities, rasterize, OWNER_SELF, OWNER_ENEMY
+from .micro import FocusFireMicro
+from .threat import ThreatMap
+from .enemy_memory import EnemyMemory
+from .inference import InferenceWorker, DecisionCache
+from .backends import get_backend
+from .inference_server import RemoteBackend
+from .training_data import TrainingDataWriter, ReservoirWriter, EntityDataWriter, \
+    ArchiveDataWriter, SampleFilter
+from .async_io import get_writer
 
 
 class Protoss(sc2.BotAI):
@@ -93,11 +110,23 @@ class Protoss(sc2.BotAI):
             stay_idle_until_min     {bool}
             default_nan_point2      {Point2}
             pre_pending_bldgs       {(dict(Point2,int)}
+            placement               {PlacementGrid}
+            economy                 {IncomeForecaster}
+            premoved_builds         {dict}
+            worker_mgr              {WorkerManager}
+            production              {ProductionDispatcher}
+            commands                {CommandLayer}
+            micro                   {FocusFireMicro}
+            threat                  {ThreatMap}
+            enemy_memory            {EnemyMemory}
             model                   {dict}
             scout                   {dict}
             unitid                  {dict}
             dependencies            {dict}
+            planner                 {ProductionPlanner}
             color_scheme            {dict}
+            palette                 {list}
+            role_of                 {dict}
         """
         sc2.BotAI.__init__(self)
         #----------------------------------------------------------------------
@@ -118,7 +147,14 @@ class Protoss(sc2.BotAI):
             'exists': user_data.cfg[name]['save_training_data'],
             'path': user_data.cfg[name]['training_data_dir'],
             'current_intel': None,
-            'training_data': []
+            # entity table and HUD values current_intel was drawn from
+            'current_entities': None,
+            'format': user_data.cfg[name]['training_data_format'],
+            'writer': None, # TrainingDataWriter, set up in on_start()
+            # drops near-duplicate samples, if requested
+            'filter': SampleFilter() if user_data.cfg[name]['filter_training_data'] else None,
+            # max no. of samples kept per choice, if we only keep a reservoir of each
+            'class_caps': user_data.cfg[name]['samples_per_class']
         }
 
         #----------------------------------------------------------------------
@@ -147,9 +183,26 @@ class Protoss(sc2.BotAI):
         self.default_nan_point2 = sc2.position.Point2((-100,-100))
         # keep track of the buildings locations that are pre-pending
         self.pre_pending_bldgs = {}
-        # keep track of pre-pending combat buildings
-        self.pending_combat_bldgs ={}
         self.wait_pending_bldg_min = 0.5 # wait this many mins before you think about building smthg
+        # local copy of the map's placement grid, set up in on_start()
+        self.placement = None
+        self.power_radius = 6 # max distance b/w a supply bldg and a bldg it powers
+        # forecasts our income so we can tell when we'll afford our next builds
+        self.economy = IncomeForecaster()
+        # builds that a worker has been sent ahead of time for: unitid -> (Point2, worker tag)
+        self.premoved_builds = {}
+        # keeps track of which worker gathers from which resource
+        self.worker_mgr = WorkerManager()
+        # trains every unit we've asked for in a step at once
+        self.production = ProductionDispatcher(self.logger)
+        # drops orders that would just repeat what a unit's already doing
+        self.commands = CommandLayer()
+        # picks focus-fire targets for our combat units
+        self.micro = FocusFireMicro()
+        # ally vs. enemy strength over the map, set up in on_start()
+        self.threat = None
+        # last-seen snapshots of the enemy's units and structures
+        self.enemy_memory = EnemyMemory()
         self.combat_bldg_build_rate = 1 # build 1 bldg every self.combat_bldg_build_rate minutes
         self.prev_target = {
             "found": False,
@@ -164,7 +217,13 @@ class Protoss(sc2.BotAI):
         self.model = {
             'exists': user_data.cfg[name]['mode'] == utils.BOT_MODE.DNN,
             'path': user_data.cfg[name]['model_location'],
-            'model': None
+            'model': None,
+            'backend': user_data.cfg[name]['inference_backend'],
+            'server': user_data.cfg[name]['inference_server'],
+            'async': user_data.cfg[name]['async_inference'],
+            'worker': None, # InferenceWorker, if 'async' is set
+            # skips running the model on frames that look the same as the last one
+            'cache': DecisionCache(user_data.cfg[name]['max_decisions_per_sec'])
         }
 
         #----------------------------------------------------------------------
@@ -224,6 +283,17 @@ class Protoss(sc2.BotAI):
             sc2.constants.VOIDRAY: sc2.constants.STARGATE
         }
 
+        #----------------------------------------------------------------------
+        # the production planner walks self.dependencies to figure out which
+        # combat structures (and their addons) we can build next. Townhalls are
+        # left out since build_townhall_structure() takes care of them
+        #----------------------------------------------------------------------
+        self.planner = ProductionPlanner(
+            self.dependencies,
+            [bldg for bldg in self.unitid["combat_bldg_addons"] + [self.unitid["scout_bldg"]]
+                if bldg != self.unitid["townhall_bldg"]],
+            self.unitid["combat_bldg"])
+
         #----------------------------------------------------------------------
         # color scheme (BGR) to use in intel for each unitid
         #----------------------------------------------------------------------
@@ -255,6 +325,13 @@ class Protoss(sc2.BotAI):
             "enemy_combat": (50, 0, 215)
         })
 
+        #----------------------------------------------------------------------
+        # every color_scheme key is a "role" in our intel's entity tables,
+        # which indexes its color in the palette
+        #----------------------------------------------------------------------
+        self.palette = list(self.color_scheme.values())
+        self.role_of = {key: role for role, key in enumerate(self.color_scheme)}
+
     async def on_start(self):
         """Function called in the beginning of a bot's lifecycle. If this bot's
         meant to apply a DNN model, then that model's imported in this method
@@ -269,22 +346,89 @@ class Protoss(sc2.BotAI):
             sc2.Race
 
         Attributes Affected:
-            model   {dict} -- if the bot's meant to use a model, we import it
-                              in this function using tf.keras
+            model       {dict}          --  if the bot's meant to use a model,
+                                            we import it in this function
+                                            with the requested inference
+                                            backend (only once per process),
+                                            or connect to a shared inference
+                                            server, and start its inference
+                                            worker if requested
+            placement   {PlacementGrid} --  copy of the map's placement grid
+                                            with our starting structures
+            planner     {ProductionPlanner} --  seeded with our starting
+                                                structures
+            worker_mgr  {WorkerManager}     --  seeded with our starting
+                                                townhall and workers
+            threat      {ThreatMap}         --  empty strength grids that fit
+                                                the map
+            collect_data {dict}             --  "writer" is set up if we're
+                                                saving training data (with a
+                                                reservoir per choice if
+                                                "class_caps" is set, or as
+                                                entity tables or an archive
+                                                if that's the "format")
 
         Attributes Referenced:
             model   {dict}      --  "exists"
                                     "model"
                                     "path"
+                                    "backend"
+                                    "server"
+                                    "async"
             logger  {logging}
         """
+        self.placement = PlacementGrid(self.game_info, self.resources)
+        self.threat = ThreatMap(self.game_info.map_size)
+        for struct in self.structures:
+            self.placement.add_structure(struct)
+        self.planner.sync(self.structures)
+        for townhall in self.townhalls:
+            self.worker_mgr.add_base(townhall, self.mineral_field)
+        for worker in self.workers:
+            self.worker_mgr.add_worker(worker.tag)
+        if self.collect_data['exists']:
+            # all of its disk I/O is done by the process' background writer thread
+            class_caps = self.collect_data['class_caps']
+            if isinstance(class_caps, int):
+                class_caps = [class_caps]*4
+            # intel frames are as big as the map
+            map_size = self.game_info.map_size
+            frame_shape = (map_size[1], map_size[0], 3)
+            if self.collect_data['format'] != utils.DATA_FORMAT.FRAMES and class_caps:
+                self.logger.warning('samples_per_class only applies to frames, keeping every ' +
+                                    'sample')
+            if self.collect_data['format'] == utils.DATA_FORMAT.ENTITIES:
+                self.collect_data['writer'] = EntityDataWriter(self.collect_data['path'], \
+                    self.game_info.map_size, self.palette, io=get_writer())
+            elif self.collect_data['format'] == utils.DATA_FORMAT.ARCHIVE:
+                self.collect_data['writer'] = ArchiveDataWriter(self.collect_data['path'], \
+                    frame_shape=frame_shape, io=get_writer())
+            elif class_caps:
+                self.collect_data['writer'] = ReservoirWriter(self.collect_data['path'], \
+                    class_caps, frame_shape=frame_shape, io=get_writer())
+            else:
+                self.collect_data['writer'] = TrainingDataWriter(self.collect_data['path'], \
+                    frame_shape=frame_shape, io=get_writer())
+
         if self.model['exists']:
-            self.logger.info('Loading the following model: %s', self.model['path'])
-            self.model['model'] = tf.keras.models.load_model(self.model['path'])
+            if self.model['server']:
+                self.model['model'] = RemoteBackend(self.model['server'])
+                self.logger.info('Using the inference server at %s', self.model['server'])
+            else:
+                self.model['model'], cached = \
+                    get_backend(self.model['path'], self.model['backend'])
+                self.logger.info('%s the following model: %s (backend: %s)', \
+                                    'Reusing' if cached else 'Loaded', self.model['path'], \
+                                    self.model['backend'].name)
+            if self.model['async']:
+                self.model['worker'] = InferenceWorker(self.model['model'].predict)
+                self.model['worker'].start()
 
     async def on_end(self, game_result):
-        """Function called in the end of a bot's lifecycle. Logs the final
-        result of the trial into an .npy file, if requested by the user.
+        """Function called in the end of a bot's lifecycle. Saves the
+        training data streamed during the trial if we won (and it was
+        requested by the user), otherwise it's thrown away. Either way, that's
+        left to the background writer thread so we don't wait on the disk.
 
         Argument Keywords:
             game_result {sc2.Result} -- Is the final result of the current game
@@ -301,36 +445,188 @@ class Protoss(sc2.BotAI):
         Attributes Referenced:
             logger          {logging}
             collect_data    {dict}      --  "exists"
-                                            "path"
-                                            "training_data"
+                                            "writer"
+                                            "filter"
+            commands        {CommandLayer}
+            model           {dict}      --  "worker"
+                                            "cache"
         """
         self.logger.info('Ended the game: %s', game_result.name)
-        if game_result == sc2.Result.Victory:
-            # save training data if we need some
-            if self.collect_data['exists']:
-                np.save(
-                    "{}/{}.npy".format(
-                        self.collect_data['path'],
-                        str(int(time.time()))),
-                    np.array(self.collect_data['training_data']))
+        self.logger.info('Unit orders sent: %d, suppressed as duplicates: %d', \
+                            self.commands.num_sent, self.commands.num_suppressed)
+        if self.model['worker'] is not None:
+            worker = self.model['worker']
+            worker.stop()
+            self.logger.info(('Inference: %d frames submitted, %d inferred, %d failed, ' +
+                                'decision staleness avg %.1f / max %d game loops'), \
+                                worker.num_submitted, worker.num_inferred, worker.num_errors, \
+                                worker.get_mean_staleness(), worker.staleness_max)
+        if isinstance(self.model['model'], RemoteBackend):
+            self.logger.info('Inference server: %d requests, avg round trip %.2f ms', \
+                                self.model['model'].num_requests, \
+                                self.model['model'].get_mean_latency_ms())
+            self.model['model'].close()
+        if self.model['exists']:
+            cache = self.model['cache']
+            self.logger.info(('Decision cache: model run on %d frames, reused on %d similar ' +
+                                'frames and %d throttled frames'), cache.num_misses, \
+                                cache.num_hits, cache.num_throttled)
+        # save training data if we need some
+        writer = self.collect_data['writer']
+        if writer is not None:
+            sample_filter = self.collect_data['filter']
+            if sample_filter is not None:
+                self.logger.info('Kept %d out of %d training samples (%d label transitions)', \
+                                    sample_filter.num_kept, sample_filter.num_seen, \
+                                    sample_filter.num_transitions)
+            if game_result == sc2.Result.Victory:
+                path = writer.finalize(str(int(time.time())))
+                self.logger.info('Saved %d training samples to %s', writer.num_samples, path)
+                if isinstance(writer, ReservoirWriter):
+                    self.logger.info('Samples kept/offered per choice: %s', ', '.join(\
+                        '%d/%d' % kept for kept in zip(writer.num_filled, writer.num_offered)))
+            else:
+                writer.discard()
+            stats = writer.io.get_stats()
+            self.logger.info(('Background writer: %d jobs (%d failed), %.1f MB at %.1f MB/s, ' +
+                                'blocked the bot for %.2f s, %d jobs queued'), stats['num_jobs'], \
+                                stats['num_errors'], stats['mb_written'], stats['mb_per_sec'], \
+                                stats['blocked_sec'], stats['queued'])
 
         # delete your logger because it'll persist
         self.logger.info('Closing bot...')
         self.logger.removeHandler(self.ch)
         del self.logger, self.ch
 
+    async def on_building_construction_started(self, unit):
+        """Function called when one of our workers has started building a
+        structure. Its footprint is stamped into our placement grid.
+
+        Argument Keywords:
+            unit {sc2.unit.Unit} -- the structure that's being built
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            placement   {PlacementGrid}
+            planner     {ProductionPlanner}
+
+        Attributes Referenced:
+            placement   {PlacementGrid}
+            planner     {ProductionPlanner}
+        """
+        self.placement.add_structure(unit)
+        self.planner.on_construction_started(unit)
+
+    async def on_building_construction_complete(self, unit):
+        """Function called when one of our structures has finished building
+
+        Argument Keywords:
+            unit {sc2.unit.Unit} -- the structure that's ready
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            planner     {ProductionPlanner}
+            worker_mgr  {WorkerManager}     --  if it's a townhall or a
+                                                vespene geyser building
+
+        Attributes Referenced:
+            planner     {ProductionPlanner}
+            worker_mgr  {WorkerManager}
+            unitid      {dict}  --  "townhall_bldg"
+                                    "vgs_bldg"
+        """
+        self.planner.on_construction_complete(unit)
+        if unit.type_id == self.unitid["townhall_bldg"]:
+            self.worker_mgr.add_base(unit, self.mineral_field)
+        elif unit.type_id == self.unitid["vgs_bldg"]:
+            self.worker_mgr.add_geyser(unit)
+
+    async def on_unit_created(self, unit):
+        """Function called when one of our units has been trained
+
+        Argument Keywords:
+            unit {sc2.unit.Unit} -- the unit that's been created
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            planner     {ProductionPlanner}
+            worker_mgr  {WorkerManager}     --  if it's a worker
+
+        Attributes Referenced:
+            planner     {ProductionPlanner}
+            worker_mgr  {WorkerManager}
+            unitid      {dict}  --  "worker"
+        """
+        self.planner.on_construction_complete(unit)
+        if unit.type_id == self.unitid["worker"]:
+            self.worker_mgr.add_worker(unit.tag)
+
+    async def on_unit_destroyed(self, unit_tag):
+        """Function called when a unit or structure (ours or the enemy's) has
+        been destroyed
+
+        Argument Keywords:
+            unit_tag {int} -- tag of the unit that's been destroyed
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            placement   {PlacementGrid}     --  frees up the footprint if it
+                                                was one of our structures
+            planner     {ProductionPlanner} --  if it was in our tech chain
+            worker_mgr  {WorkerManager}     --  if it was a worker, townhall
+                                                or vespene geyser building
+            commands    {CommandLayer}      --  its order history is dropped
+            enemy_memory {EnemyMemory}      --  if it was the enemy's
+
+        Attributes Referenced:
+            placement   {PlacementGrid}
+            planner     {ProductionPlanner}
+            worker_mgr  {WorkerManager}
+            commands    {CommandLayer}
+            enemy_memory {EnemyMemory}
+        """
+        self.placement.remove_structure(unit_tag)
+        self.planner.on_destroyed(unit_tag)
+        self.worker_mgr.on_destroyed(unit_tag)
+        self.commands.forget(unit_tag)
+        self.enemy_memory.forget(unit_tag)
+
     async def on_step(self, iteration: int):
         """Function called at each iteration of the bot's lifecycle. This
         function then does several things:
         - track the time in the bot (doesn't matter if it's not realtime)
+        - remember where we've seen the enemy's units and structures
         - gather intel on the state of the game (enemies vs. allied forces)
-        - distribute workers to gather resources
+        - update the threat map with where allied and enemy forces are
+        - assign new/idle workers to gather resources
         - start gathering enough resources to send a scout
+        - send workers ahead of time to builds we'll soon be able to afford
         - if we've reached our threshold of units, increase the supply cap
         - build worker units that'll gather resources
         - build vespene gas structures to gather different kinds of resources
         - build a townhall structure if enough time has passed
         - build combat structures if we have enough resources
+        - train every unit that's been asked for in one batch
         - decide on how to engage the enemy
 
         Argument Keywords:
@@ -353,25 +649,34 @@ class Protoss(sc2.BotAI):
         # increment our timekeeper
         #----------------------------------------------------------------------
         self.sim_time_min = (self.state.game_loop/22.4)/60
+        self.placement.release_expired(self.state.game_loop)
+        self.economy.update(self)
+        self.enemy_memory.update(self)
 
         #----------------------------------------------------------------------
         # run all of the bot's actions
         #----------------------------------------------------------------------
         await self.gather_intelligence()
-        await self.distribute_workers() # only affects "idle" workers
+        self.threat.update(self.units, 'ally')
+        self.threat.update(self.enemy_units | self.enemy_structures, 'enemy')
+        self.worker_mgr.step(self) # only commands workers whose assignment changed
         await self.scout_enemy()
+        await self.pre_move_builders()
         await self.build_supply_cap()
         await self.train_worker_units()
         await self.build_vespene_gas_structure()
         await self.build_townhall_structure()
         await self.build_combat_structures()
         await self.train_combat_units()
+        self.dispatch_production()
         await self.engage_enemy()
 
     async def gather_intelligence(self):
         """This function helps gather information on the state of the armies of
         both our forces and our enemy's forces. We'll draw circles for each
-        type of unit as well as the amount of resources that we've collected
+        type of unit as well as the amount of resources that we've collected.
+        Everything that's drawn is first recorded in an entity table (plus
+        the HUD scalars), and the intel image is rasterized from that table
 
         Argument Keywords:
             N/A
@@ -385,26 +690,26 @@ class Protoss(sc2.BotAI):
         Attributes Affected:
             self.collect_data {dict} -- modify 'current_intel' key to what is
                                         generated by the end of this function
+                                        and 'current_entities' to the
+                                        (entity table, HUD scalars) it's
+                                        rasterized from
 
         Attributes Referenced:
             color_scheme    {dict}
+            palette         {list}
+            role_of         {dict}
             unitid          {dict}  --  "townhall_bldg"
                                         "supply_bldg"
                                         "worker"
                                         "scout"
                                         "combat"
             collect_data    {dict}  --  "current_intel"
+            enemy_memory    {EnemyMemory}
         """
         use_radius = True
         radius_scale = 7
-
-        #----------------------------------------------------------------------
-        # make an empty grid that fits the game's map's size
-        #----------------------------------------------------------------------
-        game_data = np.zeros(
-            (self.game_info.map_size[1], self.game_info.map_size[0], 3),
-            np.uint8
-        )
+        # one (type_id, owner, x, y, radius, role) row per plotted unit/structure
+        rows = []
 
         #----------------------------------------------------------------------
         # start "coloring-in" your own structures and units as well as your
@@ -423,22 +728,36 @@ class Protoss(sc2.BotAI):
                     radius = struct.footprint_radius*radius_scale if use_radius else 3
                 else:
                     radius = struct.footprint_radius*radius_scale if use_radius else 5
-                # get the color
-                color = self.color_scheme[struct.type_id]
                 # plot a circle in our map with the given radius and color
-                cv2.circle(game_data, (int(pos[0]), int(pos[1])), int(radius), color, -1)
+                rows.append((struct.type_id.value, OWNER_SELF, int(pos[0]), int(pos[1]), \
+                                int(radius), self.role_of[struct.type_id]))
 
         for struct in self.enemy_structures:
             pos = struct.position
             # check if it's a townhall structure
-            if struct.name.lower() in ["nexus", "commandcenter", "hatchery"]:
+            if is_class(struct.type_id, UNIT_CLASS.TOWNHALL):
                 radius = struct.footprint_radius*radius_scale if use_radius else 15
-                color = self.color_scheme["enemy_townhall"]
+                role = self.role_of["enemy_townhall"]
             else: # it's a non-townhall structure
                 radius = struct.footprint_radius*radius_scale if use_radius else 5
-                color = self.color_scheme["enemy_structure"]
+                role = self.role_of["enemy_structure"]
             # plot a circle in our map with the given radius and color
-            cv2.circle(game_data, (int(pos[0]), int(pos[1])), int(radius), color, -1)
+            rows.append((struct.type_id.value, OWNER_ENEMY, int(pos[0]), int(pos[1]), \
+                            int(radius), role))
+
+        # also plot the enemy structures that we remember but can't see right now
+        for tag, entry in self.enemy_memory.get_structures():
+            if self.enemy_memory.is_visible(tag):
+                continue # already plotted above
+            pos = entry["position"]
+            if is_class(entry["type_id"], UNIT_CLASS.TOWNHALL):
+                radius = entry["radius"]*radius_scale if use_radius else 15
+                role = self.role_of["enemy_townhall"]
+            else:
+                radius = entry["radius"]*radius_scale if use_radius else 5
+                role = self.role_of["enemy_structure"]
+            rows.append((entry["type_id"].value, OWNER_ENEMY, int(pos[0]), int(pos[1]), \
+                            int(radius), role))
 
         for key in list(self.color_scheme.keys()):
             if not isinstance(key, sc2.UnitTypeId):
@@ -453,29 +772,30 @@ class Protoss(sc2.BotAI):
                     radius = unit.radius*radius_scale if use_radius else 3
                 # get the color
                 if unit.tag == self.scout["tag"]: # it's a scout fosho, use scout color
-                    color = self.color_scheme[self.scout['orig_unitid']]
+                    role = self.role_of[self.scout['orig_unitid']]
                 else:
-                    color = self.color_scheme[unit.type_id]
+                    role = self.role_of[unit.type_id]
                 # plot a circle in our map with the given radius and color
-                cv2.circle(game_data, (int(pos[0]), int(pos[1])), int(radius), color, -1)
+                rows.append((unit.type_id.value, OWNER_SELF, int(pos[0]), int(pos[1]), \
+                                int(radius), role))
 
         for unit in self.enemy_units.filter(lambda x: not x.is_cloaked):
             pos = unit.position
             # check if it's a worker unit
-            if unit.name.lower() in ["probe", "scv",  "drone"]:
+            if is_class(unit.type_id, UNIT_CLASS.WORKER):
                 radius = unit.radius*radius_scale if use_radius else 1
-                color = self.color_scheme["enemy_worker"]
+                role = self.role_of["enemy_worker"]
             else: # consider it a combat unit
                 radius = unit.radius*radius_scale if use_radius else 3
-                color = self.color_scheme["enemy_combat"]
+                role = self.role_of["enemy_combat"]
             # plot a circle in our map with the given radius and color
-            cv2.circle(game_data, (int(pos[0]), int(pos[1])), int(radius), color, -1)
+            rows.append((unit.type_id.value, OWNER_ENEMY, int(pos[0]), int(pos[1]), \
+                            int(radius), role))
 
         #----------------------------------------------------------------------
         # plot some auxillary information detailing our level of various
         # resources and army units
         #----------------------------------------------------------------------
-        line_max = 50
         mineral_ratio = self.minerals / 1500
         if mineral_ratio > 1.0:
             mineral_ratio = 1.0
@@ -489,29 +809,24 @@ class Protoss(sc2.BotAI):
             population_ratio = 1.0
 
         plausible_supply = self.supply_cap / 200.0
-        if self.supply_cap == self.supply_left:
-            pass#print('hi')
         military_weight = \
             len(self.units(self.unitid["combat"])) / max((self.supply_cap-self.supply_left), 1)
         if military_weight > 1.0:
             military_weight = 1.0
 
-        # worker/supply ratio
-        cv2.line(game_data, (0, 22), (int(line_max*military_weight), 22), (250, 250, 200), 3)
-        # plausible supply (supply/200.0)
-        cv2.line(game_data, (0, 17), (int(line_max*plausible_supply), 17), (220, 200, 200), 3)
-        # population ratio (supply_left/supply)
-        cv2.line(game_data, (0, 12), (int(line_max*population_ratio), 12), (150, 150, 150), 3)
-        # gas / 1500
-        cv2.line(game_data, (0, 7), (int(line_max*vespene_ratio), 7), (210, 200, 0), 3)
-        # minerals minerals/1500
-        cv2.line(game_data, (0, 2), (int(line_max*mineral_ratio), 2), (0, 255, 25), 3)
+        # in HUD_FIELDS order: worker/supply ratio, plausible supply (supply/200.0), population
+        # ratio (supply_left/supply), gas/1500, minerals/1500
+        hud = np.array([military_weight, plausible_supply, population_ratio, vespene_ratio, \
+                        mineral_ratio], dtype=np.float64)
+        entities = make_entities(rows)
+        self.collect_data['current_entities'] = (entities, hud)
 
         # save this data in self.collect_data's 'current_intel' key. Can be used for diff things:
         # 1. Save in training data
         # 2. Input to DNN Model
         # 3. Plotting intel map
-        self.collect_data['current_intel'] = cv2.flip(game_data, 0)
+        self.collect_data['current_intel'] = \
+            rasterize(entities, hud, self.game_info.map_size, self.palette)
 
         # now, plot the intel if requested by the user
         if self.plot_map_intel:
@@ -757,24 +1072,20 @@ class Protoss(sc2.BotAI):
         #----------------------------------------------------------------------
         if not self.units(self.unitid["scout"]).exists: # check if there are scouts
             #------------------------------------------------------------------
-            # train a scout if a building's available and we have enough $$$
+            # ask for a scout, it'll be trained if a building's available and
+            # we have enough $$$
             #------------------------------------------------------------------
-            bldg = self.structures(self.unitid["scout_bldg"]).ready
-            if bldg:
-                bldg = bldg.random
-                bldg_can_build = len(bldg.orders) < 1 and self.supply_left
-                can_afford_unit = self.can_afford(self.unitid["scout"])
-                has_space_in_army = self.supply_left > 0
-                if bldg_can_build and can_afford_unit and has_space_in_army:
-                    bldg.train(self.unitid["scout"])
-                    if self.scout['tag'] == -1 and self.scout['use_worker']:
-                        self.logger.debug('Training a new Worker Unit to use as a Scout Unit')
-                    elif self.scout['tag'] == -1 and not self.scout['use_worker']:
-                        self.logger.debug('Training the first Scout Unit')
-                    elif self.scout['tag'] != -1 and self.scout['use_worker']:
-                        self.logger.debug('Training another Worker Unit to use as a Scout Unit')
-                    elif self.scout['tag'] != -1 and not self.scout['use_worker']:
-                        self.logger.debug('Training another Scout Unit')
+            if self.economy.is_due(self.unitid["scout"], self.state.game_loop):
+                if self.scout['tag'] == -1 and self.scout['use_worker']:
+                    note = ('Training a new Worker Unit to use as a Scout Unit',)
+                elif self.scout['tag'] == -1 and not self.scout['use_worker']:
+                    note = ('Training the first Scout Unit',)
+                elif self.scout['tag'] != -1 and self.scout['use_worker']:
+                    note = ('Training another Worker Unit to use as a Scout Unit',)
+                else:
+                    note = ('Training another Scout Unit',)
+                # logged once the scout's actually being trained
+                self.production.request(self.unitid["scout"], self.unitid["scout_bldg"], 1, note)
         else: # a scout has been trained
             #------------------------------------------------------------------
             # locate the scout you want to use
@@ -784,6 +1095,8 @@ class Protoss(sc2.BotAI):
                 scout = self.units(self.unitid["scout"]).random
                 # record the tag of this scout
                 self.scout["tag"] = scout.tag
+                # make sure it isn't told to go back to gathering resources
+                self.worker_mgr.release(scout.tag)
                 if self.scout['use_worker']:
                     self.logger.debug('Using a Worker Unit to Scout (Worker#%d)', self.scout['tag'])
             else:
@@ -796,6 +1109,7 @@ class Protoss(sc2.BotAI):
                     scout = self.units(self.unitid["scout"]).random
                     # record the tag of our scout
                     self.scout["tag"] = scout.tag
+                    self.worker_mgr.release(scout.tag)
                     # let the user know
                     if self.scout['use_worker']:
                         self.logger.debug(( 'Scout Unit has died, going to use another Worker' +
@@ -829,19 +1143,19 @@ class Protoss(sc2.BotAI):
                 self.logger.debug('Scout Unit is going to explore Site #%d: %s', \
                         RAW_LIST_CANDIDATE_LOC.index(self.scout['target_candidate_loc']), \
                         self.scout['target_candidate_loc'])
-                scout.move(self.scout["target_candidate_loc"], queue=False)
+                self.commands.issue(scout, AbilityId.MOVE, self.scout["target_candidate_loc"])
             elif self.scout['use_worker'] and scout.is_collecting:
-                # if our scout is a worker and was caught in distribute_workers(), then just force
+                # if our scout is a worker and was caught gathering, then just force
                 # its only order to be to move to the target location
                 self.logger.debug(('Telling Worker/Scout Unit to stop collecting and' + \
                                     ' explore Site #%d: %s'), \
                         RAW_LIST_CANDIDATE_LOC.index(self.scout['target_candidate_loc']), \
                         self.scout['target_candidate_loc'])
-                scout.move(self.scout["target_candidate_loc"], queue=False)
+                self.commands.issue(scout, AbilityId.MOVE, self.scout["target_candidate_loc"])
 
     async def train_worker_units(self):
-        """This method tells random townhalls to train workers as long as the
-        demand is still there
+        """This method asks for workers to be trained at every idle townhall as
+        long as the demand is still there
 
         Argument Keywords:
             N/A
@@ -860,6 +1174,8 @@ class Protoss(sc2.BotAI):
                                     "worker"
             max_workers {int}   --  indicates the max number of workers
                                     we can make
+            production  {ProductionDispatcher}
+            economy     {IncomeForecaster}
         """
         # see if we have enough workers for each townhall
         min_num_workers_per_townhalls = \
@@ -868,18 +1184,44 @@ class Protoss(sc2.BotAI):
         # see if the number of workers we have has hit/passed the cap
         workers_exceed_cap = self.units(self.unitid["worker"]).amount >= self.max_workers
 
-        # if we need to create more workers, then make a new one
-        if not enough_workers and not workers_exceed_cap:
-            bldg = self.structures(self.unitid["townhall_bldg"]).ready
-            if bldg:
-                bldg = bldg.random
-                bldg_can_build = len(bldg.orders) < 1 and self.supply_left
-                can_afford_unit = self.can_afford(self.unitid["worker"])
-                if bldg_can_build and can_afford_unit:
-                    if self.units(self.unitid['worker']).amount % 10 == 0:
-                        self.logger.debug(  'Training a Worker Unit, number of empty spots: %d', \
-                                            self.supply_left)
-                    bldg.train(self.unitid["worker"])
+        # if we need to create more workers, then ask for as many as we're missing. They'll be
+        # trained at every idle townhall
+        if not enough_workers and not workers_exceed_cap and \
+                            self.economy.is_due(self.unitid["worker"], self.state.game_loop):
+            num_workers = self.units(self.unitid["worker"]).amount
+            note = ('Training a Worker Unit, number of empty spots: %d', self.supply_left) \
+                    if num_workers % 10 == 0 else None
+            self.production.request(self.unitid["worker"], self.unitid["townhall_bldg"], \
+                    min(min_num_workers_per_townhalls, self.max_workers) - num_workers, note)
+
+    def dispatch_production(self):
+        """Trains every unit that has been asked for during this step at every
+        idle production building, budgeting our resources and supply once. If
+        we couldn't afford a unit, then we won't ask for it again until our
+        income forecaster thinks we can.
+
+        Argument Keywords:
+            N/A
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            production  {ProductionDispatcher}  --  its requests are cleared
+            economy     {IncomeForecaster}      --  unaffordable units are
+                                                    deferred
+
+        Attributes Referenced:
+            production  {ProductionDispatcher}
+            economy     {IncomeForecaster}
+        """
+        _, unaffordable = self.production.dispatch(self)
+        for unit_type in unaffordable:
+            self.economy.defer(unit_type, self.calculate_cost(unit_type), \
+                                self.minerals, self.vespene, self.state.game_loop)
 
     async def build_supply_cap(self):
         """This method tells random townhalls to create workers as long as
@@ -907,11 +1249,209 @@ class Protoss(sc2.BotAI):
         # check if we need to build a new supply building
         if we_are_running_low and not a_supply_bldg_is_pending:
             bldg = self.structures(self.unitid["townhall_bldg"]).ready
-            if bldg and self.can_afford(self.unitid["supply_bldg"]):
+            if bldg and self.can_afford_now(self.unitid["supply_bldg"]):
                 self.logger.debug(  "Building a Supply Building, we only have %d spots left", \
                                     self.supply_left)
                 bldg = bldg.random # build near a random townhall
-                await self.build(self.unitid["supply_bldg"], near=bldg)
+                await self.build_near(self.unitid["supply_bldg"], bldg.position)
+
+    def can_afford_now(self, unit_type):
+        """Checks if we can afford a unit or structure right now. If we can't,
+        then we won't check again until our income forecaster thinks we can.
+
+        Argument Keywords:
+            unit_type {sc2.UnitTypeId} -- unit or structure we want to make
+
+        Raises:
+            N/A
+
+        Returns:
+            {bool} -- True if we can afford it right now
+
+        Attributes Affected:
+            economy {IncomeForecaster}  --  the check is deferred if we can't
+                                            afford it
+
+        Attributes Referenced:
+            economy {IncomeForecaster}
+        """
+        if not self.economy.is_due(unit_type, self.state.game_loop):
+            return False
+        if self.can_afford(unit_type):
+            return True
+        self.economy.defer(unit_type, self.calculate_cost(unit_type), \
+                            self.minerals, self.vespene, self.state.game_loop)
+        return False
+
+    async def pre_move_builders(self):
+        """Makes a short build schedule out of the structures we want next
+        (a supply building if we're running low and the next combat
+        structure) and predicts when each one can start. If a worker would
+        need longer to walk to a build site than it'll take to afford that
+        build, then it's sent there now and the site is reserved for it.
+
+        Argument Keywords:
+            N/A
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            premoved_builds {dict}  --  unitid -> (build site, worker tag) of
+                                        each worker we've sent ahead of time
+
+        Attributes Referenced:
+            commands                {CommandLayer}
+            economy                 {IncomeForecaster}
+            planner                 {ProductionPlanner}
+            placement               {PlacementGrid}
+            premoved_builds         {dict}
+            supply_threshold        {int}
+            combat_bldg_build_rate  {float}
+            power_radius            {float}
+            unitid                  {dict}  --  "supply_bldg"
+                                                "townhall_bldg"
+        """
+        game_loop = self.state.game_loop
+        # forget about sites we've given up on (their reservation has expired)
+        for unit_type in list(self.premoved_builds.keys()):
+            if self.premoved_builds[unit_type][0] not in self.placement.reserved:
+                self.premoved_builds.pop(unit_type)
+
+        #----------------------------------------------------------------------
+        # list the builds we want next, in order, along with where they go
+        #----------------------------------------------------------------------
+        queue = []
+        townhalls = self.structures(self.unitid["townhall_bldg"]).ready
+        if townhalls and self.supply_left < self.supply_threshold \
+                                            and not self.already_pending(self.unitid["supply_bldg"]):
+            queue.append(((self.unitid["supply_bldg"], townhalls.random.position, 15), \
+                            self.calculate_cost(self.unitid["supply_bldg"])))
+        supply_bldgs = self.structures(self.unitid["supply_bldg"]).ready
+        next_builds = self.planner.get_next_builds(\
+                            game_loop, int(self.sim_time_min / self.combat_bldg_build_rate))
+        if supply_bldgs and next_builds:
+            queue.append(((next_builds[0], supply_bldgs.random.position, self.power_radius), \
+                            self.calculate_cost(next_builds[0])))
+
+        #----------------------------------------------------------------------
+        # send workers to the builds that'll be affordable by the time they
+        # get there (builds that are affordable right now are left alone)
+        #----------------------------------------------------------------------
+        schedule = self.economy.get_schedule(queue, self.minerals, self.vespene, game_loop)
+        for (unit_type, near, max_distance), start_loop in schedule:
+            if unit_type in self.premoved_builds or start_loop <= game_loop \
+                                                            or start_loop == math.inf:
+                continue
+            worker = self.select_builder(near)
+            if worker is None:
+                continue
+            # movement_speed is in distance per game second (16 game loops)
+            travel_loops = worker.distance_to(near) / max(worker.movement_speed/16, 1e-3)
+            if travel_loops < start_loop - game_loop:
+                continue # there's still time
+            pos = await self.placement.find_placement(self, unit_type, near, max_distance)
+            if pos is None:
+                continue
+            self.logger.debug('Sending Worker#%d ahead of time to build a %s at %s', \
+                                worker.tag, unit_type.name, pos)
+            self.commands.issue(worker, AbilityId.MOVE, pos)
+            self.worker_mgr.release(worker.tag)
+            self.placement.reserve(
+                pos, unit_type, int(start_loop) + int(self.wait_pending_bldg_min*60*22.4))
+            self.premoved_builds[unit_type] = (pos, worker.tag)
+
+    def select_builder(self, pos):
+        """Picks a worker to build something at pos, like python-sc2's
+        select_build_worker() does, except that workers we've sent ahead of
+        time to another build site (and our scout) are never picked. Those
+        only have a single move order, so select_build_worker() would take
+        them.
+
+        Argument Keywords:
+            pos {sc2.position.Point2}   --  where the worker's going to build
+
+        Raises:
+            N/A
+
+        Returns:
+            {sc2.unit.Unit} -- closest available worker (preferably an idle
+                               one), or None if there isn't one
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            premoved_builds {dict}
+            scout           {dict}  --  "tag"
+        """
+        reserved = {tag for _, tag in self.premoved_builds.values()}
+        reserved.add(self.scout['tag'])
+        workers = self.workers.tags_not_in(reserved)
+        nearby = workers.filter(lambda w: (w.is_gathering or w.is_idle) and w.distance_to(pos) < 20)
+        for worker in (nearby or workers).sorted_by_distance_to(pos).prefer_idle:
+            if not worker.orders and worker.tag not in self.unit_tags_received_action or \
+                    len(worker.orders) == 1 and \
+                    worker.orders[0].ability.id in {AbilityId.MOVE, AbilityId.HARVEST_GATHER}:
+                return worker
+        return None
+
+    async def build_near(self, unit_type, near, max_distance=15):
+        """Builds a structure close to a given position. The build site is
+        picked from our local placement grid and validated with a single query
+        to the game server, then reserved until construction starts.
+
+        Argument Keywords:
+            unit_type       {sc2.UnitTypeId}        --  structure to build
+            near            {sc2.position.Point2}   --  where we want to build
+            max_distance    {float}                 --  max distance from near
+                                                        to the build site
+
+        Raises:
+            N/A
+
+        Returns:
+            {bool} -- True if a worker has been tasked to build the structure
+
+        Attributes Affected:
+            placement       {PlacementGrid} --  the build site is reserved
+            premoved_builds {dict}          --  if a worker was sent ahead of
+                                                time, that entry is removed
+
+        Attributes Referenced:
+            placement               {PlacementGrid}
+            premoved_builds         {dict}
+            wait_pending_bldg_min   {float}
+        """
+        # if we've already sent a worker to a build site for this, use it
+        if unit_type in self.premoved_builds:
+            pos, worker_tag = self.premoved_builds.pop(unit_type)
+            worker = self.workers.find_by_tag(worker_tag)
+            self.worker_mgr.restore(worker_tag) # it'll go back to gathering once it's done
+            if worker:
+                worker.build(unit_type, pos)
+                self.placement.reserve(
+                    pos, unit_type,
+                    self.state.game_loop + int(self.wait_pending_bldg_min*60*22.4))
+                return True
+            self.placement.release(pos)
+
+        pos = await self.placement.find_placement(self, unit_type, near, max_distance)
+        if pos is None:
+            self.logger.debug('Could not find anywhere to build a %s near %s', unit_type.name, near)
+            return False
+
+        worker = self.select_builder(pos)
+        if worker is None:
+            return False
+
+        worker.build(unit_type, pos)
+        self.placement.reserve(
+            pos, unit_type, self.state.game_loop + int(self.wait_pending_bldg_min*60*22.4))
+        return True
 
     async def build_vespene_gas_structure(self):
         """This method builds as many vespene geyser structures as possible to
@@ -992,7 +1532,7 @@ class Protoss(sc2.BotAI):
                 # If a building is pending at that Vespene Geyser's location,
                 # Then pop() this location out of the list
                 self.pre_pending_bldgs.pop(pos)
-            elif not tasked_worker and self.can_afford(self.unitid["vgs_bldg"]):
+            elif not tasked_worker and self.can_afford_now(self.unitid["vgs_bldg"]):
                 # If a building's not pending/ready and our worker's dead,
                 # Then it's time to retask a new worker for this location
 
@@ -1038,7 +1578,7 @@ class Protoss(sc2.BotAI):
 
                 pre_pending = vg_geyser.position in self.pre_pending_bldgs.keys()
                 # check that you can afford to build a vgs building
-                has_rsrcs = self.can_afford(self.unitid["vgs_bldg"])
+                has_rsrcs = self.can_afford_now(self.unitid["vgs_bldg"])
                 # make sure that a vgs building does not already exists at the same spot
                 bldg_done = available_vgs_bldgs.ready.closer_than(1, vg_geyser).exists
                 # make sure that a vgs build is not pending
@@ -1092,7 +1632,7 @@ class Protoss(sc2.BotAI):
 
         # let's do some checks to see if we should build another townhall
         need_new_bldg = self.structures(self.unitid["townhall_bldg"]).amount < max_townhalls_rn
-        can_afford_bldg = self.can_afford(self.unitid["townhall_bldg"])
+        can_afford_bldg = need_new_bldg and self.can_afford_now(self.unitid["townhall_bldg"])
         bldg_being_built = self.already_pending(self.unitid["townhall_bldg"])
 
         # if we do need to build a new townhall, do it
@@ -1110,7 +1650,8 @@ class Protoss(sc2.BotAI):
 
         Also, we will build "dependency buildings" first, then the scout's
         combat building, and finally, our target combat unit's building. Then,
-        The target's combat building will keep being built
+        The target's combat building will keep being built. The order comes
+        from self.dependencies, through our production planner.
 
         Argument Keywords:
             N/A
@@ -1125,58 +1666,33 @@ class Protoss(sc2.BotAI):
             N/A
 
         Attributes Referenced:
-            unitid  {dict}  --  "supply_bldg"
-                                "combat_bldg_addons"
-                                "combat_bldg"
+            unitid                  {dict}  --  "supply_bldg"
+                                                "combat_bldg"
+            planner     {ProductionPlanner}
+            combat_bldg_build_rate  {float}
+            wait_pending_bldg_min   {float}
         """
         supply_bldg = self.structures(self.unitid["supply_bldg"]).ready
         if not supply_bldg:
             return # there are no supply buildings, do not build anything!
 
-        # else, get a random supply building
+        # ask the planner which buildings have all of their dependencies ready,
+        # in order of priority. Only the first one is built
+        max_bldgs_rn = int(self.sim_time_min / self.combat_bldg_build_rate)
+        next_builds = self.planner.get_next_builds(self.state.game_loop, max_bldgs_rn)
+        if not next_builds or not self.can_afford_now(next_builds[0]):
+            return
+
+        val = next_builds[0]
+        if val == self.unitid["combat_bldg"] and self.planner.get_amount(val):
+            self.logger.debug("Building %s building #%d", val.name, self.planner.get_amount(val)+1)
+        else:
+            self.logger.debug('Building a %s Building', val.name)
+        # get a random supply building to build next to
         supply_bldg = supply_bldg.random
-        # make a list of buildingds to build. These buildings will be built in
-        # that order....
-        bldgs_to_build =    self.unitid["combat_bldg_addons"] + \
-                            [self.unitid["scout_bldg"]] + \
-                            [self.unitid["combat_bldg"]]
-
-        for idx, val in enumerate(bldgs_to_build):
-            # first, check if the building exists either in the pending list OR in the actual list
-            # of structures. If one of the pending structures has already been built, then it is
-            # ignored
-            pend_bldgs = list(self.pending_combat_bldgs.keys())
-            #if val in pend_bldgs:
-            #    print('hmm')
-            for bldg in pend_bldgs:
-                if self.pending_combat_bldgs[bldg] <= self.sim_time_min:
-                    # doesn't matter if it's actually there or not, remove it since time has passed
-                    self.pending_combat_bldgs.pop(bldg)
-
-            pend_bldgs = list(self.pending_combat_bldgs.keys())
-            bldg_exists = self.structures(val).exists or (val in pend_bldgs)
-
-            prev_bldg_exists = not idx or \
-                                    (self.structures(bldgs_to_build[idx-1]).ready.exists and idx)
-            can_afford_bldg = self.can_afford(val) # checks if we can afford to build it
-            is_last_bldg = val == bldgs_to_build[-1] # checks if it's the last bldg in the list
-            time_to_build_dep_bldg = not bldg_exists and can_afford_bldg
-
-            max_bldgs_rn = int(self.sim_time_min / self.combat_bldg_build_rate)
-            need_new_bldg = self.structures(val).amount < max_bldgs_rn
-            time_to_keep_building_last_bldg = is_last_bldg and can_afford_bldg and need_new_bldg \
-                                                and val not in pend_bldgs
-
-            if prev_bldg_exists and (time_to_build_dep_bldg or time_to_keep_building_last_bldg):
-                # make sure the previous one was made
-                if not bldg_exists and not is_last_bldg:
-                    self.logger.debug('Building a %s Building', val.name)
-                elif is_last_bldg:
-                    self.logger.debug("Building %s building #%d", \
-                                                val.name, self.structures(val).amount+1)
-                await self.build(val, near=supply_bldg)
-                self.pending_combat_bldgs[val] = self.sim_time_min + self.wait_pending_bldg_min
-                break
+        if await self.build_near(val, supply_bldg.position, self.power_radius):
+            self.planner.mark_ordered(
+                val, self.state.game_loop + int(self.wait_pending_bldg_min*60*22.4))
 
     async def train_combat_units(self):
         """Once the primary combat structure is built, we will start building
@@ -1196,27 +1712,28 @@ class Protoss(sc2.BotAI):
             N/A
 
         Attributes Referenced:
-            unitid  {dict}  --  "combat_bldg"
-                                "combat"
+            unitid      {dict}  --  "combat_bldg"
+                                    "combat"
+            planner     {ProductionPlanner}
+            production  {ProductionDispatcher}
         """
-        curr_num_units = -1
-        for bldg in self.structures(self.unitid["combat_bldg"]).ready.idle:
-            if self.can_afford(self.unitid["combat"]) and self.supply_left > 0:
-                if (self.units(self.unitid['combat']).amount % 5) == 0 and \
-                                        self.units(self.unitid['combat']).amount != curr_num_units:
-                    curr_num_units = self.units(self.unitid['combat']).amount
-                    self.logger.debug('Training a Combat Unit, current total: %d', \
-                                        self.units(self.unitid['combat']).amount)
-                bldg.train(self.unitid["combat"])
+        # ask for a combat unit at every combat structure, only the idle ones will train it
+        num_bldgs = self.planner.num_ready[self.unitid["combat_bldg"]]
+        if num_bldgs and self.economy.is_due(self.unitid["combat"], self.state.game_loop):
+            num_units = self.units(self.unitid['combat']).amount
+            note = ('Training a Combat Unit, current total: %d', num_units) \
+                    if (num_units % 5) == 0 else None
+            self.production.request(self.unitid["combat"], self.unitid["combat_bldg"], num_bldgs, \
+                                    note)
 
         # have idle combat units go to the most vulnerable townhall
         most_vuln_townhall = self.structures(self.unitid['townhall_bldg'])
         if most_vuln_townhall:
-            most_vuln_townhall = most_vuln_townhall.furthest_to(self.start_location)
+            most_vuln_townhall = most_vuln_townhall.furthest_to(self.start_location).position
         else:
             most_vuln_townhall = self.start_location
         for unit in self.units(self.unitid['combat']).idle:
-            unit.move(most_vuln_townhall)
+            self.commands.issue(unit, AbilityId.MOVE, most_vuln_townhall)
 
     async def engage_enemy(self):
         """In here, the bot makes the decision on how to engage the enemy.
@@ -1225,10 +1742,13 @@ class Protoss(sc2.BotAI):
         make them do one of four choices/actions:
         1. DISENGAGE FROM ENEMY: Run back to home base and wait for a short
            period of time (1-3 min)
-        2. ENGAGE ENEMY UNITS: Target enemy units that are closest to one of
-           our townhalls (randomly picked).
-        3. ENGAGE ENEMY STRUCTURES: Target an enemy structure randomly.
-        4. GO TO ENEMY'S START LOCATION: Send combat units to the enemy's start
+        2. ENGAGE ENEMY UNITS: Target the weakest concentration of enemy units
+           on our threat map (or the enemy units that are closest to our
+           furthest townhall).
+        3. ENGAGE ENEMY STRUCTURES: Target the closest enemy structure that we
+           remember (townhalls first), even if we can't see it right now.
+        4. GO TO ENEMY'S START LOCATION: Send combat units to the enemy's main
+           townhall (if we remember where it is) or to the enemy's start
            location and hope that there are enemy units/structures there to
            attack.
 
@@ -1237,14 +1757,15 @@ class Protoss(sc2.BotAI):
         ===========
         Rule-Based:
         ===========
-        - CHOICE #1: If we have <=4 combat units
+        - CHOICE #1: If we have <=4 combat units, or if we have >=6 combat
+          units but the threat map says the enemy's stronger around them
         - CHOICE #2: If we have >=6 combat units and there are visible enemy
           units.
         - CHOICE #3: If we have >=6 combat units and there are no more visible
-          enemy units but there are visible enemy structures
-        - CHOICE #4: If we have >=6 combat units and no enemy units or
-          structures are visible (either because we've killed/destroyed
-          everything or because we haven't detected anything)
+          enemy units but we remember some enemy structures
+        - CHOICE #4: If we have >=6 combat units, no enemy units are visible
+          and we don't remember any enemy structures (either because we've
+          destroyed everything or because we haven't detected anything)
         =======
         Random:
         =======
@@ -1253,7 +1774,12 @@ class Protoss(sc2.BotAI):
         DNN:
         ====
         - We use a DNN (usually a CNN) to figure out what it thinks is the best
-          choice using on our intel map's most recent data.
+          choice using on our intel map's most recent data. If the model runs
+          in an inference worker, then we hand it the newest intel and go with
+          its latest prediction (no choice is made until it has one). The
+          model's only run again when the intel looks different from the
+          last time it was run (and, if it's set, no more often than
+          max_decisions_per_sec).
 
         Argument Keywords:
             N/A
@@ -1265,16 +1791,21 @@ class Protoss(sc2.BotAI):
             N/A
 
         Attributes Affected:
-            collect_data    {dict}  --  "training_data"
+            collect_data    {dict}  --  "writer"
 
         Attributes Referenced:
             unitid          {dict}  --  "combat"
                                         "townhall_bldg"
             sim_time_min    {float}
             collect_data    {dict}  --  "exists"
-                                        "training_data"
+                                        "writer"
+                                        "filter"
                                         "current_intel"
             model           {dict}  --  "model"
+            micro           {FocusFireMicro}
+            commands        {CommandLayer}
+            threat          {ThreatMap}
+            enemy_memory    {EnemyMemory}
         """
         rand_wait_time_min = random.uniform(1, 3) # if we need to delay, will only delay for 1-3min
         combat_unit_rule = [6, 4] # if <4, then run back home, if >5, then engage
@@ -1292,14 +1823,18 @@ class Protoss(sc2.BotAI):
         # Make a Decision based on the bot's mode
         #----------------------------------------------------------------------
         if self.bot_mode == utils.BOT_MODE.RULE_BASED:
-            if self.units(self.unitid["combat"]).amount <= min(combat_unit_rule):
+            combat_units = self.units(self.unitid["combat"])
+            if combat_units.amount <= min(combat_unit_rule):
                 target["choice"][0] = 1
-            elif self.units(self.unitid["combat"]).amount >= max(combat_unit_rule):
-                if self.enemy_units.filter(lambda x: not x.is_cloaked).amount:
+            elif combat_units.amount >= max(combat_unit_rule):
+                if not self.threat.is_safe(combat_units.center):
+                    # the enemy's stronger than we are around our army, fall back
+                    target["choice"][0] = 1
+                elif self.enemy_units.filter(lambda x: not x.is_cloaked).amount:
                 #if self.enemy_units.amount:
                     # attack an enemy's unit
                     target["choice"][1] = 1
-                elif self.enemy_structures.amount:
+                elif self.enemy_memory.structure_tags:
                     # attack an enemy's structure
                     target["choice"][2] = 1
                 else:
@@ -1308,9 +1843,19 @@ class Protoss(sc2.BotAI):
         elif self.bot_mode == utils.BOT_MODE.RANDOM:
             target["choice"][random.randrange(0, 4)] = 1
         elif self.bot_mode == utils.BOT_MODE.DNN:
-            prediction = self.model['model'].predict(\
-                            self.collect_data['current_intel'].reshape([-1, 176, 200, 3]))
-            target["choice"][np.argmax(prediction[0])] = 1
+            intel = self.collect_data['current_intel']
+            reuse = self.model['cache'].is_hit(intel, self.state.game_loop)
+            if self.model['worker'] is not None:
+                if not reuse:
+                    self.model['worker'].submit(intel, self.state.game_loop)
+                prediction = self.model['worker'].get_latest(self.state.game_loop)
+            else:
+                if not reuse:
+                    self.model['cache'].store(\
+                        self.model['model'].predict(intel.reshape([-1, 176, 200, 3]))[0])
+                prediction = self.model['cache'].prediction
+            if prediction is not None:
+                target["choice"][np.argmax(prediction)] = 1
         else:
             self.logger.error("Bot's given Mode is not handled in engage_enemy(), will not engage")
             # TODO: Is there some way to exit the bot immediately? Maybe just raise an exception?
@@ -1339,24 +1884,24 @@ class Protoss(sc2.BotAI):
             #e_units = self.enemy_units
             target["found"] = len(e_units)
             target["loc"] = e_units.closest_to(target_townhall) if target['found'] else 0
+            # but go for the enemy's weakest concentration of units, if we know where it is
+            weakest_enemy = self.threat.get_weakest_enemy_position()
+            if target['found'] and weakest_enemy is not None:
+                target["loc"] = weakest_enemy
         elif target["choice"][2]:
-            # target enemy structures that you can see
+            # target enemy structures that we remember, whether we can see them or not
             tgt_townhall = \
                     self.structures(self.unitid["townhall_bldg"]).furthest_to(self.start_location)
-            target["found"] = len(self.enemy_structures)
-            target["loc"] = self.enemy_structures.closest_to(tgt_townhall) if target['found'] else 0
             # if there's a townhall, target that first
-            townhall_names = ["nexus", "commandcenter", "hatchery"]
-            enemy_townhalls = self.enemy_structures.filter( \
-                                lambda x: x.name.lower() in ["nexus", "commandcenter", "hatchery"])
-            if enemy_townhalls and target["loc"] not in enemy_townhalls:
-                # if we're not targeting a townhall, then target it
-                target["loc"] = enemy_townhalls.closest_to(tgt_townhall) if target['found'] else 0
+            target["loc"] = \
+                self.enemy_memory.get_closest_structure(tgt_townhall.position, True) or \
+                self.enemy_memory.get_closest_structure(tgt_townhall.position)
+            target["found"] = target["loc"] is not None
         elif target["choice"][3]:
-            # target the enemy's start location
+            # target the enemy's main townhall, if we remember one, or else their start location
             target["found"] = True
-            # fake a townhall existance
-            target["loc"] = self.enemy_start_locations[0]
+            target["loc"] = self.enemy_memory.get_closest_structure(\
+                                self.enemy_start_locations[0], True) or self.enemy_start_locations[0]
 
         #----------------------------------------------------------------------
         # If we have an action to do, then do it. Else, exit w/o doing anything
@@ -1372,13 +1917,25 @@ class Protoss(sc2.BotAI):
                 
                 self.logger.fatal(  "Decided action: %s | Target's Location: %s", \
                                     choice_dict[np.argmax(target["choice"])], pos)
-            if self.collect_data["exists"]:
-                self.collect_data['training_data'].append(\
-                    [target["choice"], self.collect_data['current_intel']])
-
-            # Tell your combat units what to do
-            for unit in self.units(self.unitid["combat"]):
-                unit.attack(pos, queue=False)
+            sample_filter = self.collect_data['filter']
+            if self.collect_data["exists"] and (sample_filter is None or \
+                    sample_filter.keep(target["choice"], self.collect_data['current_intel'])):
+                if self.collect_data['format'] == utils.DATA_FORMAT.ENTITIES:
+                    self.collect_data['writer'].append(\
+                        target["choice"], self.collect_data['current_entities'])
+                else:
+                    self.collect_data['writer'].append(\
+                        target["choice"], self.collect_data['current_intel'])
+
+            # Tell your combat units what to do. If we're attacking, then units with enemies in
+            # range focus fire on them and the rest of them head to the target location
+            combat_units = self.units(self.unitid["combat"])
+            focus_targets = {}
+            if not target["choice"][0]:
+                focus_targets = self.micro.assign_targets(combat_units, \
+                    self.enemy_units.filter(lambda x: not x.is_cloaked) | self.enemy_structures)
+            for unit in combat_units:
+                self.commands.issue(unit, AbilityId.ATTACK, focus_targets.get(unit.tag, pos))
 
         # finally, remember your previous attack strat to limit the number of printouts
         self.prev_target = target
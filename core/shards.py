@@ -0,0 +1,289 @@
+"""
+    This module contains a compaction tool that packs saved games into
+    fixed-layout dataset shards, and the loader that reads them.
+
+    Training used to unpickle every game into a list of [label, frame] pairs
+    and rebuild arrays from them. Instead, games can be compacted once into
+    shards: each one is a contiguous (N, 176, 200, 3) uint8 frames .npy and
+    an (N, 4) uint8 labels .npy, read back memory-mapped. A batch is then a
+    slice (or fancy index) of those arrays, with no pickling and no
+    per-sample Python objects. Compacting again only appends the games that
+    aren't in the dataset yet.
+
+    A dataset looks like this:
+        <dataset_dir>/
+            shards.json                 --  shards, their sizes and the
+                                            games they hold
+            shard_00000_frames.npy      --  (N, 176, 200, 3) uint8 frames
+            shard_00000_labels.npy      --  (N, 4) uint8 one-hot choices
+            ...
+
+    To compact a directory of saved games:
+        python -m core.shards -i <training_data_dir> -o <dataset_dir>
+"""
+import os
+import json
+import argparse
+import numpy as np
+from .training_data import FORMAT_VERSION, is_game_data, iter_game_chunks
+
+SHARDS_FILE = 'shards.json'
+
+
+def is_shard_dataset(path):
+    """Check if a directory holds compacted dataset shards"""
+    return os.path.isfile(os.path.join(path, SHARDS_FILE))
+
+
+class ShardWriter():
+    """
+    Packs games' samples into preallocated, memory-mapped shards
+    """
+    def __init__(self, out_dir, shard_size=4096, frame_shape=(176, 200, 3), num_choices=4):
+        """Opens the dataset at out_dir, or starts a new one
+
+        Argument Keywords:
+            out_dir     {string}    --  dataset directory
+            shard_size  {int}       --  no. of samples per shard
+            frame_shape {tuple}     --  shape of an intel frame
+            num_choices {int}       --  no. of choices the bot picks from
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            out_dir     {string}
+            shard_size  {int}
+            frame_shape {tuple}
+            num_choices {int}
+            shards      {list}  --  {"frames", "labels", "num_samples",
+                                    "games"} of every shard
+
+        Attributes Referenced:
+            N/A
+        """
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self.shard_size = shard_size
+        self.frame_shape = tuple(frame_shape)
+        self.num_choices = num_choices
+        self.shards = load_shards_file(out_dir)["shards"] if is_shard_dataset(out_dir) else []
+        self._frames = None # memory-mapped arrays of the shard being filled
+        self._labels = None
+        self._idx = 0
+
+    def get_games(self):
+        """Get the names of the games already in the dataset"""
+        return {game for shard in self.shards for game in shard["games"]}
+
+    def open_shard(self):
+        """Preallocate the next shard on disk"""
+        i = len(self.shards)
+        names = ('shard_%05d_frames.npy' % i, 'shard_%05d_labels.npy' % i)
+        self._frames = np.lib.format.open_memmap(os.path.join(self.out_dir, names[0]), \
+                        mode='w+', dtype=np.uint8, shape=(self.shard_size,) + self.frame_shape)
+        self._labels = np.lib.format.open_memmap(os.path.join(self.out_dir, names[1]), \
+                        mode='w+', dtype=np.uint8, shape=(self.shard_size, self.num_choices))
+        self._idx = 0
+        self.shards.append({"frames": names[0], "labels": names[1], "num_samples": 0, \
+                            "games": []})
+
+    def close_shard(self):
+        """Flush the current shard, trimming it down to the samples in use"""
+        if self._frames is None:
+            return
+        frames, labels = self._frames, self._labels
+        self._frames = self._labels = None
+        frames.flush()
+        labels.flush()
+        shard = self.shards[-1]
+        shard["num_samples"] = self._idx
+        if self._idx < len(frames):
+            trimmed = (np.array(frames[:self._idx]), np.array(labels[:self._idx]))
+            del frames, labels # let go of the memory maps before overwriting their files
+            np.save(os.path.join(self.out_dir, shard["frames"]), trimmed[0])
+            np.save(os.path.join(self.out_dir, shard["labels"]), trimmed[1])
+
+    def add_game(self, name, path):
+        """Append every sample of a saved game to the dataset
+
+        Argument Keywords:
+            name    {string}    --  game's name in the dataset
+            path    {string}    --  saved game's directory or .npy file
+
+        Raises:
+            N/A
+
+        Returns:
+            {int} -- no. of samples added
+
+        Attributes Affected:
+            shards  {list}
+
+        Attributes Referenced:
+            shard_size  {int}
+        """
+        num_added = 0
+        for frames, labels in iter_game_chunks(path):
+            start = 0
+            while start < len(frames):
+                if self._frames is None or self._idx == self.shard_size:
+                    self.close_shard()
+                    self.open_shard()
+                n = min(len(frames) - start, self.shard_size - self._idx)
+                self._frames[self._idx:self._idx + n] = frames[start:start + n]
+                self._labels[self._idx:self._idx + n] = labels[start:start + n]
+                if name not in self.shards[-1]["games"]:
+                    self.shards[-1]["games"].append(name)
+                self._idx += n
+                start += n
+                num_added += n
+        return num_added
+
+    def close(self):
+        """Flush the last shard and write shards.json (written last and
+        replaced in one step, so readers never see a half-written dataset)"""
+        self.close_shard()
+        meta = {
+            "version": FORMAT_VERSION,
+            "frame_shape": list(self.frame_shape),
+            "num_choices": self.num_choices,
+            "num_samples": sum(shard["num_samples"] for shard in self.shards),
+            "shards": self.shards
+        }
+        tmp_path = os.path.join(self.out_dir, SHARDS_FILE + '.tmp')
+        with open(tmp_path, 'w') as shards_file:
+            json.dump(meta, shards_file, indent=2)
+        os.replace(tmp_path, os.path.join(self.out_dir, SHARDS_FILE))
+
+
+def compact(src_dir, out_dir, shard_size=4096):
+    """Packs every saved game in src_dir that isn't in the dataset at out_dir
+    yet into its shards. New games start a new shard, so existing shards are
+    never rewritten
+
+    Argument Keywords:
+        src_dir     {string}    --  directory of saved games (any format)
+        out_dir     {string}    --  dataset directory
+        shard_size  {int}       --  no. of samples per shard
+
+    Raises:
+        N/A
+
+    Returns:
+        {tuple} -- no. of games and samples added
+    """
+    writer = ShardWriter(out_dir, shard_size)
+    done = writer.get_games()
+    num_games = num_samples = 0
+    for name in sorted(os.listdir(src_dir)):
+        path = os.path.join(src_dir, name)
+        if name in done or not is_game_data(path):
+            continue
+        num_samples += writer.add_game(name, path)
+        num_games += 1
+    writer.close()
+    return num_games, num_samples
+
+
+def load_shards_file(path):
+    """Loads a dataset's shards.json"""
+    with open(os.path.join(path, SHARDS_FILE)) as shards_file:
+        return json.load(shards_file)
+
+
+class ShardDataset():
+    """
+    Memory-mapped view of a compacted dataset
+    """
+    def __init__(self, path):
+        """Memory maps every shard of the dataset at path
+
+        Argument Keywords:
+            path    {string}    --  dataset directory
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            meta    {dict}          --  the dataset's shards.json
+            frames  {list}          --  memory-mapped frames of each shard
+            labels  {numpy.ndarray} --  every label, in order (these are
+                                        small enough to keep in memory)
+            offsets {numpy.ndarray} --  (num shards + 1) index of each
+                                        shard's first sample
+
+        Attributes Referenced:
+            N/A
+        """
+        self.meta = load_shards_file(path)
+        shards = [shard for shard in self.meta["shards"] if shard["num_samples"]]
+        self.frames = [np.load(os.path.join(path, shard["frames"]), mmap_mode='r') \
+                        for shard in shards]
+        labels = [np.load(os.path.join(path, shard["labels"])) for shard in shards]
+        self.labels = np.concatenate(labels) if labels else \
+                        np.zeros((0, self.meta["num_choices"]), np.uint8)
+        self.offsets = np.zeros(len(shards) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum([shard["num_samples"] for shard in shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def get_shard(self, k):
+        """Get the k-th shard's (frames, labels), without copying its frames"""
+        return self.frames[k], self.labels[self.offsets[k]:self.offsets[k + 1]]
+
+    def get_batch(self, indices, out=None):
+        """Gather the frames and labels of many samples
+
+        Argument Keywords:
+            indices {numpy.ndarray} --  sample indices, in any order (sorted
+                                        ones are gathered without any
+                                        intermediate copies)
+            out     {numpy.ndarray} --  (len(indices), 176, 200, 3) uint8
+                                        array to gather the frames into, or
+                                        None to make a new one
+
+        Raises:
+            N/A
+
+        Returns:
+            {tuple} -- frames and labels of those samples, in that order
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if out is None:
+            out = np.empty((len(indices),) + tuple(self.meta["frame_shape"]), np.uint8)
+        if np.all(indices[1:] >= indices[:-1]):
+            # sorted, so each shard's samples are a slice of out, gathered straight into it
+            bounds = np.searchsorted(indices, self.offsets)
+            for k in np.flatnonzero(bounds[1:] > bounds[:-1]):
+                rows = slice(bounds[k], bounds[k + 1])
+                np.take(self.frames[k], indices[rows] - self.offsets[k], axis=0, out=out[rows])
+            return out, self.labels[indices]
+        shard_of = np.searchsorted(self.offsets, indices, side='right') - 1
+        for k in np.unique(shard_of):
+            rows = np.flatnonzero(shard_of == k)
+            # sorted reads are much kinder to the page cache
+            order = np.argsort(indices[rows])
+            out[rows[order]] = self.frames[k][indices[rows[order]] - self.offsets[k]]
+        return out, self.labels[indices]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', dest='src_dir', type=str, required=True, \
+                        help='directory of saved games')
+    parser.add_argument('-o', dest='out_dir', type=str, required=True, \
+                        help='dataset directory (new games are appended to it)')
+    parser.add_argument('-s', dest='shard_size', type=int, default=4096, \
+                        help='no. of samples per shard')
+    args = parser.parse_args()
+
+    games, samples = compact(args.src_dir, args.out_dir, args.shard_size)
+    print('Added {} games ({} samples) to {}'.format(games, samples, args.out_dir))
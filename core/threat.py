@@ -0,0 +1,142 @@
+"""
+    This module contains an influence/threat map.
+
+    The map is split into a coarse grid of cells and we keep track of how
+    much allied and enemy strength is in each cell. A unit's strength is only
+    moved around when it changes cells (or its strength changes), and the
+    grids are blurred with a Gaussian kernel so strength spreads out to the
+    cells around it. Questions like "is it safe here?" and "where's the
+    weakest enemy concentration?" then only need a lookup into the grids.
+"""
+import math
+import cv2 # pip install opencv-python
+import numpy as np
+from sc2.position import Point2
+
+
+class ThreatMap():
+    """
+    Per-cell ally and enemy strength grids over the map
+    """
+    SIDES = ('ally', 'enemy')
+
+    def __init__(self, map_size, cell_size=4, blur_sigma=1.5, safety_ratio=1.0):
+        """Sets up empty strength grids for both sides
+
+        Argument Keywords:
+            map_size        {sc2.position.Size}     --  map's (width, height)
+            cell_size       {int}   --  width of a cell in map units
+            blur_sigma      {float} --  std. deviation (in cells) of the blur
+            safety_ratio    {float} --  a cell is safe if our strength there
+                                        is at least this many times the enemy's
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            cell_size       {int}
+            blur_sigma      {float}
+            safety_ratio    {float}
+            strength        {dict}  --  side -> raw strength grid, [y, x]
+            blurred         {dict}  --  side -> blurred strength grid, [y, x]
+            contrib         {dict}  --  tag -> (side, cell y, cell x, strength)
+            weakest_enemy   {Point2}    --  center of the cell with the
+                                            weakest enemy concentration
+
+        Attributes Referenced:
+            N/A
+        """
+        self.cell_size = cell_size
+        self.blur_sigma = blur_sigma
+        self.safety_ratio = safety_ratio
+        shape = (int(math.ceil(map_size[1]/cell_size)), int(math.ceil(map_size[0]/cell_size)))
+        self.strength = {side: np.zeros(shape, dtype=np.float32) for side in self.SIDES}
+        self.blurred = {side: np.zeros(shape, dtype=np.float32) for side in self.SIDES}
+        self.contrib = {}
+        self.weakest_enemy = None
+        self._dirty = False
+
+    @staticmethod
+    def get_strength(unit):
+        """Rough measure of how much a unit can dish out and take"""
+        return (unit.health + unit.shield)*max(unit.ground_dps, unit.air_dps)/1000
+
+    def get_cell(self, pos):
+        """Get the (y, x) cell that a position falls in"""
+        shape = self.strength['ally'].shape
+        return (min(max(int(pos[1]//self.cell_size), 0), shape[0] - 1),
+                min(max(int(pos[0]//self.cell_size), 0), shape[1] - 1))
+
+    def update(self, units, side):
+        """Moves the strength of units that have changed cells or strength
+        and drops units of that side that are no longer around
+
+        Argument Keywords:
+            units   {sc2.units.Units}   --  every unit of one side that
+                                            should be on the map right now
+            side    {string}            --  "ally" or "enemy"
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            strength    {dict}
+            contrib     {dict}
+
+        Attributes Referenced:
+            contrib     {dict}
+        """
+        grid = self.strength[side]
+        seen = set()
+        for unit in units:
+            seen.add(unit.tag)
+            cell = self.get_cell(unit.position)
+            strength = self.get_strength(unit)
+            old = self.contrib.get(unit.tag)
+            if old is not None and old[1:3] == cell and old[3] == strength:
+                continue
+            if old is not None:
+                grid[old[1], old[2]] -= old[3]
+            grid[cell] += strength
+            self.contrib[unit.tag] = (side, cell[0], cell[1], strength)
+            self._dirty = True
+
+        for tag in [t for t, c in self.contrib.items() if c[0] == side and t not in seen]:
+            _, y, x, strength = self.contrib.pop(tag)
+            grid[y, x] -= strength
+            self._dirty = True
+
+    def refresh(self):
+        """Re-blur the grids if anything has changed since the last time"""
+        if not self._dirty:
+            return
+        for side in self.SIDES:
+            np.maximum(self.strength[side], 0, out=self.strength[side]) # float round-off
+            self.blurred[side] = cv2.GaussianBlur(self.strength[side], (0, 0), self.blur_sigma)
+
+        self.weakest_enemy = None
+        occupied = self.strength['enemy'] > 1e-6
+        if occupied.any():
+            cell = np.unravel_index(
+                np.argmin(np.where(occupied, self.blurred['enemy'], np.inf)), occupied.shape)
+            self.weakest_enemy = Point2((float((cell[1] + 0.5)*self.cell_size), \
+                                         float((cell[0] + 0.5)*self.cell_size)))
+        self._dirty = False
+
+    def is_safe(self, pos):
+        """Check if our strength around a position outweighs the enemy's"""
+        self.refresh()
+        cell = self.get_cell(pos)
+        return self.blurred['ally'][cell] >= self.safety_ratio*self.blurred['enemy'][cell]
+
+    def get_weakest_enemy_position(self):
+        """Get the center of the cell holding the weakest enemy concentration,
+        or None if we don't know of any enemies"""
+        self.refresh()
+        return self.weakest_enemy
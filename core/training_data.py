@@ -0,0 +1,832 @@
+"""
+    This module contains a streaming writer for the training data our bot
+    collects during a game, and a loader that can read it back.
+
+    Instead of holding every (choice, intel frame) pair in memory until the
+    game ends, the writer appends them to preallocated, memory-mapped .npy
+    chunks on disk as the game goes on, so the bot's memory usage stays flat.
+    Everything's written to a temporary directory first. If we win, that
+    directory gets a meta.json and is renamed to its final name in one step,
+    so readers never see a half-written game. If we lose, it's just deleted.
+    When the writer's given an AsyncWriter, all of this disk I/O happens on
+    its background thread instead of the game's event loop.
+
+    Consecutive intel frames are nearly identical and usually carry the same
+    choice, so a sample filter drops frames that look too much like the last
+    kept one and keeps fewer frames the longer a decision goes unchanged.
+    Changes in the choice are always kept.
+
+    model.py ends up truncating every choice down to the rarest one, so a
+    reservoir writer can keep a bounded, uniformly sampled reservoir per
+    choice instead and only write those, rather than saving data that'd be
+    thrown away anyway.
+
+    Games can also be saved as the entity tables (and HUD scalars) that
+    gather_intelligence() rasterizes its intel image from, which is a few
+    hundred bytes per sample instead of ~105 KB. load_game_data() rasterizes
+    them back into the exact same images.
+
+    Full intel frames can also be saved as a compressed archive of keyframes
+    and XOR deltas (see frame_archive.py), which is much smaller than the
+    .npy chunks and can still be read one sample at a time.
+
+    A finalized game looks like this:
+        <training_data_dir>/<name>/
+            meta.json           --  no. of samples, chunk files, shapes
+            frames_00000.npy    --  (N, 176, 200, 3) uint8 intel frames
+            labels_00000.npy    --  (N, 4) uint8 one-hot choices
+            ...
+"""
+import os
+import json
+import random
+import uuid
+import shutil
+import cv2 # pip install opencv-python
+import numpy as np
+from .intel import ENTITY_DTYPE, HUD_FIELDS, rasterize, rasterize_batch
+from .frame_archive import INDEX_START, INDEX_COUNT, encode_group, FrameArchive
+
+FORMAT_VERSION = 1
+
+
+class TrainingDataWriter():
+    """
+    Streams (choice, intel frame) samples into chunked .npy files
+    """
+    def __init__(self, out_dir, chunk_size=256, frame_shape=(176, 200, 3), num_choices=4, \
+                    io=None):
+        """Sets up a temporary directory for this game's chunks
+
+        Argument Keywords:
+            out_dir     {string}    --  directory the game is saved to
+            chunk_size  {int}       --  no. of samples per chunk file
+            frame_shape {tuple}     --  shape of an intel frame
+            num_choices {int}       --  no. of choices the bot picks from
+            io          {AsyncWriter}   --  runs our disk I/O in the
+                                            background. If None, it's done
+                                            right away
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            out_dir     {string}
+            chunk_size  {int}
+            frame_shape {tuple}
+            num_choices {int}
+            tmp_dir     {string}    --  where chunks go until the game's saved
+            chunks      {list}      --  (frames file, labels file, no. of
+                                        samples) of each chunk
+            num_samples {int}       --  no. of samples appended so far
+            io          {AsyncWriter}
+
+        Attributes Referenced:
+            N/A
+        """
+        self.out_dir = out_dir
+        self.chunk_size = chunk_size
+        self.frame_shape = tuple(frame_shape)
+        self.num_choices = num_choices
+        self.io = io
+        self.tmp_dir = os.path.join(out_dir, '.tmp-{}-{}'.format(os.getpid(), uuid.uuid4().hex))
+        self.run(os.makedirs, self.tmp_dir)
+        self._dir = self.tmp_dir # tmp_dir as seen by jobs that may still be running
+        self.chunks = []
+        self.num_samples = 0
+        self._frames = None # memory-mapped arrays of the current chunk
+        self._labels = None
+        self._idx = 0 # next free row in the current chunk
+
+    def run(self, fn, *args, nbytes=0):
+        """Run a disk I/O job in the background if we can, or right away"""
+        if self.io is None:
+            fn(*args)
+        else:
+            self.io.submit(fn, *args, nbytes=nbytes)
+
+    def open_store(self, names, size):
+        """Preallocate (size) frames and labels on disk"""
+        return (np.lib.format.open_memmap(os.path.join(self._dir, names[0]), mode='w+', \
+                                    dtype=np.uint8, shape=(size,) + self.frame_shape),
+                np.lib.format.open_memmap(os.path.join(self._dir, names[1]), mode='w+', \
+                                    dtype=np.uint8, shape=(size, self.num_choices)))
+
+    def close_store(self, store, names, num_used):
+        """Flush preallocated frames and labels to disk. If they aren't all in
+        use, then they're rewritten to just the ones that are. store is the
+        [frames, labels] list of memory maps, emptied so that no one's left
+        holding them (a file that's still mapped can't be replaced on
+        Windows)"""
+        frames, labels = store
+        store.clear()
+        frames.flush()
+        labels.flush()
+        if num_used < len(frames):
+            trimmed = (np.array(frames[:num_used]), np.array(labels[:num_used]))
+            del frames, labels # let go of the memory maps before replacing their files
+            for name, data in zip(names, trimmed):
+                path = os.path.join(self._dir, name)
+                with open(path + '.tmp', 'wb') as data_file:
+                    np.save(data_file, data)
+                os.replace(path + '.tmp', path)
+
+    def open_chunk(self):
+        """Preallocate the next chunk's frames and labels on disk"""
+        i = len(self.chunks)
+        names = ('frames_%05d.npy' % i, 'labels_%05d.npy' % i)
+        self._frames, self._labels = self.open_store(names, self.chunk_size)
+        self._idx = 0
+        self.chunks.append([names[0], names[1], 0])
+
+    def close_chunk(self):
+        """Flush the current chunk to disk"""
+        if self._frames is None:
+            return
+        store = [self._frames, self._labels]
+        self._frames = self._labels = None
+        self.close_store(store, self.chunks[-1][:2], self._idx)
+        self.chunks[-1][2] = self._idx
+
+    def append(self, choice, frame):
+        """Add one sample to the game's training data
+
+        Argument Keywords:
+            choice  {numpy.ndarray} --  one-hot choice the bot made
+            frame   {numpy.ndarray} --  intel frame it was made from
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_samples {int}
+
+        Attributes Referenced:
+            N/A
+        """
+        self.num_samples += 1
+        self.run(self.write_sample, choice, frame, nbytes=frame.nbytes + self.num_choices)
+
+    def write_sample(self, choice, frame):
+        """Write one sample into the current chunk, starting a new chunk if
+        it's full"""
+        if self._frames is None or self._idx == self.chunk_size:
+            self.close_chunk()
+            self.open_chunk()
+        self._frames[self._idx] = frame
+        self._labels[self._idx] = choice
+        self._idx += 1
+
+    def finalize(self, name):
+        """Flush everything, write meta.json and atomically move the game's
+        directory to out_dir/name
+
+        Argument Keywords:
+            name    {string}    --  name of the game's directory
+
+        Raises:
+            N/A
+
+        Returns:
+            {string} -- path the game is saved to (it may still be being
+                        written in the background)
+
+        Attributes Affected:
+            tmp_dir {string}    --  set to None, nothing else can be written
+
+        Attributes Referenced:
+            N/A
+        """
+        path = os.path.join(self.out_dir, name)
+        self.run(self.write_game, self.tmp_dir, path)
+        self.tmp_dir = None
+        return path
+
+    def write_game(self, tmp_dir, path):
+        """Flush the last chunk, write meta.json and move the game's
+        directory to its final path"""
+        self.close_chunk()
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as meta_file:
+            json.dump(self.get_meta(), meta_file, indent=2)
+        os.rename(tmp_dir, path)
+
+    def get_meta(self):
+        """Get the contents of the game's meta.json"""
+        return {
+            "version": FORMAT_VERSION,
+            "format": "frames",
+            "num_samples": self.num_samples,
+            "frame_shape": list(self.frame_shape),
+            "num_choices": self.num_choices,
+            "chunks": [{"frames": f, "labels": l, "num_samples": n} for f, l, n in self.chunks]
+        }
+
+    def discard(self):
+        """Throw away everything that was written for this game"""
+        if self.tmp_dir is not None:
+            self.run(self.delete_game, self.tmp_dir)
+            self.tmp_dir = None
+
+    def delete_game(self, tmp_dir):
+        """Drop the current chunk and delete the game's directory"""
+        self._frames = self._labels = None
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class ReservoirWriter(TrainingDataWriter):
+    """
+    Keeps a bounded, uniformly sampled reservoir of samples for each choice
+    and only writes those
+    """
+    def __init__(self, out_dir, class_caps, frame_shape=(176, 200, 3), io=None):
+        """Sets up an empty reservoir for each choice
+
+        Argument Keywords:
+            out_dir     {string}    --  directory the game is saved to
+            class_caps  {list}      --  max no. of samples kept per choice
+            frame_shape {tuple}     --  shape of an intel frame
+            io          {AsyncWriter}   --  runs our disk I/O in the
+                                            background. If None, it's done
+                                            right away
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            class_caps  {list}
+            num_offered {list}  --  no. of samples offered for each choice
+            num_filled  {list}  --  no. of reservoir slots in use per choice
+
+        Attributes Referenced:
+            N/A
+        """
+        TrainingDataWriter.__init__(self, out_dir, 0, frame_shape, len(class_caps), io)
+        self.class_caps = list(class_caps)
+        self.num_offered = [0]*len(class_caps)
+        self.num_filled = [0]*len(class_caps)
+        self._stores = [None]*len(class_caps) # (frames, labels) memory maps of each choice
+
+    def append(self, choice, frame):
+        """Offer one sample to its choice's reservoir (Algorithm R). Once a
+        reservoir's full, the sample replaces a random one with a probability
+        of cap/no. offered, so every sample is equally likely to be kept
+
+        Argument Keywords:
+            choice  {numpy.ndarray} --  one-hot choice the bot made
+            frame   {numpy.ndarray} --  intel frame it was made from
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_offered {list}
+            num_filled  {list}
+            num_samples {int}   --  no. of samples in the reservoirs
+
+        Attributes Referenced:
+            class_caps  {list}
+        """
+        k = int(np.argmax(choice))
+        self.num_offered[k] += 1
+        if self.num_filled[k] < self.class_caps[k]:
+            slot = self.num_filled[k]
+            self.num_filled[k] += 1
+            self.num_samples += 1
+        else:
+            slot = random.randrange(self.num_offered[k])
+            if slot >= self.class_caps[k]:
+                return # not picked
+        self.run(self.write_slot, k, slot, choice, frame, nbytes=frame.nbytes + self.num_choices)
+
+    @staticmethod
+    def get_names(k):
+        """Get the frames and labels file names of a choice's reservoir"""
+        return ('frames_c%d.npy' % k, 'labels_c%d.npy' % k)
+
+    def write_slot(self, k, slot, choice, frame):
+        """Write a sample into a slot of its choice's reservoir"""
+        if self._stores[k] is None:
+            self._stores[k] = self.open_store(self.get_names(k), self.class_caps[k])
+        self._stores[k][0][slot] = frame
+        self._stores[k][1][slot] = choice
+
+    def close_chunk(self):
+        """Flush each reservoir to disk, trimmed down to the slots in use"""
+        for k in range(len(self._stores)):
+            if self._stores[k] is None:
+                continue
+            store = list(self._stores[k])
+            self._stores[k] = None
+            self.close_store(store, self.get_names(k), self.num_filled[k])
+            self.chunks.append(list(self.get_names(k)) + [self.num_filled[k]])
+
+    def delete_game(self, tmp_dir):
+        """Drop the reservoirs and delete the game's directory"""
+        self._stores = [None]*len(self._stores)
+        TrainingDataWriter.delete_game(self, tmp_dir)
+
+
+class EntityDataWriter(TrainingDataWriter):
+    """
+    Streams (choice, entity table, HUD scalars) samples into chunked .npy
+    files instead of full intel images
+    """
+    def __init__(self, out_dir, map_size, palette, chunk_size=4096, num_choices=4, io=None):
+        """Sets up a temporary directory for this game's chunks
+
+        Argument Keywords:
+            out_dir     {string}    --  directory the game is saved to
+            map_size    {tuple}     --  map's (width, height)
+            palette     {list}      --  role -> BGR color used to rasterize
+            chunk_size  {int}       --  no. of samples per chunk file
+            num_choices {int}       --  no. of choices the bot picks from
+            io          {AsyncWriter}   --  runs our disk I/O in the
+                                            background. If None, it's done
+                                            right away
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            map_size    {tuple}
+            palette     {list}
+
+        Attributes Referenced:
+            N/A
+        """
+        TrainingDataWriter.__init__(self, out_dir, chunk_size, (map_size[1], map_size[0], 3), \
+                                    num_choices, io)
+        self.map_size = (int(map_size[0]), int(map_size[1]))
+        self.palette = [[int(c) for c in color] for color in palette]
+        self._buffer = [] # samples of the current chunk, they're only a few hundred bytes each
+
+    def append(self, choice, sample):
+        """Add one sample to the game's training data
+
+        Argument Keywords:
+            choice  {numpy.ndarray} --  one-hot choice the bot made
+            sample  {tuple}         --  (entity table, HUD scalars) that its
+                                        intel image was rasterized from
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_samples {int}
+
+        Attributes Referenced:
+            chunk_size  {int}
+        """
+        entities, hud = sample
+        self._buffer.append((np.asarray(choice, dtype=np.uint8), entities, hud))
+        self.num_samples += 1
+        if len(self._buffer) == self.chunk_size:
+            self.flush_buffer()
+
+    def flush_buffer(self):
+        """Hand the current chunk's samples over to be written"""
+        if not self._buffer:
+            return
+        samples, self._buffer = self._buffer, []
+        self.run(self.write_chunk, samples, \
+                    nbytes=sum(e.nbytes + h.nbytes + c.nbytes for c, e, h in samples))
+
+    def write_chunk(self, samples):
+        """Write a chunk's labels, entity tables (back to back, along with
+        where each one starts) and HUD scalars"""
+        i = len(self.chunks)
+        names = ('labels_%05d.npy' % i, 'entities_%05d.npy' % i, 'offsets_%05d.npy' % i, \
+                    'hud_%05d.npy' % i)
+        offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for _, e, _ in samples])
+        np.save(os.path.join(self._dir, names[0]), np.stack([c for c, _, _ in samples]))
+        np.save(os.path.join(self._dir, names[1]), np.concatenate([e for _, e, _ in samples]))
+        np.save(os.path.join(self._dir, names[2]), offsets)
+        np.save(os.path.join(self._dir, names[3]), np.stack([h for _, _, h in samples]))
+        self.chunks.append(list(names) + [len(samples)])
+
+    def finalize(self, name):
+        """Write the last chunk, then save the game like TrainingDataWriter"""
+        self.flush_buffer()
+        return TrainingDataWriter.finalize(self, name)
+
+    def discard(self):
+        """Throw away everything that was written for this game"""
+        self._buffer = []
+        TrainingDataWriter.discard(self)
+
+    def close_chunk(self):
+        """Chunks are written whole, there's nothing left open"""
+        return
+
+    def get_meta(self):
+        """Get the contents of the game's meta.json, which also has what's
+        needed to rasterize the intel images"""
+        return {
+            "version": FORMAT_VERSION,
+            "format": "entities",
+            "num_samples": self.num_samples,
+            "frame_shape": list(self.frame_shape),
+            "num_choices": self.num_choices,
+            "map_size": list(self.map_size),
+            "palette": self.palette,
+            "entity_fields": list(ENTITY_DTYPE.names),
+            "hud_fields": HUD_FIELDS,
+            "chunks": [{"labels": l, "entities": e, "offsets": o, "hud": h, "num_samples": n} \
+                        for l, e, o, h, n in self.chunks]
+        }
+
+
+class ArchiveDataWriter(TrainingDataWriter):
+    """
+    Streams (choice, intel frame) samples into a compressed frame archive
+    """
+    def __init__(self, out_dir, keyframe_interval=16, frame_shape=(176, 200, 3), num_choices=4, \
+                    io=None, level=1):
+        """Sets up a temporary directory for this game's archive
+
+        Argument Keywords:
+            out_dir             {string}    --  directory the game is saved to
+            keyframe_interval   {int}       --  no. of frames per compressed
+                                                group (one keyframe each)
+            frame_shape         {tuple}     --  shape of an intel frame
+            num_choices         {int}       --  no. of choices the bot picks
+                                                from
+            io                  {AsyncWriter}   --  runs our disk I/O (and
+                                                    compression) in the
+                                                    background. If None, it's
+                                                    done right away
+            level               {int}       --  zlib compression level
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            level       {int}
+            raw_bytes   {int}   --  size of the frames before compression
+            stored_bytes{int}   --  size of the compressed groups
+
+        Attributes Referenced:
+            N/A
+        """
+        TrainingDataWriter.__init__(self, out_dir, keyframe_interval, frame_shape, num_choices, io)
+        self.level = level
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self._buffer = [] # (choice, frame) of the current group
+
+    def append(self, choice, frame):
+        """Add one sample to the game's training data
+
+        Argument Keywords:
+            choice  {numpy.ndarray} --  one-hot choice the bot made
+            frame   {numpy.ndarray} --  intel frame it was made from
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_samples {int}
+
+        Attributes Referenced:
+            chunk_size  {int}
+        """
+        self._buffer.append((np.asarray(choice, dtype=np.uint8), frame))
+        self.num_samples += 1
+        if len(self._buffer) == self.chunk_size:
+            self.flush_buffer()
+
+    def flush_buffer(self):
+        """Hand the current group over to be compressed and written"""
+        if not self._buffer:
+            return
+        samples, self._buffer = self._buffer, []
+        frames = np.stack([frame for _, frame in samples])
+        self.run(self.write_group, frames, np.stack([choice for choice, _ in samples]), \
+                    nbytes=frames.nbytes)
+
+    def write_group(self, frames, labels):
+        """Compress a group and append it to the archive"""
+        # meta.json tells readers how to reshape the frames, so they had better match it
+        assert frames.shape[1:] == self.frame_shape, \
+            'frames are {}, the archive expects {}'.format(frames.shape[1:], self.frame_shape)
+        blob = encode_group(frames, labels, self.level)
+        start = self.chunks[-1][INDEX_START] + self.chunks[-1][INDEX_COUNT] if self.chunks else 0
+        with open(os.path.join(self._dir, 'frames.bin'), 'ab') as data_file:
+            offset = data_file.tell()
+            data_file.write(blob)
+        self.chunks.append([offset, len(blob), start, len(frames)])
+        self.raw_bytes += frames.nbytes
+        self.stored_bytes += len(blob)
+
+    def finalize(self, name):
+        """Write the last group, then save the game like TrainingDataWriter"""
+        self.flush_buffer()
+        return TrainingDataWriter.finalize(self, name)
+
+    def discard(self):
+        """Throw away everything that was written for this game"""
+        self._buffer = []
+        TrainingDataWriter.discard(self)
+
+    def close_chunk(self):
+        """Write the archive's index (there's no data file if nothing was
+        saved, so an empty one's made)"""
+        open(os.path.join(self._dir, 'frames.bin'), 'ab').close()
+        np.save(os.path.join(self._dir, 'index.npy'), \
+                np.array(self.chunks, dtype=np.int64).reshape(-1, 4))
+
+    def get_meta(self):
+        """Get the contents of the game's meta.json"""
+        return {
+            "version": FORMAT_VERSION,
+            "format": "archive",
+            "num_samples": self.num_samples,
+            "frame_shape": list(self.frame_shape),
+            "num_choices": self.num_choices,
+            "keyframe_interval": self.chunk_size,
+            "codec": "zlib",
+            "level": self.level,
+            "data": "frames.bin",
+            "index": "index.npy"
+        }
+
+
+class SampleFilter():
+    """
+    Decides which samples are worth keeping while we collect training data
+    """
+    def __init__(self, min_diff=2.0, stride_growth=4, max_stride=16, grid_size=(50, 44)):
+        """Sets up the filter
+
+        Argument Keywords:
+            min_diff        {float} --  frames whose mean absolute difference
+                                        (0-255) from the last kept frame is
+                                        below this are skipped
+            stride_growth   {int}   --  the stride grows by 1 after this many
+                                        samples are kept with the same label
+            max_stride      {int}   --  max no. of frames b/w kept samples
+                                        while the label doesn't change
+            grid_size       {tuple} --  (width, height) frames are downsampled
+                                        to before they're compared
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_seen        {int}   --  no. of samples offered
+            num_kept        {int}   --  no. of samples kept
+            num_transitions {int}   --  no. of samples kept because the
+                                        label changed
+
+        Attributes Referenced:
+            N/A
+        """
+        self.min_diff = min_diff
+        self.stride_growth = stride_growth
+        self.max_stride = max_stride
+        self.grid_size = tuple(grid_size)
+        self.num_seen = 0
+        self.num_kept = 0
+        self.num_transitions = 0
+        self._label = None # label of the last kept sample
+        self._small = None # downsampled frame of the last kept sample
+        self._kept_in_run = 0 # no. of samples kept since the label last changed
+        self._since_kept = 0 # no. of samples offered since we last kept one
+
+    def get_stride(self):
+        """Get the no. of frames to wait b/w kept samples. It grows the longer
+        the decision stays the same"""
+        return min(1 + self._kept_in_run // self.stride_growth, self.max_stride)
+
+    def keep(self, choice, frame):
+        """Check if a sample should be kept. Label transitions are always
+        kept, otherwise a frame has to be far enough (in frames and in looks)
+        from the last kept one
+
+        Argument Keywords:
+            choice  {numpy.ndarray} --  one-hot choice the bot made
+            frame   {numpy.ndarray} --  intel frame it was made from
+
+        Raises:
+            N/A
+
+        Returns:
+            {bool} -- True if the sample should be written
+
+        Attributes Affected:
+            num_seen        {int}
+            num_kept        {int}
+            num_transitions {int}
+
+        Attributes Referenced:
+            min_diff    {float}
+        """
+        self.num_seen += 1
+        self._since_kept += 1
+        label = int(np.argmax(choice))
+        if label == self._label:
+            if self._since_kept < self.get_stride():
+                return False
+            small = cv2.resize(frame, self.grid_size, interpolation=cv2.INTER_AREA)
+            if np.mean(np.abs(small.astype(np.int16) - self._small)) < self.min_diff:
+                return False
+            self._kept_in_run += 1
+        else:
+            small = cv2.resize(frame, self.grid_size, interpolation=cv2.INTER_AREA)
+            self._kept_in_run = 0
+            self.num_transitions += 1
+        self._label = label
+        self._small = small.astype(np.int16)
+        self._since_kept = 0
+        self.num_kept += 1
+        return True
+
+
+def is_game_data(path):
+    """Check if a path holds a saved game (either format)"""
+    if os.path.isdir(path):
+        return os.path.isfile(os.path.join(path, 'meta.json'))
+    return path.endswith('.npy')
+
+
+def load_game_data(path):
+    """Loads a saved game's training data as a list of [choice, intel frame].
+    Both the chunked directories written by TrainingDataWriter and the older
+    pickled .npy files are handled
+
+    Argument Keywords:
+        path    {string}    --  saved game's directory or .npy file
+
+    Raises:
+        N/A
+
+    Returns:
+        {list} -- [choice, intel frame] of every sample in the game. Games
+                  saved as entity tables are rasterized, archived ones are
+                  decompressed
+    """
+    if not os.path.isdir(path):
+        return list(np.load(path, allow_pickle=True))
+    data = []
+    for frames, labels in iter_game_chunks(path):
+        data.extend([label, np.array(frame)] for label, frame in zip(labels, frames))
+    return data
+
+
+def iter_game_chunks(path):
+    """Loads a saved game's training data a chunk at a time, as arrays
+    rather than a list of samples
+
+    Argument Keywords:
+        path    {string}    --  saved game's directory or .npy file
+
+    Raises:
+        N/A
+
+    Returns:
+        {generator} -- (N, 176, 200, 3) uint8 frames, (N, 4) labels of each
+                       chunk (memory-mapped if the chunk's saved as is)
+    """
+    if not os.path.isdir(path):
+        data = np.load(path, allow_pickle=True)
+        if len(data):
+            yield np.stack([d[1] for d in data]), np.stack([d[0] for d in data])
+        return
+
+    with open(os.path.join(path, 'meta.json')) as meta_file:
+        meta = json.load(meta_file)
+    if meta.get("format") == "archive":
+        yield from FrameArchive(path).iter_groups()
+    elif meta.get("format") == "entities":
+        for chunk in load_entity_chunks(path, meta):
+            yield rasterize_batch(chunk["entities"], chunk["offsets"], chunk["hud"], \
+                                    meta["map_size"], meta["palette"]), chunk["labels"]
+    else:
+        for chunk in meta["chunks"]:
+            frames = np.load(os.path.join(path, chunk["frames"]), mmap_mode='r')
+            labels = np.load(os.path.join(path, chunk["labels"]))
+            yield frames[:chunk["num_samples"]], labels[:chunk["num_samples"]]
+
+
+def load_game_labels(path):
+    """Loads just the labels of a saved game, without reading its frames
+    (except for the older pickled .npy files, which have to be read whole)
+
+    Argument Keywords:
+        path    {string}    --  saved game's directory or .npy file
+
+    Raises:
+        N/A
+
+    Returns:
+        {numpy.ndarray} -- (N, 4) labels of every sample in the game
+    """
+    if not os.path.isdir(path):
+        data = np.load(path, allow_pickle=True)
+        return np.stack([d[0] for d in data]) if len(data) else np.zeros((0, 4), np.uint8)
+
+    with open(os.path.join(path, 'meta.json')) as meta_file:
+        meta = json.load(meta_file)
+    if meta.get("format") == "archive":
+        return FrameArchive(path).get_labels()
+    labels = [np.load(os.path.join(path, chunk["labels"]))[:chunk["num_samples"]] \
+                for chunk in meta["chunks"]]
+    return np.concatenate(labels) if labels else np.zeros((0, meta["num_choices"]), np.uint8)
+
+
+def load_game_samples(path, indices):
+    """Loads only some of a saved game's samples, gathering their frames
+    straight into one array (only the chunks that hold them are read)
+
+    Argument Keywords:
+        path    {string}        --  saved game's directory or .npy file
+        indices {numpy.ndarray} --  sorted indices of the samples to load
+
+    Raises:
+        N/A
+
+    Returns:
+        {tuple} -- (len(indices), 176, 200, 3) uint8 frames, (len(indices),
+                   4) labels
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if not os.path.isdir(path):
+        data = np.load(path, allow_pickle=True)
+        return np.stack([data[i][1] for i in indices]).astype(np.uint8, copy=False), \
+                np.stack([data[i][0] for i in indices])
+
+    with open(os.path.join(path, 'meta.json')) as meta_file:
+        meta = json.load(meta_file)
+    if meta.get("format") == "archive":
+        return FrameArchive(path).get_batch(indices)
+
+    frames = np.empty((len(indices),) + tuple(meta["frame_shape"]), np.uint8)
+    labels = np.empty((len(indices), meta["num_choices"]), np.uint8)
+    start = 0
+    for chunk in meta["chunks"]:
+        end = start + chunk["num_samples"]
+        rows = slice(np.searchsorted(indices, start), np.searchsorted(indices, end))
+        within = indices[rows] - start
+        start = end
+        if not len(within):
+            continue
+        labels[rows] = np.load(os.path.join(path, chunk["labels"]))[within]
+        if meta.get("format") == "entities":
+            entities = np.load(os.path.join(path, chunk["entities"]))
+            offsets = np.load(os.path.join(path, chunk["offsets"]))
+            huds = np.load(os.path.join(path, chunk["hud"]))
+            for i, j in zip(range(rows.start, rows.stop), within):
+                rasterize(entities[offsets[j]:offsets[j + 1]], huds[j], meta["map_size"], \
+                            meta["palette"], frames[i])
+        else:
+            np.take(np.load(os.path.join(path, chunk["frames"]), mmap_mode='r'), within, axis=0, \
+                    out=frames[rows])
+    return frames, labels
+
+
+def load_entity_chunks(path, meta=None):
+    """Loads the raw chunks of a game saved as entity tables
+
+    Argument Keywords:
+        path    {string}    --  saved game's directory
+        meta    {dict}      --  its meta.json, if it's already been read
+
+    Raises:
+        N/A
+
+    Returns:
+        {list} -- {"labels", "entities", "offsets", "hud"} arrays of each chunk
+    """
+    if meta is None:
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            meta = json.load(meta_file)
+    return [{key: np.load(os.path.join(path, chunk[key])) \
+                for key in ("labels", "entities", "offsets", "hud")} for chunk in meta["chunks"]]
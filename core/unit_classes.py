@@ -0,0 +1,80 @@
+"""
+    This module contains a classification table for every race's units and
+    structures, keyed by UnitTypeId.
+
+    Looking up a unit's type_id in this table replaces comparing lowercase
+    unit names against lists of strings, and it also covers morphed variants
+    (ex: Lair/Hive, OrbitalCommand, burrowed or sieged units).
+"""
+import enum
+from sc2.ids.unit_typeid import UnitTypeId as U
+
+
+class UNIT_CLASS(enum.IntFlag):
+    NONE            = 0
+    TOWNHALL        = 1
+    WORKER          = 2
+    COMBAT          = 4
+    STATIC_DEFENSE  = 8
+    DETECTOR        = 16
+
+
+_TOWNHALL = [
+    U.NEXUS,
+    U.COMMANDCENTER, U.COMMANDCENTERFLYING, U.ORBITALCOMMAND, U.ORBITALCOMMANDFLYING,
+    U.PLANETARYFORTRESS,
+    U.HATCHERY, U.LAIR, U.HIVE]
+
+_WORKER = [U.PROBE, U.SCV, U.MULE, U.DRONE, U.DRONEBURROWED]
+
+_STATIC_DEFENSE = [
+    U.PHOTONCANNON, U.SHIELDBATTERY,
+    U.BUNKER, U.MISSILETURRET, U.PLANETARYFORTRESS,
+    U.SPINECRAWLER, U.SPINECRAWLERUPROOTED, U.SPORECRAWLER, U.SPORECRAWLERUPROOTED]
+
+_DETECTOR = [
+    U.PHOTONCANNON, U.OBSERVER, U.OBSERVERSIEGEMODE,
+    U.MISSILETURRET, U.RAVEN,
+    U.SPORECRAWLER, U.SPORECRAWLERUPROOTED, U.OVERSEER, U.OVERSEERSIEGEMODE]
+
+_COMBAT = [
+    # Protoss
+    U.ZEALOT, U.STALKER, U.SENTRY, U.ADEPT, U.HIGHTEMPLAR, U.DARKTEMPLAR, U.ARCHON,
+    U.IMMORTAL, U.COLOSSUS, U.DISRUPTOR, U.PHOENIX, U.VOIDRAY, U.ORACLE, U.TEMPEST,
+    U.CARRIER, U.MOTHERSHIP,
+    # Terran
+    U.MARINE, U.MARAUDER, U.REAPER, U.GHOST, U.HELLION, U.HELLIONTANK, U.SIEGETANK,
+    U.SIEGETANKSIEGED, U.CYCLONE, U.WIDOWMINE, U.WIDOWMINEBURROWED, U.THOR, U.THORAP,
+    U.VIKINGFIGHTER, U.VIKINGASSAULT, U.BANSHEE, U.LIBERATOR, U.LIBERATORAG, U.RAVEN,
+    U.BATTLECRUISER,
+    # Zerg
+    U.ZERGLING, U.ZERGLINGBURROWED, U.BANELING, U.BANELINGBURROWED, U.ROACH,
+    U.ROACHBURROWED, U.RAVAGER, U.HYDRALISK, U.HYDRALISKBURROWED, U.LURKERMP,
+    U.LURKERMPBURROWED, U.INFESTOR, U.INFESTORBURROWED, U.SWARMHOSTMP, U.ULTRALISK,
+    U.MUTALISK, U.CORRUPTOR, U.BROODLORD, U.VIPER, U.QUEEN, U.QUEENBURROWED,
+    U.BROODLING, U.LOCUSTMP]
+
+#------------------------------------------------------------------------------
+# UnitTypeId -> UNIT_CLASS flags. A unit can be in more than one class (ex: a
+# PhotonCannon is both static defense and a detector)
+#------------------------------------------------------------------------------
+UNIT_CLASSES = {}
+for _cls, _type_ids in [(UNIT_CLASS.TOWNHALL, _TOWNHALL),
+                        (UNIT_CLASS.WORKER, _WORKER),
+                        (UNIT_CLASS.COMBAT, _COMBAT),
+                        (UNIT_CLASS.STATIC_DEFENSE, _STATIC_DEFENSE),
+                        (UNIT_CLASS.DETECTOR, _DETECTOR)]:
+    for _type_id in _type_ids:
+        UNIT_CLASSES[_type_id] = UNIT_CLASSES.get(_type_id, UNIT_CLASS.NONE) | _cls
+
+#------------------------------------------------------------------------------
+# UNIT_CLASS -> set of UnitTypeIds, handy for sc2.units.Units.of_type()
+#------------------------------------------------------------------------------
+UNIT_TYPES_OF = {
+    cls: {type_id for type_id, flags in UNIT_CLASSES.items() if flags & cls}
+    for cls in UNIT_CLASS if cls}
+
+
+def is_class(type_id, cls):
+    """Check if a UnitTypeId belongs to a UNIT_CLASS"""
+    return bool(UNIT_CLASSES.get(type_id, UNIT_CLASS.NONE) & cls)
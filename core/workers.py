@@ -0,0 +1,327 @@
+"""
+    This module contains a worker-saturation manager that takes the place of
+    python-sc2's BotAI.distribute_workers().
+
+    distribute_workers() recomputes the surplus and deficit of every townhall,
+    mineral field and vespene geyser building and scans every worker at every
+    step. Here, we keep assignment tables for each mineral field and vespene
+    geyser building and only update them when something happens (a worker is
+    created or killed, a base or geyser building is finished, a mineral field
+    runs out, a worker goes idle, or a worker is taken out of the pool).
+    Commands are only sent to workers whose assignment has changed.
+
+    python-sc2 has no event for a unit going idle, so idle workers are only
+    looked for when the game's count of them changes, and every so often in
+    case one went idle just as another got back to work.
+"""
+
+
+class WorkerManager():
+    """
+    Keeps track of which worker is gathering from which resource
+    """
+    def __init__(self, max_per_mineral=2, max_per_geyser=3, max_oversaturation=1,
+                 base_radius=10, idle_check_interval=16):
+        """Sets up empty assignment tables
+
+        Argument Keywords:
+            max_per_mineral     {int}   --  ideal no. of workers per mineral
+                                            field
+            max_per_geyser      {int}   --  ideal no. of workers per vespene
+                                            geyser building
+            max_oversaturation  {int}   --  extra workers per mineral field we
+                                            allow once every resource is
+                                            saturated
+            base_radius         {float} --  max distance b/w a townhall and
+                                            its mineral fields
+            idle_check_interval {int}   --  max no. of steps b/w looks for
+                                            idle workers
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            assigned        {dict}  --  worker tag -> resource tag
+            workers_on      {dict}  --  resource tag -> set of worker tags
+            capacity        {dict}  --  resource tag -> ideal no. of workers
+            mineral_tags    {set}   --  tags of the mineral fields we track
+            base_of         {dict}  --  resource tag -> townhall tag
+            base_pos        {dict}  --  townhall tag -> Point2
+            excluded        {set}   --  worker tags taken out of the pool
+            unassigned      {set}   --  worker tags waiting for a resource
+            dirty           {set}   --  worker tags that need a new command
+            num_minerals    {int}   --  no. of mineral fields we last saw
+            num_idle        {int}   --  no. of idle workers we last saw
+            steps_since_idle_check  {int}   --  no. of steps since we last
+                                                looked for idle workers
+
+        Attributes Referenced:
+            N/A
+        """
+        self.max_per_mineral = max_per_mineral
+        self.max_per_geyser = max_per_geyser
+        self.max_oversaturation = max_oversaturation
+        self.base_radius = base_radius
+        self.idle_check_interval = idle_check_interval
+        self.assigned = {}
+        self.workers_on = {}
+        self.capacity = {}
+        self.mineral_tags = set()
+        self.base_of = {}
+        self.base_pos = {}
+        self.excluded = set()
+        self.unassigned = set()
+        self.dirty = set()
+        self.num_minerals = -1
+        self.num_idle = -1
+        self.steps_since_idle_check = 0
+
+    def add_resource(self, resource_tag, townhall_tag, capacity):
+        """Start tracking a mineral field or vespene geyser building"""
+        if resource_tag in self.capacity:
+            return
+        self.capacity[resource_tag] = capacity
+        self.workers_on[resource_tag] = set()
+        self.base_of[resource_tag] = townhall_tag
+
+    def remove_resource(self, resource_tag):
+        """Stop tracking a resource. Its workers are put back in the pool"""
+        if resource_tag not in self.capacity:
+            return
+        for tag in self.workers_on.pop(resource_tag):
+            self.assigned.pop(tag, None)
+            self.unassigned.add(tag)
+        self.capacity.pop(resource_tag)
+        self.mineral_tags.discard(resource_tag)
+        self.base_of.pop(resource_tag)
+
+    def add_base(self, townhall, mineral_fields):
+        """A townhall has finished building. Its mineral fields are tracked
+        and workers over-saturating other bases are moved into the pool
+
+        Argument Keywords:
+            townhall        {sc2.unit.Unit}     --  the townhall
+            mineral_fields  {sc2.units.Units}   --  every mineral field on the
+                                                    map
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            base_pos        {dict}
+            capacity        {dict}
+            mineral_tags    {set}
+            workers_on      {dict}
+            base_of         {dict}
+            assigned        {dict}
+            unassigned      {set}
+
+        Attributes Referenced:
+            base_radius     {float}
+            max_per_mineral {int}
+        """
+        self.base_pos[townhall.tag] = townhall.position
+        for mineral in mineral_fields.closer_than(self.base_radius, townhall):
+            self.add_resource(mineral.tag, townhall.tag, self.max_per_mineral)
+            self.mineral_tags.add(mineral.tag)
+        self.num_minerals = -1 # re-check which mineral fields are still around
+
+        for resource_tag, tags in self.workers_on.items():
+            while len(tags) > self.capacity[resource_tag]:
+                tag = tags.pop()
+                self.assigned.pop(tag)
+                self.unassigned.add(tag)
+
+    def remove_base(self, townhall_tag):
+        """A townhall has been destroyed, stop gathering from its resources"""
+        if self.base_pos.pop(townhall_tag, None) is None:
+            return
+        for resource_tag in [r for r, t in self.base_of.items() if t == townhall_tag]:
+            self.remove_resource(resource_tag)
+
+    def add_geyser(self, vgs_bldg):
+        """A vespene geyser building has finished building. Workers are
+        pulled off of the nearest base's mineral fields to fill it
+
+        Argument Keywords:
+            vgs_bldg    {sc2.unit.Unit} --  the vespene geyser building
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            capacity    {dict}
+            workers_on  {dict}
+            base_of     {dict}
+            assigned    {dict}
+            dirty       {set}
+
+        Attributes Referenced:
+            base_pos        {dict}
+            max_per_geyser  {int}
+        """
+        if not self.base_pos:
+            return
+        townhall_tag = min(self.base_pos, key=lambda t: vgs_bldg.distance_to(self.base_pos[t]))
+        self.add_resource(vgs_bldg.tag, townhall_tag, self.max_per_geyser)
+
+        minerals = [r for r, t in self.base_of.items()
+                    if t == townhall_tag and r in self.mineral_tags and self.workers_on[r]]
+        while len(self.workers_on[vgs_bldg.tag]) < self.max_per_geyser and minerals:
+            # take from whichever mineral field has the most workers
+            resource_tag = max(minerals, key=lambda r: len(self.workers_on[r]))
+            tag = self.workers_on[resource_tag].pop()
+            if not self.workers_on[resource_tag]:
+                minerals.remove(resource_tag)
+            self.assign(tag, vgs_bldg.tag)
+
+    def add_worker(self, tag):
+        """A worker's been created and should start gathering"""
+        if tag not in self.assigned and tag not in self.excluded:
+            self.unassigned.add(tag)
+
+    def remove_worker(self, tag):
+        """A worker's been killed (or taken out of the pool for good)"""
+        self.unassigned.discard(tag)
+        self.dirty.discard(tag)
+        resource_tag = self.assigned.pop(tag, None)
+        if resource_tag is not None:
+            self.workers_on[resource_tag].discard(tag)
+
+    def release(self, tag):
+        """Take a worker out of the pool (ex: it's our scout or a builder).
+        We won't command it until it's restored"""
+        self.remove_worker(tag)
+        self.excluded.add(tag)
+
+    def restore(self, tag):
+        """Put a worker that was taken out of the pool back into it. It's left
+        alone until it goes idle (ex: once it's done building something)"""
+        self.excluded.discard(tag)
+
+    def assign(self, tag, resource_tag):
+        """Assign a worker to a resource and mark it as needing a command"""
+        self.remove_worker(tag)
+        self.assigned[tag] = resource_tag
+        self.workers_on[resource_tag].add(tag)
+        self.dirty.add(tag)
+
+    def on_destroyed(self, tag):
+        """A unit has been destroyed, it may have been a worker, a townhall or
+        a vespene geyser building"""
+        self.remove_worker(tag)
+        self.excluded.discard(tag)
+        self.remove_base(tag)
+        self.remove_resource(tag)
+
+    def get_free_resource(self, pos):
+        """Get the closest resource that still needs workers. Once every
+        resource is saturated, mineral fields are over-saturated.
+
+        Argument Keywords:
+            pos {sc2.position.Point2} -- position of the worker
+
+        Raises:
+            N/A
+
+        Returns:
+            {int} -- tag of the resource, or None if there's no room anywhere
+
+        Attributes Affected:
+            N/A
+
+        Attributes Referenced:
+            capacity            {dict}
+            mineral_tags        {set}
+            workers_on          {dict}
+            base_of             {dict}
+            base_pos            {dict}
+            max_oversaturation  {int}
+        """
+        for extra in [0, self.max_oversaturation]:
+            free = [r for r, cap in self.capacity.items()
+                    if len(self.workers_on[r]) < cap + (extra if r in self.mineral_tags else 0)]
+            if free:
+                return min(free, key=lambda r: (
+                    pos.distance_to(self.base_pos[self.base_of[r]]), len(self.workers_on[r])))
+        return None
+
+    def step(self, bot):
+        """Updates the assignment tables and sends gather commands to workers
+        whose assignment has changed. Should be called once per step.
+
+        Argument Keywords:
+            bot {sc2.BotAI} -- bot whose workers we're managing
+
+        Raises:
+            N/A
+
+        Returns:
+            N/A
+
+        Attributes Affected:
+            num_minerals    {int}
+            num_idle        {int}
+            steps_since_idle_check  {int}
+            unassigned      {set}
+            dirty           {set}
+
+        Attributes Referenced:
+            mineral_tags    {set}
+            assigned        {dict}
+            excluded        {set}
+            idle_check_interval {int}
+        """
+        #----------------------------------------------------------------------
+        # mineral fields that run out disappear from the map
+        #----------------------------------------------------------------------
+        if bot.mineral_field.amount != self.num_minerals:
+            alive = bot.mineral_field.tags
+            for resource_tag in [r for r in self.mineral_tags if r not in alive]:
+                self.remove_resource(resource_tag)
+            self.num_minerals = bot.mineral_field.amount
+
+        #----------------------------------------------------------------------
+        # idle workers (ex: just done building something) go back to work
+        #----------------------------------------------------------------------
+        self.steps_since_idle_check += 1
+        if bot.idle_worker_count != self.num_idle or \
+                self.steps_since_idle_check >= self.idle_check_interval:
+            for worker in bot.workers.idle:
+                if worker.tag in self.assigned:
+                    self.dirty.add(worker.tag)
+                elif worker.tag not in self.excluded:
+                    self.unassigned.add(worker.tag)
+            self.num_idle = bot.idle_worker_count
+            self.steps_since_idle_check = 0
+
+        if not self.unassigned and not self.dirty:
+            return
+
+        workers = {worker.tag: worker for worker in bot.workers}
+        for tag in list(self.unassigned):
+            if tag not in workers:
+                self.unassigned.discard(tag)
+                continue
+            resource_tag = self.get_free_resource(workers[tag].position)
+            if resource_tag is None:
+                break
+            self.assign(tag, resource_tag)
+
+        resources = {r.tag: r for r in bot.mineral_field}
+        resources.update({r.tag: r for r in bot.gas_buildings})
+        for tag in self.dirty:
+            worker = workers.get(tag)
+            resource = resources.get(self.assigned.get(tag))
+            if worker and resource:
+                worker.gather(resource)
+        self.dirty.clear()
@@ -0,0 +1,7 @@
+"""
+    Lets the tests import the project's modules (core, utils) from the repo
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,51 @@
+"""
+    Stand-ins for python-sc2's units and bots, with just enough of their
+    interface for the core modules' tests (they don't need a running game)
+"""
+from sc2.position import Point2
+
+
+class FakeUnit():
+    """
+    A unit at a fixed position that records the commands it's given
+    """
+    def __init__(self, tag, pos, type_id=None, radius=0.5, **attrs):
+        self.tag = tag
+        self.position = Point2(pos)
+        self.type_id = type_id
+        self.radius = radius
+        self.is_idle = False
+        self.commands = []
+        self.__dict__.update(attrs)
+
+    def distance_to(self, target):
+        return self.position.distance_to(getattr(target, 'position', target))
+
+    def gather(self, target):
+        self.commands.append(('gather', target.tag))
+
+    def move(self, target):
+        self.commands.append(('move', target))
+
+
+class FakeUnits(list):
+    """
+    A list of units with the few Units filters the tests need
+    """
+    @property
+    def amount(self):
+        return len(self)
+
+    @property
+    def tags(self):
+        return {unit.tag for unit in self}
+
+    @property
+    def idle(self):
+        return FakeUnits(unit for unit in self if unit.is_idle)
+
+    def closer_than(self, distance, target):
+        return FakeUnits(unit for unit in self if unit.distance_to(target) < distance)
+
+    def find_by_tag(self, tag):
+        return next((unit for unit in self if unit.tag == tag), None)
@@ -0,0 +1,94 @@
+"""
+    Tests for core/frame_archive.py's encoding and the archive it's read from
+"""
+import numpy as np
+import pytest
+
+from core.frame_archive import FrameArchive, decode_group, encode_group, is_archive
+from core.training_data import ArchiveDataWriter, load_game_data, load_game_labels, \
+                                load_game_samples
+
+FRAME_SHAPE = (12, 16, 3)
+
+
+def make_game(num_samples, seed=0):
+    """Frames that change a few pixels at a time, like intel frames do, and
+    random one-hot labels"""
+    rng = np.random.default_rng(seed)
+    frames = np.empty((num_samples,) + FRAME_SHAPE, np.uint8)
+    frame = rng.integers(0, 256, FRAME_SHAPE, dtype=np.uint8)
+    for i in range(num_samples):
+        frame[rng.integers(0, FRAME_SHAPE[0], 5), rng.integers(0, FRAME_SHAPE[1], 5)] = \
+            rng.integers(0, 256, (5, 3), dtype=np.uint8)
+        frames[i] = frame
+    labels = np.eye(4, dtype=np.uint8)[rng.integers(0, 4, num_samples)]
+    return frames, labels
+
+
+def write_archive(out_dir, frames, labels, keyframe_interval=4):
+    writer = ArchiveDataWriter(out_dir, keyframe_interval, FRAME_SHAPE, 4)
+    for label, frame in zip(labels, frames):
+        writer.append(label, frame)
+    return writer, writer.finalize('game')
+
+
+def test_group_round_trip():
+    frames, labels = make_game(7)
+    blob = encode_group(frames, labels)
+    decoded_frames, decoded_labels = decode_group(blob, 7, FRAME_SHAPE, 4)
+    assert np.array_equal(decoded_frames, frames)
+    assert np.array_equal(decoded_labels, labels)
+
+    # only the first few frames, but every label
+    decoded_frames, decoded_labels = decode_group(blob, 7, FRAME_SHAPE, 4, num_frames=3)
+    assert np.array_equal(decoded_frames, frames[:3])
+    assert np.array_equal(decoded_labels, labels)
+
+
+def test_deltas_compress():
+    frames, labels = make_game(16)
+    assert len(encode_group(frames, labels)) < frames.nbytes/4
+
+
+def test_archive_round_trip(tmp_path):
+    frames, labels = make_game(10)
+    writer, path = write_archive(str(tmp_path), frames, labels)
+    assert is_archive(path)
+    assert writer.get_meta()["num_samples"] == 10
+    assert writer.stored_bytes < writer.raw_bytes == frames.nbytes
+
+    archive = FrameArchive(path)
+    assert len(archive) == 10
+    assert archive.index[:, 3].tolist() == [4, 4, 2]
+    for i in [0, 5, 3, 9, 4]:
+        label, frame = archive.get(i)
+        assert np.array_equal(frame, frames[i])
+        assert np.array_equal(label, labels[i])
+    picked = [9, 1, 4, 1, 6]
+    batch_frames, batch_labels = archive.get_batch(picked)
+    assert np.array_equal(batch_frames, frames[picked])
+    assert np.array_equal(batch_labels, labels[picked])
+    assert np.array_equal(archive.get_labels(), labels)
+
+    # the generic loaders read archives too
+    data = load_game_data(path)
+    assert np.array_equal(np.stack([frame for _, frame in data]), frames)
+    assert np.array_equal(load_game_labels(path), labels)
+    picked_frames, picked_labels = load_game_samples(path, np.array(picked))
+    assert np.array_equal(picked_frames, frames[picked])
+    assert np.array_equal(picked_labels, labels[picked])
+
+
+def test_empty_archive(tmp_path):
+    _, path = write_archive(str(tmp_path), [], [])
+    archive = FrameArchive(path)
+    assert len(archive) == 0
+    assert archive.get_labels().shape == (0, 4)
+    assert list(archive.iter_groups()) == []
+
+
+def test_frames_must_match_the_archive(tmp_path):
+    writer = ArchiveDataWriter(str(tmp_path), 2, FRAME_SHAPE, 4)
+    with pytest.raises(AssertionError):
+        for _ in range(2):
+            writer.append(np.eye(4)[0], np.zeros((4, 4, 3), np.uint8))
@@ -0,0 +1,56 @@
+"""
+    Tests for core/inference.py's worker thread and decision cache
+"""
+import time
+import numpy as np
+from core.inference import InferenceWorker, DecisionCache
+
+
+def wait_for(condition, timeout_sec=5.0):
+    start = time.perf_counter()
+    while not condition() and time.perf_counter() - start < timeout_sec:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_worker_keeps_running_after_an_error():
+    def predict(batch):
+        if batch[0, 0, 0, 0] == 1:
+            raise TimeoutError('no reply')
+        return batch[:, 0, 0, :1].astype(float)
+
+    worker = InferenceWorker(predict, (2, 2, 3))
+    worker.start()
+    worker.submit(np.full((2, 2, 3), 5, np.uint8), 10)
+    assert wait_for(lambda: worker.num_inferred == 1)
+    worker.submit(np.full((2, 2, 3), 1, np.uint8), 20)
+    assert wait_for(lambda: worker.num_errors == 1)
+    # the last good prediction is kept
+    assert not worker.is_healthy()
+    assert worker.get_latest(30).tolist() == [5]
+
+    worker.submit(np.full((2, 2, 3), 7, np.uint8), 40)
+    assert wait_for(lambda: worker.num_inferred == 2)
+    assert worker.is_healthy()
+    assert worker.get_latest(40).tolist() == [7]
+    worker.stop()
+
+
+
+def test_cache_only_reuses_decisions_on_the_same_frame_by_default():
+    cache = DecisionCache()
+    frame = np.zeros((176, 200, 3), np.uint8)
+    assert not cache.is_hit(frame, 0)
+    assert cache.is_hit(frame.copy(), 1)
+    frame[:, :100] = 255
+    assert not cache.is_hit(frame, 2) # not throttled, even a game loop later
+    assert (cache.num_hits, cache.num_misses, cache.num_throttled) == (1, 2, 0)
+
+
+def test_cache_throttle():
+    cache = DecisionCache(max_decisions_per_sec=2.24) # once every 10 game loops
+    frames = [np.full((176, 200, 3), value, np.uint8) for value in (0, 255)]
+    assert not cache.is_hit(frames[0], 0)
+    assert cache.is_hit(frames[1], 9)
+    assert not cache.is_hit(frames[1], 10)
+    assert cache.num_throttled == 1
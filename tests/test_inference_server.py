@@ -0,0 +1,63 @@
+"""
+    Tests for core/inference_server.py's client when the server is slow
+"""
+import time
+import threading
+from multiprocessing.connection import Listener
+import numpy as np
+import pytest
+from core.inference_server import RemoteBackend, InferenceError, DEFAULT_AUTHKEY
+
+
+def serve(listener, delays):
+    """Reply to every frame with its first pixel, after the delay for that
+    value (if any). A frame of 255 gets an InferenceError back"""
+    conn = listener.accept()
+    try:
+        while True:
+            frame = conn.recv()
+            value = int(frame.flat[0])
+            time.sleep(delays.get(value, 0))
+            conn.send(InferenceError('bad frame') if value == 255 else np.array([value]))
+    except (EOFError, OSError):
+        pass
+
+
+def start_server(delays):
+    listener = Listener(('localhost', 0), authkey=DEFAULT_AUTHKEY)
+    threading.Thread(target=serve, args=(listener, delays), daemon=True).start()
+    return '{}:{}'.format(*listener.address)
+
+
+def frames(*values):
+    return np.array([np.full((4, 4, 3), value, np.uint8) for value in values])
+
+
+def test_replies_stay_matched_after_a_timeout():
+    backend = RemoteBackend(start_server({1: 0.3}), timeout_sec=0.2)
+    with pytest.raises(TimeoutError):
+        backend.predict(frames(1))
+    # the late reply to 1 is thrown away instead of being taken for 2's
+    assert backend.predict(frames(2)).ravel().tolist() == [2]
+    assert backend.predict(frames(3, 4)).ravel().tolist() == [3, 4]
+    assert backend.num_pending == 0
+    backend.close()
+
+
+def test_still_waiting_on_a_late_reply():
+    backend = RemoteBackend(start_server({1: 0.5}), timeout_sec=0.1)
+    with pytest.raises(TimeoutError):
+        backend.predict(frames(1))
+    with pytest.raises(TimeoutError):
+        backend.predict(frames(2)) # 1's reply still hasn't come in, so 2 isn't sent yet
+    time.sleep(0.5)
+    assert backend.predict(frames(5)).ravel().tolist() == [5]
+    backend.close()
+
+
+def test_server_error():
+    backend = RemoteBackend(start_server({}))
+    with pytest.raises(InferenceError):
+        backend.predict(frames(255))
+    assert backend.predict(frames(7)).ravel().tolist() == [7]
+    backend.close()
@@ -0,0 +1,56 @@
+"""
+    Tests for core/manifest.py on both the older pickled .npy games and the
+    chunked game directories
+"""
+import os
+import numpy as np
+from core.manifest import update_manifest, verify_manifest, get_choices, get_class_counts
+from core.training_data import TrainingDataWriter
+
+
+def save_legacy_game(path, choices):
+    """Save a game the way the bot used to: a pickled array of [label, frame]"""
+    data = np.empty((len(choices), 2), dtype=object)
+    for i, choice in enumerate(choices):
+        data[i, 0] = np.eye(4, dtype=np.uint8)[choice]
+        data[i, 1] = np.full((176, 200, 3), i, dtype=np.uint8)
+    np.save(path, data)
+
+
+def test_legacy_npy_game(tmp_path):
+    save_legacy_game(str(tmp_path / 'legacy.npy'), [0, 1, 1, 3, 3, 3])
+
+    manifest = update_manifest(str(tmp_path))
+    entry = manifest["files"]["legacy.npy"]
+    assert entry["num_samples"] == 6
+    assert entry["class_counts"] == [1, 2, 0, 3]
+    assert entry["bytes"] == os.path.getsize(str(tmp_path / 'legacy.npy'))
+    assert get_choices(manifest, "legacy.npy").tolist() == [0, 1, 1, 3, 3, 3]
+    assert verify_manifest(str(tmp_path), manifest) == []
+
+
+def test_mixed_games_and_incremental_update(tmp_path):
+    data_dir = str(tmp_path)
+    save_legacy_game(os.path.join(data_dir, 'legacy.npy'), [2, 2])
+    writer = TrainingDataWriter(data_dir, chunk_size=2)
+    for choice in [0, 1, 1]:
+        writer.append(np.eye(4, dtype=np.uint8)[choice], np.zeros((176, 200, 3), np.uint8))
+    writer.finalize('game')
+
+    manifest = update_manifest(data_dir)
+    assert sorted(manifest["files"]) == ['game', 'legacy.npy']
+    assert get_class_counts(manifest).tolist() == [1, 2, 2, 0]
+
+    # nothing changed, so the manifest isn't rewritten
+    mtime = os.path.getmtime(os.path.join(data_dir, 'manifest.json'))
+    assert update_manifest(data_dir) == manifest
+    assert os.path.getmtime(os.path.join(data_dir, 'manifest.json')) == mtime
+
+    os.remove(os.path.join(data_dir, 'legacy.npy'))
+    assert verify_manifest(data_dir, manifest) == ['legacy.npy']
+    manifest = update_manifest(data_dir)
+    assert sorted(manifest["files"]) == ['game']
+
+    with open(os.path.join(data_dir, 'game', 'labels_00000.npy'), 'ab') as labels_file:
+        labels_file.write(b'\0')
+    assert verify_manifest(data_dir, manifest) == ['game']
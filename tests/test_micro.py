@@ -0,0 +1,58 @@
+"""
+    Tests for core/micro.py's focus-fire target assignment
+"""
+from core.micro import FocusFireMicro
+from fakes import FakeUnit, FakeUnits
+
+
+def ally(tag, pos, ground_range=5, air_range=5, ground_dps=10, air_dps=10):
+    return FakeUnit(tag, pos, radius=0.5, ground_range=ground_range, air_range=air_range, \
+                    ground_dps=ground_dps, air_dps=air_dps)
+
+
+def enemy(tag, pos, health, shield=0, is_flying=False):
+    return FakeUnit(tag, pos, radius=0.5, health=health, shield=shield, is_flying=is_flying)
+
+
+def get_targets(allies, enemies, **kwargs):
+    targets = FocusFireMicro(**kwargs).assign_targets(FakeUnits(allies), FakeUnits(enemies))
+    return {tag: unit.tag for tag, unit in targets.items()}
+
+
+def test_nothing_to_do():
+    assert get_targets([], [enemy(10, (0, 0), 50)]) == {}
+    assert get_targets([ally(1, (0, 0))], []) == {}
+
+
+def test_weakest_enemy_in_range_is_picked():
+    allies = [ally(1, (0, 0))]
+    enemies = [enemy(10, (3, 0), 100), enemy(11, (0, 3), 20, shield=30), enemy(12, (20, 0), 5)]
+    assert get_targets(allies, enemies) == {1: 11}
+
+
+def test_allies_without_anything_in_range_are_left_out():
+    allies = [ally(1, (0, 0)), ally(2, (50, 50))]
+    assert get_targets(allies, [enemy(10, (3, 0), 100)]) == {1: 10}
+    # just past range, but within the engage margin
+    assert get_targets(allies[:1], [enemy(10, (6.5, 0), 100)], engage_margin=0.0) == {}
+    assert get_targets(allies[:1], [enemy(10, (6.5, 0), 100)], engage_margin=1.0) == {1: 10}
+
+
+def test_air_and_ground_weapons():
+    allies = [ally(1, (0, 0), air_dps=0), ally(2, (0, 1), ground_range=1, air_range=6)]
+    enemies = [enemy(10, (4, 0), 10, is_flying=True), enemy(11, (4, 1), 100)]
+    assert get_targets(allies, enemies) == {1: 11, 2: 10}
+
+
+def test_overkill_spills_onto_the_next_weakest_enemy():
+    # each ally does 20 damage within the focus window, so 2 of them are enough for the
+    # 30 HP enemy and the 2 furthest move on to the 100 HP one
+    allies = [ally(i, (0, i)) for i in range(1, 5)]
+    enemies = [enemy(10, (2, 0), 30), enemy(11, (2, 4), 100)]
+    assert get_targets(allies, enemies, focus_window_sec=2.0) == {1: 10, 2: 10, 3: 11, 4: 11}
+
+
+def test_overkill_keeps_hitting_when_nothing_else_is_in_range():
+    allies = [ally(i, (0, i)) for i in range(1, 5)]
+    enemies = [enemy(10, (2, 0), 30), enemy(11, (40, 0), 5)]
+    assert get_targets(allies, enemies) == {1: 10, 2: 10, 3: 10, 4: 10}
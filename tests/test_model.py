@@ -0,0 +1,29 @@
+"""
+    Tests for how core/model.py balances and splits the training data
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+from core.model import balance_and_split, split_by_game # pylint: disable=wrong-import-position
+
+
+def test_balance_and_split():
+    choices = np.array([0]*10 + [1]*40 + [2]*20 + [3]*10, np.uint8)
+    train, test = balance_and_split(choices, 10, 0.3)
+    assert np.bincount(choices[train], minlength=4).tolist() == [7]*4
+    assert np.bincount(choices[test], minlength=4).tolist() == [3]*4
+    assert not set(train) & set(test)
+    assert np.all(np.diff(train) > 0) and np.all(np.diff(test) > 0)
+
+
+def test_balance_with_a_missing_choice():
+    choices = np.array([0, 0, 1, 1, 3, 3], np.uint8)
+    with pytest.raises(ValueError, match=r'\[2\]'):
+        balance_and_split(choices, 0, 0.3)
+
+
+def test_split_by_game():
+    offsets = np.array([0, 3, 3, 8])
+    games = split_by_game(np.array([0, 2, 5, 7]), offsets)
+    assert [game.tolist() for game in games] == [[0, 2], [], [2, 4]]
@@ -0,0 +1,109 @@
+"""
+    Tests for core/placement.py's build site search
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import sc2
+from sc2.position import Point2
+
+from core.placement import PlacementGrid
+from fakes import FakeUnit
+
+
+def make_grid(width=64, height=64, resources=(), padding=1):
+    game_info = SimpleNamespace(placement_grid=SimpleNamespace(
+        data_numpy=np.ones((height, width), dtype=np.uint8)))
+    return PlacementGrid(game_info, resources, padding=padding)
+
+
+def brute_force(grid, near, size, max_distance):
+    """Every free site within reach, checked one footprint at a time"""
+    box = size + 2*grid.padding
+    free = grid.base & (grid.blocked == 0)
+    sites = []
+    for y in range(free.shape[0] - box + 1):
+        for x in range(free.shape[1] - box + 1):
+            if free[y:y + box, x:x + box].all():
+                center = (x + grid.padding + size/2, y + grid.padding + size/2)
+                dist = np.hypot(center[0] - near[0], center[1] - near[1])
+                if dist <= max_distance:
+                    sites.append((dist, center))
+    return sites
+
+
+def is_free(grid, site, size):
+    y0, y1, x0, x1 = grid.get_bounds(site, size + 2*grid.padding)
+    return grid.base[y0:y1, x0:x1].all() and not grid.blocked[y0:y1, x0:x1].any()
+
+
+def test_candidates_are_closest_first():
+    grid = make_grid()
+    near = Point2((30, 30))
+    candidates = grid.get_candidates(near, 3, 6, 10)
+    assert len(candidates) == 10
+    dists = [near.distance_to(site) for site in candidates]
+    assert dists == sorted(dists)
+    expected = sorted(dist for dist, _ in brute_force(grid, near, 3, 6))[:10]
+    assert np.allclose(dists, expected)
+
+
+def test_candidates_match_brute_force_around_structures():
+    grid = make_grid()
+    nexus = FakeUnit(1, (30.5, 30.5), footprint_radius=2.5, is_flying=False)
+    pylon = FakeUnit(2, (36, 28), footprint_radius=1, is_flying=False)
+    grid.add_structure(nexus)
+    grid.add_structure(pylon)
+    near = Point2((33, 30))
+    candidates = grid.get_candidates(near, 3, 8, 1000)
+    assert {tuple(site) for site in candidates} == \
+        {center for _, center in brute_force(grid, near, 3, 8)}
+    assert all(is_free(grid, site, 3) for site in candidates)
+
+
+def test_structures_are_stamped_once_and_freed():
+    grid = make_grid()
+    gateway = FakeUnit(1, (20.5, 20.5), footprint_radius=1.5, is_flying=False)
+    grid.add_structure(gateway)
+    grid.add_structure(gateway)
+    assert grid.blocked.max() == 1
+    assert grid.blocked.sum() == 9
+    grid.remove_structure(gateway.tag)
+    assert not grid.blocked.any()
+
+
+def test_reservations_block_sites_until_released():
+    grid = make_grid()
+    site = grid.get_candidates(Point2((30, 30)), 3, 5, 1)[0]
+    grid.reserve(site, sc2.constants.GATEWAY, expiry_loop=100)
+    assert site not in grid.get_candidates(Point2((30, 30)), 3, 5, 1000)
+
+    grid.release_expired(99)
+    assert site in grid.reserved
+    grid.release_expired(100)
+    assert not grid.reserved
+    assert not grid.blocked.any()
+
+
+def test_structure_started_on_a_reservation_replaces_it():
+    grid = make_grid()
+    site = Point2((20.5, 20.5))
+    grid.reserve(site, sc2.constants.GATEWAY, expiry_loop=100)
+    grid.add_structure(FakeUnit(1, site, footprint_radius=1.5, is_flying=False))
+    assert not grid.reserved
+    assert grid.blocked.max() == 1
+
+
+def test_mineral_lines_are_blocked():
+    minerals = [FakeUnit(100 + i, (30 + 2*i, 40), is_mineral_field=True) for i in range(4)]
+    grid = make_grid(resources=minerals)
+    for site in grid.get_candidates(Point2((33, 40)), 2, 10, 1000):
+        assert all(site.distance_to(mineral) > 2 for mineral in minerals)
+
+
+def test_no_room_returns_nothing():
+    grid = make_grid(width=4, height=4)
+    assert grid.get_candidates(Point2((2, 2)), 3, 10, 10) == []
+    grid = make_grid()
+    grid.base[:] = False
+    assert grid.get_candidates(Point2((30, 30)), 3, 10, 10) == []
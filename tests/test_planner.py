@@ -0,0 +1,107 @@
+"""
+    Tests for core/planner.py's tech chain tracking
+"""
+import pytest
+
+from core.planner import NODE_STATE, ProductionPlanner
+from fakes import FakeUnit
+
+DEPENDENCIES = {
+    'gateway': 'nexus',
+    'cybercore': 'gateway',
+    'stargate': 'cybercore',
+    'twilight': 'cybercore',
+    'fleet_beacon': ['stargate', 'twilight'],
+}
+
+
+def make_planner(goals=('stargate', 'twilight', 'fleet_beacon'), repeat_goal=None):
+    planner = ProductionPlanner(DEPENDENCIES, goals, repeat_goal)
+    planner.sync([FakeUnit(1, (0, 0), 'nexus', is_ready=True)])
+    return planner
+
+
+def structure(tag, type_id):
+    return FakeUnit(tag, (0, 0), type_id)
+
+
+def build(planner, tag, type_id):
+    unit = structure(tag, type_id)
+    planner.on_construction_started(unit)
+    planner.on_construction_complete(unit)
+    return unit
+
+
+def test_dependencies_come_before_their_dependents():
+    planner = make_planner()
+    assert planner.order == ['nexus', 'gateway', 'cybercore', 'stargate', 'twilight', \
+                                'fleet_beacon']
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        ProductionPlanner({'a': 'b', 'b': 'a'}, ['a'])
+
+
+def test_builds_follow_the_tech_chain():
+    planner = make_planner()
+    assert planner.get_next_builds(0) == ['gateway']
+
+    gateway = structure(2, 'gateway')
+    planner.on_construction_started(gateway)
+    assert planner.get_state('gateway') == NODE_STATE.PENDING
+    assert planner.get_next_builds(0) == []
+
+    planner.on_construction_complete(gateway)
+    assert planner.get_next_builds(0) == ['cybercore']
+    build(planner, 3, 'cybercore')
+    # ready in order of priority
+    assert planner.get_next_builds(0) == ['stargate', 'twilight']
+    build(planner, 4, 'stargate')
+    assert planner.get_next_builds(0) == ['twilight']
+    build(planner, 5, 'twilight')
+    assert planner.get_next_builds(0) == ['fleet_beacon']
+
+
+def test_ordered_builds_are_held_back_until_they_expire():
+    planner = make_planner()
+    planner.mark_ordered('gateway', 100)
+    assert planner.get_next_builds(99) == []
+    assert planner.get_next_builds(100) == ['gateway']
+    assert 'gateway' not in planner.ordered_until
+
+
+def test_destroyed_structures_are_rebuilt():
+    planner = make_planner()
+    build(planner, 2, 'gateway')
+    build(planner, 3, 'cybercore')
+    planner.on_destroyed(2)
+    assert planner.get_state('gateway') == NODE_STATE.MISSING
+    assert planner.get_next_builds(0) == ['gateway', 'stargate', 'twilight']
+
+
+def test_duplicate_events_are_counted_once():
+    planner = make_planner()
+    gateway = structure(2, 'gateway')
+    for _ in range(2):
+        planner.on_construction_started(gateway)
+        planner.on_construction_complete(gateway)
+    planner.on_construction_complete(structure(9, 'zealot'))
+    assert planner.num_pending['gateway'] == 0
+    assert planner.num_ready['gateway'] == 1
+
+
+def test_repeat_goal_is_built_up_to_max_repeat():
+    planner = make_planner(goals=['cybercore'], repeat_goal='gateway')
+    assert planner.get_next_builds(0, max_repeat=3) == ['gateway']
+    build(planner, 2, 'gateway')
+    assert planner.get_next_builds(0, max_repeat=3) == ['cybercore', 'gateway']
+
+    planner.on_construction_started(structure(3, 'gateway'))
+    assert planner.get_amount('gateway') == 2
+    assert planner.get_next_builds(0, max_repeat=3) == ['cybercore', 'gateway']
+    assert planner.get_next_builds(0, max_repeat=2) == ['cybercore']
+
+    planner.mark_ordered('gateway', 100)
+    assert planner.get_next_builds(0, max_repeat=3) == ['cybercore']
+    assert planner.get_next_builds(100, max_repeat=3) == ['cybercore', 'gateway']
@@ -0,0 +1,76 @@
+"""
+    Tests for core/shards.py's compaction and the dataset it's read from
+"""
+import os
+import numpy as np
+
+from core.shards import ShardDataset, compact, is_shard_dataset
+from core.training_data import TrainingDataWriter
+
+FRAME_SHAPE = (176, 200, 3) # compact() packs full-size intel frames
+
+
+def save_game(src_dir, name, first, num_samples):
+    """Save a game whose frames are numbered from first on"""
+    labels = np.eye(4, dtype=np.uint8)[np.arange(first, first + num_samples) % 4]
+    frames = np.zeros((num_samples,) + FRAME_SHAPE, np.uint8)
+    frames[:, 0, 0, 0] = np.arange(first, first + num_samples)
+    writer = TrainingDataWriter(src_dir, chunk_size=3, frame_shape=FRAME_SHAPE)
+    for label, frame in zip(labels, frames):
+        writer.append(label, frame)
+    writer.finalize(name)
+    return labels, frames
+
+
+def test_compact_and_read_back(tmp_path):
+    src_dir, out_dir = str(tmp_path / 'games'), str(tmp_path / 'dataset')
+    games = [save_game(src_dir, 'game_a', 0, 5), save_game(src_dir, 'game_b', 5, 4)]
+    labels = np.concatenate([game[0] for game in games])
+    frames = np.concatenate([game[1] for game in games])
+
+    assert compact(src_dir, out_dir, shard_size=4) == (2, 9)
+    assert is_shard_dataset(out_dir)
+    dataset = ShardDataset(out_dir)
+    assert len(dataset) == 9
+    assert [shard["num_samples"] for shard in dataset.meta["shards"]] == [4, 4, 1]
+    assert [shard["games"] for shard in dataset.meta["shards"]] == \
+            [['game_a'], ['game_a', 'game_b'], ['game_b']]
+    # the last shard is trimmed down
+    assert dataset.frames[-1].shape == (1,) + FRAME_SHAPE
+    assert np.array_equal(dataset.labels, labels)
+    shard_frames, shard_labels = dataset.get_shard(1)
+    assert np.array_equal(shard_frames, frames[4:8])
+    assert np.array_equal(shard_labels, labels[4:8])
+
+    for picked in [np.array([0, 2, 3, 4, 8]), np.array([8, 1, 5, 1, 0, 6])]:
+        batch_frames, batch_labels = dataset.get_batch(picked)
+        assert np.array_equal(batch_frames, frames[picked])
+        assert np.array_equal(batch_labels, labels[picked])
+
+
+def test_compacting_again_only_appends_new_games(tmp_path):
+    src_dir, out_dir = str(tmp_path / 'games'), str(tmp_path / 'dataset')
+    first = save_game(src_dir, 'game_a', 0, 3)
+    compact(src_dir, out_dir, shard_size=4)
+    first_shard = os.path.join(out_dir, 'shard_00000_frames.npy')
+    mtime = os.stat(first_shard).st_mtime_ns
+
+    second = save_game(src_dir, 'game_b', 3, 2)
+    assert compact(src_dir, out_dir, shard_size=4) == (1, 2)
+    assert compact(src_dir, out_dir, shard_size=4) == (0, 0)
+    assert os.stat(first_shard).st_mtime_ns == mtime
+
+    # the new game starts its own shard, even though the first one had room
+    dataset = ShardDataset(out_dir)
+    assert [shard["num_samples"] for shard in dataset.meta["shards"]] == [3, 2]
+    assert np.array_equal(dataset.labels, np.concatenate([first[0], second[0]]))
+    assert np.array_equal(dataset.get_batch(np.arange(5))[0], np.concatenate([first[1], second[1]]))
+
+
+def test_empty_dataset(tmp_path):
+    src_dir, out_dir = str(tmp_path / 'games'), str(tmp_path / 'dataset')
+    os.makedirs(src_dir)
+    assert compact(src_dir, out_dir) == (0, 0)
+    dataset = ShardDataset(out_dir)
+    assert len(dataset) == 0
+    assert dataset.labels.shape == (0, 4)
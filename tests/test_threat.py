@@ -0,0 +1,75 @@
+"""
+    Tests for core/threat.py's incremental strength grids
+"""
+import numpy as np
+
+from core.threat import ThreatMap
+from fakes import FakeUnit
+
+
+def fighter(tag, pos, health=100, shield=0, dps=10):
+    return FakeUnit(tag, pos, health=health, shield=shield, ground_dps=dps, air_dps=0)
+
+
+def from_scratch(threat, units):
+    """Strength grid of one side, rebuilt from nothing"""
+    grid = np.zeros_like(threat.strength['ally'])
+    for unit in units:
+        grid[threat.get_cell(unit.position)] += threat.get_strength(unit)
+    return grid
+
+
+def test_cells_are_clipped_to_the_map():
+    threat = ThreatMap((64, 48), cell_size=4)
+    assert threat.strength['ally'].shape == (12, 16)
+    assert threat.get_cell((5, 9)) == (2, 1)
+    assert threat.get_cell((-3, 100)) == (11, 0)
+
+
+def test_incremental_updates_match_a_rebuild():
+    threat = ThreatMap((64, 64))
+    units = [fighter(i, (4*i + 1, 3)) for i in range(8)]
+    threat.update(units, 'ally')
+    assert np.allclose(threat.strength['ally'], from_scratch(threat, units))
+
+    # move some, hurt some, lose some
+    units[0].position = units[0].position.offset((20, 20))
+    units[1].health = 10
+    units[2].position = units[2].position.offset((1, 0))
+    units = units[:6]
+    threat.update(units, 'ally')
+    assert np.allclose(threat.strength['ally'], from_scratch(threat, units))
+    assert set(threat.contrib) == {unit.tag for unit in units}
+    assert not threat.strength['enemy'].any()
+
+
+def test_grids_are_only_blurred_when_something_changed():
+    threat = ThreatMap((64, 64))
+    units = [fighter(1, (10, 10))]
+    threat.update(units, 'enemy')
+    threat.refresh()
+    blurred = threat.blurred['enemy']
+    threat.update(units, 'enemy')
+    threat.refresh()
+    assert threat.blurred['enemy'] is blurred
+
+
+def test_safety_depends_on_local_strength():
+    threat = ThreatMap((64, 64), safety_ratio=1.0)
+    threat.update([fighter(1, (10, 10)), fighter(2, (11, 10))], 'ally')
+    threat.update([fighter(3, (10, 12)), fighter(4, (50, 50), health=300)], 'enemy')
+    assert threat.is_safe((10, 10))
+    assert not threat.is_safe((50, 50))
+    # an empty corner is safe
+    assert threat.is_safe((60, 2))
+
+
+def test_weakest_enemy_concentration():
+    threat = ThreatMap((64, 64), cell_size=4)
+    assert threat.get_weakest_enemy_position() is None
+    threat.update([fighter(1, (10, 10), health=500), fighter(2, (50, 50), health=50)], 'enemy')
+    assert threat.get_weakest_enemy_position() == (50, 50)
+    threat.update([fighter(1, (10, 10), health=500)], 'enemy')
+    assert threat.get_weakest_enemy_position() == (10, 10)
+    threat.update([], 'enemy')
+    assert threat.get_weakest_enemy_position() is None
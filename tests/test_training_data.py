@@ -0,0 +1,149 @@
+"""
+    Tests for the training data writers and readers in core/training_data.py
+"""
+import os
+import gc
+import weakref
+import numpy as np
+from core import training_data
+from core.training_data import TrainingDataWriter, ReservoirWriter, SampleFilter, load_game_data, \
+                                load_game_labels, load_game_samples
+
+FRAME_SHAPE = (8, 10, 3)
+
+
+def make_samples(choices):
+    """Get a one-hot label and a distinct frame for every choice"""
+    labels = np.eye(4, dtype=np.uint8)[choices]
+    frames = np.stack([np.full(FRAME_SHAPE, i, np.uint8) for i in range(len(choices))])
+    return labels, frames
+
+
+def track_stores(writer):
+    """Keep a weak reference to every memory map the writer opens, by the
+    path of its file"""
+    maps = []
+    open_store = writer.open_store
+    def tracked(names, size):
+        store = open_store(names, size)
+        maps.extend((os.path.join(writer._dir, name), weakref.ref(data)) \
+                    for name, data in zip(names, store))
+        return store
+    writer.open_store = tracked
+    return maps
+
+
+def check_released(monkeypatch, maps):
+    """Make overwriting a file fail while it's still memory-mapped, like it
+    does on Windows"""
+    def checked(fn, get_path):
+        def wrapper(*args, **kwargs):
+            gc.collect()
+            path = get_path(*args)
+            assert all(ref() is None for mapped, ref in maps if mapped == path), \
+                    '%s is still memory-mapped' % path
+            return fn(*args, **kwargs)
+        return wrapper
+    monkeypatch.setattr(training_data.os, 'replace', checked(os.replace, lambda src, dst: dst))
+    monkeypatch.setattr(training_data.np, 'save', checked(np.save, lambda dst, *args: dst))
+
+
+def test_writer_round_trip(tmp_path, monkeypatch):
+    choices = [0, 1, 2, 3, 3, 2, 1, 0, 1, 1]
+    labels, frames = make_samples(choices)
+    writer = TrainingDataWriter(str(tmp_path), chunk_size=4, frame_shape=FRAME_SHAPE)
+    check_released(monkeypatch, track_stores(writer))
+    for label, frame in zip(labels, frames):
+        writer.append(label, frame)
+    path = writer.finalize('game')
+
+    # the last chunk's only half full, so it's trimmed down
+    assert [chunk["num_samples"] for chunk in writer.get_meta()["chunks"]] == [4, 4, 2]
+    assert np.load(os.path.join(path, 'frames_00002.npy')).shape == (2,) + FRAME_SHAPE
+    assert not [name for name in os.listdir(path) if name.endswith('.tmp')]
+    data = load_game_data(path)
+    assert np.array_equal(np.stack([frame for _, frame in data]), frames)
+    assert np.array_equal(np.stack([label for label, _ in data]), labels)
+    assert np.array_equal(load_game_labels(path), labels)
+    picked = np.array([1, 4, 9])
+    picked_frames, picked_labels = load_game_samples(path, picked)
+    assert np.array_equal(picked_frames, frames[picked])
+    assert np.array_equal(picked_labels, labels[picked])
+
+
+def test_writer_discard(tmp_path):
+    writer = TrainingDataWriter(str(tmp_path), chunk_size=4, frame_shape=FRAME_SHAPE)
+    labels, frames = make_samples([0, 1])
+    for label, frame in zip(labels, frames):
+        writer.append(label, frame)
+    writer.discard()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_reservoir_round_trip(tmp_path, monkeypatch):
+    np.random.seed(0)
+    choices = [0]*3 + [1]*20 + [3]*5
+    labels, frames = make_samples(choices)
+    writer = ReservoirWriter(str(tmp_path), [5, 5, 5, 0], frame_shape=FRAME_SHAPE)
+    check_released(monkeypatch, track_stores(writer))
+    for label, frame in zip(labels, frames):
+        writer.append(label, frame)
+    path = writer.finalize('game')
+
+    # choice 0 isn't full and 1 is capped, 2 never came up and 3 isn't kept
+    assert writer.num_offered == [3, 20, 0, 5]
+    counts = np.bincount(np.argmax(load_game_labels(path), axis=1), minlength=4).tolist()
+    assert counts == [3, 5, 0, 0]
+    for label, frame in load_game_data(path):
+        # every kept sample is one of the originals, with its own label
+        assert np.array_equal(label, labels[frame[0, 0, 0]])
+
+
+def test_filter_keeps_label_changes():
+    sample_filter = SampleFilter(grid_size=(5, 4))
+    labels, frames = make_samples([0, 0, 1, 1, 3, 0])
+    frames[:] = 0 # nothing ever changes on screen
+    kept = [i for i, (label, frame) in enumerate(zip(labels, frames)) \
+            if sample_filter.keep(label, frame)]
+    assert kept == [0, 2, 4, 5]
+    assert (sample_filter.num_seen, sample_filter.num_kept, sample_filter.num_transitions) == \
+            (6, 4, 4)
+
+
+def test_filter_stride_grows_while_the_label_holds():
+    sample_filter = SampleFilter(min_diff=2.0, stride_growth=2, max_stride=3, grid_size=(5, 4))
+    labels, frames = make_samples([2]*16)
+    frames *= 10 # every frame looks different enough
+    kept = [i for i, (label, frame) in enumerate(zip(labels, frames)) \
+            if sample_filter.keep(label, frame)]
+    # strides of 1, 1, 2, 2, 3, 3, 3
+    assert kept == [0, 1, 2, 4, 6, 9, 12, 15]
+    assert sample_filter.get_stride() == 3
+
+
+def test_filter_skips_frames_that_look_the_same():
+    sample_filter = SampleFilter(min_diff=2.0, stride_growth=100, grid_size=(5, 4))
+    labels, frames = make_samples([1]*4)
+    frames[:] = np.array([0, 1, 3, 4], np.uint8)[:, None, None, None] # off by 1, 1+2, 1
+    kept = [i for i, (label, frame) in enumerate(zip(labels, frames)) \
+            if sample_filter.keep(label, frame)]
+    assert kept == [0, 2]
+
+
+def test_filtered_samples_round_trip(tmp_path):
+    sample_filter = SampleFilter(stride_growth=1, max_stride=4, grid_size=(5, 4))
+    choices = [0]*10 + [1]*3 + [2]*7
+    labels, frames = make_samples(choices)
+    frames *= 10
+    writer = TrainingDataWriter(str(tmp_path), chunk_size=4, frame_shape=FRAME_SHAPE)
+    kept = []
+    for i, (label, frame) in enumerate(zip(labels, frames)):
+        if sample_filter.keep(label, frame):
+            writer.append(label, frame)
+            kept.append(i)
+    path = writer.finalize('game')
+
+    assert len(kept) == sample_filter.num_kept < len(choices)
+    assert {0, 10, 13} <= set(kept)
+    assert np.array_equal(load_game_labels(path), labels[kept])
+    assert np.array_equal(np.stack([frame for _, frame in load_game_data(path)]), frames[kept])
@@ -0,0 +1,105 @@
+"""
+    Tests for core/workers.py's assignment tables
+"""
+from core.workers import WorkerManager
+from fakes import FakeUnit, FakeUnits
+
+
+class FakeBot():
+    """Just the parts of a bot WorkerManager.step() looks at"""
+    def __init__(self, minerals, workers, gas_buildings=()):
+        self.mineral_field = FakeUnits(minerals)
+        self.workers = FakeUnits(workers)
+        self.gas_buildings = FakeUnits(gas_buildings)
+
+    @property
+    def idle_worker_count(self):
+        return self.workers.idle.amount
+
+
+def make_base(num_minerals=4, num_workers=8):
+    townhall = FakeUnit(1, (50, 50))
+    minerals = [FakeUnit(100 + i, (50 + i, 57)) for i in range(num_minerals)]
+    workers = [FakeUnit(200 + i, (50, 52)) for i in range(num_workers)]
+    bot = FakeBot(minerals, workers)
+    mgr = WorkerManager()
+    mgr.add_base(townhall, bot.mineral_field)
+    for worker in workers:
+        mgr.add_worker(worker.tag)
+    return mgr, bot
+
+
+def num_commands(bot):
+    return sum(len(worker.commands) for worker in bot.workers)
+
+
+def test_workers_fill_every_mineral_field():
+    mgr, bot = make_base()
+    mgr.step(bot)
+    assert sorted(len(tags) for tags in mgr.workers_on.values()) == [2, 2, 2, 2]
+    assert all(worker.commands == [('gather', mgr.assigned[worker.tag])] for worker in bot.workers)
+    # nothing changed, so no one's commanded again
+    mgr.step(bot)
+    assert num_commands(bot) == 8
+
+
+def test_oversaturation():
+    mgr, bot = make_base(num_minerals=2, num_workers=7)
+    mgr.step(bot)
+    # 2 per mineral field, then 1 extra each, and the last one waits
+    assert sorted(len(tags) for tags in mgr.workers_on.values()) == [3, 3]
+    assert len(mgr.unassigned) == 1
+
+
+def test_geyser_takes_workers_off_minerals():
+    mgr, bot = make_base()
+    mgr.step(bot)
+    geyser = FakeUnit(300, (58, 50))
+    bot.gas_buildings.append(geyser)
+    mgr.add_geyser(geyser)
+    mgr.step(bot)
+    assert len(mgr.workers_on[geyser.tag]) == 3
+    assert sum(len(mgr.workers_on[r]) for r in mgr.mineral_tags) == 5
+    assert num_commands(bot) == 8 + 3
+
+
+def test_depleted_mineral_field():
+    mgr, bot = make_base(num_minerals=4, num_workers=6)
+    mgr.step(bot)
+    gone = bot.mineral_field.pop()
+    moved = set(mgr.workers_on[gone.tag])
+    mgr.step(bot)
+    assert gone.tag not in mgr.capacity
+    assert all(mgr.assigned[tag] != gone.tag for tag in moved)
+
+
+def test_killed_and_released_workers():
+    mgr, bot = make_base()
+    mgr.step(bot)
+    scout = bot.workers[0]
+    mgr.release(scout.tag)
+    mgr.on_destroyed(bot.workers[1].tag)
+    assert scout.tag not in mgr.assigned and bot.workers[1].tag not in mgr.assigned
+    scout.is_idle = True
+    mgr.step(bot)
+    assert scout.tag not in mgr.assigned # released workers are left alone
+
+
+def test_idle_workers_are_sent_back_to_work():
+    mgr, bot = make_base()
+    mgr.step(bot)
+    builder = bot.workers[0]
+    builder.is_idle = True
+    mgr.step(bot) # the no. of idle workers went up
+    assert builder.commands[-1] == ('gather', mgr.assigned[builder.tag])
+    assert len(builder.commands) == 2
+
+    # the count doesn't change when one worker goes idle as another gets back to work, so
+    # that's only caught by the periodic check
+    builder.is_idle = False
+    bot.workers[1].is_idle = True
+    for _ in range(mgr.idle_check_interval - 1):
+        mgr.step(bot)
+    assert len(bot.workers[1].commands) == 1
+    mgr.step(bot)
+    assert len(bot.workers[1].commands) == 2
@@ -22,6 +22,19 @@ class BOT_MODE(enum.Enum): # list(BOT_MODE.__members__)[0]
     DNN         = 2
 
 
+class INFERENCE_BACKEND(enum.Enum):
+    KERAS       = 0 # DEFAULT
+    TF_FUNCTION = 1
+    TFLITE      = 2
+    TFLITE_INT8 = 3
+
+
+class DATA_FORMAT(enum.Enum):
+    FRAMES      = 0 # DEFAULT
+    ENTITIES    = 1
+    ARCHIVE     = 2
+
+
 def build_logger(log_name, fatal_name='FATAL'):
     # R,G,B,Y,M,C,W
     # "DEBUG" C
@@ -115,7 +128,14 @@ class config_data():
             'mode':BOT_MODE.RULE_BASED,  # REQUIRED
             'race': sc2.Race.Protoss,       # REQUIRED
             'model_location': '',
+            'async_inference': True,
+            'inference_backend': INFERENCE_BACKEND.KERAS,
+            'max_decisions_per_sec': 0.0,
+            'inference_server': '',
             'save_training_data': False,
+            'filter_training_data': False,
+            'samples_per_class': [],
+            'training_data_format': DATA_FORMAT.FRAMES,
             'training_data_dir': '',
             'plot_map_intel': False,
             'max_num_workers': 65,
@@ -145,11 +165,53 @@ class config_data():
                 self.cfg['player_bot']['mode'] in [BOT_MODE.DNN],
                 '',
                 True) # already exists
+            self.check_bool_field(
+                cfg,
+                'player_bot',
+                'async_inference',
+                False)
+            self.check_enum_field(
+                cfg,
+                'player_bot',
+                'inference_backend',
+                'upper',
+                'INFERENCE_BACKEND',
+                False)
+            self.check_float_field(
+                cfg,
+                'player_bot',
+                'max_decisions_per_sec',
+                False,
+                0,
+                math.inf)
+            self.check_str_field(
+                cfg,
+                'player_bot',
+                'inference_server',
+                False)
             self.check_bool_field(
                 cfg,
                 'player_bot',
                 'save_training_data',
                 False)
+            self.check_bool_field(
+                cfg,
+                'player_bot',
+                'filter_training_data',
+                False)
+            self.check_class_caps_field(
+                cfg,
+                'player_bot',
+                'samples_per_class',
+                False,
+                4)
+            self.check_enum_field(
+                cfg,
+                'player_bot',
+                'training_data_format',
+                'upper',
+                'DATA_FORMAT',
+                False)
             self.check_dir_field(
                 cfg,
                 'player_bot',
@@ -563,6 +625,52 @@ class config_data():
                 field_name)
             raise exp
 
+    def check_class_caps_field(self, cfg, section_name, field_name, required, num_classes):
+        """
+        cfg:            is configparser object
+        section_name:   string
+        field_name:     string
+        required:       bool to force that field_name exist
+        num_classes:    no. of caps a list must have
+        JSON of either one non-negative integer for every class, a list of
+        num_classes of them, or [] for no caps
+        """
+        self.check_json_field(cfg, section_name, field_name, required)
+        caps = self.cfg[section_name][field_name]
+        is_cap = lambda cap: isinstance(cap, int) and not isinstance(cap, bool) and cap >= 0
+        if not (is_cap(caps) or caps == [] or \
+                (isinstance(caps, list) and len(caps) == num_classes and all(map(is_cap, caps)))):
+            self.logger.error(
+                '[%s]\'s "%s" field must be a non-negative integer, a list of %d of them or []. ' +
+                'Cannot run!',
+                section_name,
+                field_name,
+                num_classes)
+            raise ValueError(caps)
+
+    def check_str_field(self, cfg, section_name, field_name, required):
+        """
+        cfg:            is configparser object
+        section_name:   string
+        field_name:     string
+        required:       bool to force that field_name exist
+        """
+        try:
+            self.cfg[section_name][field_name] = cfg[section_name][field_name].strip("'").strip('"')
+        except KeyError as exp:
+            if not required:
+                self.logger.warning(
+                    '[%s]\'s "%s" field doesn\'t exist. Using default value "%s"',
+                    section_name,
+                    field_name,
+                    self.cfg[section_name][field_name])
+            else:
+                self.logger.error(
+                    '[%s]\'s "%s" field doesn\'t exist. Cannot run!',
+                    section_name,
+                    field_name)
+                raise exp
+
     def check_map_field(self, cfg, section_name, field_name, required):
         """
         cfg:            is configparser object
@@ -599,6 +707,8 @@ class config_data():
         enum_locs = [
             ['player_bot','mode'],
             ['player_bot','race'],
+            ['player_bot','inference_backend'],
+            ['player_bot','training_data_format'],
             ['enemy_bot','mode'],
             ['enemy_bot','race'],
             ['enemy_bot','computer_difficulty']]